@@ -0,0 +1,110 @@
+"""
+Compares clean_data against the previous column-by-column implementation (time and peak memory).
+
+Two inputs are used: the raw course exports (6 percentage columns, parsed as floats by read_csv)
+and a wide variant with many extra percentage columns stored as text, which is where the
+per-column passes of the old implementation hurt most.
+
+Run from the project root:
+    python -m benchmarks.bench_clean_data [--repeat 5] [--scale 1 10] [--extra-columns 60]
+"""
+
+import argparse
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.loader import clean_data
+
+RAW_DIR = Path(__file__).resolve().parent.parent / "data" / "raw"
+
+
+def legacy_clean_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The column-by-column implementation clean_data replaced (mutates df).
+    """
+    percent_cols = [col for col in df.columns if "%" in col]
+    for col in percent_cols:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(float)
+
+    response_cols = [col for col in df.columns if "response" in col.lower()]
+    for col in response_cols:
+        df[col] = df[col].fillna("")
+
+    return df
+
+
+def load_raw(scale: int) -> pd.DataFrame:
+    """
+    Concatenates every raw export, repeated `scale` times.
+    """
+    frames = [pd.read_csv(path) for path in sorted(RAW_DIR.glob("*.csv"))]
+    return pd.concat(frames * scale, ignore_index=True)
+
+
+def add_text_percent_columns(df: pd.DataFrame, count: int) -> pd.DataFrame:
+    """
+    Adds `count` percentage columns stored as text, with some blanks and junk values.
+    """
+    rng = np.random.default_rng(0)
+    extra = {}
+    for i in range(count):
+        values = np.round(rng.uniform(0, 100, len(df)), 3).astype(str).astype(object)
+        values[rng.random(len(df)) < 0.1] = None
+        values[rng.random(len(df)) < 0.01] = "n/a"
+        extra[f"%extra{i}"] = values
+    return pd.concat([df, pd.DataFrame(extra, index=df.index)], axis=1)
+
+
+def time_call(func, df: pd.DataFrame, repeat: int) -> float:
+    """
+    Returns the best wall time (in seconds) of `repeat` calls, each on a fresh copy of df.
+    The copy is made outside the timed region.
+    """
+    timer = timeit.Timer("func(data)", setup="data = df.copy()", globals={"func": func, "df": df})
+    return min(timer.repeat(number=1, repeat=repeat))
+
+
+def peak_memory(func, df: pd.DataFrame) -> float:
+    """
+    Returns the peak memory (in MB) allocated while func runs on a copy of df.
+    """
+    data = df.copy()
+    tracemalloc.start()
+    func(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing repeats (best is reported).")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10], help="Copies of the raw data.")
+    parser.add_argument("--extra-columns", type=int, default=60, help="Text percentage columns in the wide input.")
+    args = parser.parse_args()
+
+    print(
+        f"{'input':<6} {'rows':>9} {'cols':>5} {'legacy (s)':>11} {'clean_data (s)':>15} {'speedup':>8}"
+        f" {'legacy peak MB':>15} {'clean_data peak MB':>19}"
+    )
+    for scale in args.scale:
+        base = load_raw(scale)
+        for name, df in [("raw", base), ("wide", add_text_percent_columns(base, args.extra_columns))]:
+            # Check the outputs agree before timing anything.
+            pd.testing.assert_frame_equal(legacy_clean_data(df.copy()), clean_data(df))
+
+            legacy_time = time_call(legacy_clean_data, df, args.repeat)
+            new_time = time_call(clean_data, df, args.repeat)
+            print(
+                f"{name:<6} {len(df):>9} {df.shape[1]:>5} {legacy_time:>11.4f} {new_time:>15.4f}"
+                f" {legacy_time / new_time:>7.1f}x"
+                f" {peak_memory(legacy_clean_data, df):>15.2f} {peak_memory(clean_data, df):>19.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Benchmarks each stage of the ingest -> filter -> summarize -> render pipeline on synthetic course
+data, and compares the results against a baseline saved earlier on the same machine.
+
+The synthetic data has the columns and rough distributions of the raw course exports (missing
+wrong answers, skewed response counts, ~18 pointers per document) and is generated at multiples
+of the size of data/raw, so runs are reproducible without real exports.
+
+For each scale and stage this records the best wall time, throughput (rows/s) and peak memory
+(tracemalloc; allocations made inside pyarrow aren't traced). Stages more than --tolerance slower,
+or using more than --tolerance more memory, than the baseline are flagged; with --check, the exit
+status is then 1. Absolute times only compare on the same hardware, so the baseline records the
+machine it was saved on, is not committed, and a baseline from another machine is only reported.
+
+Run from the project root:
+    python -m benchmarks.bench_pipeline --save-baseline          # e.g. on main
+    python -m benchmarks.bench_pipeline [--scale 1 10 100] [--repeat 3] [--tolerance 0.5] [--check]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.analysis.visualization import create_bubble_chart
+from src.data.loader import clean_data, load_processed_data
+from src.data.process_all import process_file
+from src.data.summary import build_summary_table, summarize_wrong_answers_vectorized
+from src.utils.dashboard_helpers import filter_data
+
+BENCH_DIR = Path(__file__).resolve().parent
+RAW_DIR = BENCH_DIR.parent / "data" / "raw"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+RESPONSE_POOL = np.array(["[0]", "[1]", "[2]", "[3]", "[0, 1]", "12", "1/2", "x+1", "-3", "2\\sqrt{2}", "none"])
+
+
+def raw_row_count() -> int:
+    """
+    Returns the number of data rows in data/raw (the size of scale 1).
+    """
+    return sum(len(pd.read_csv(path, usecols=[0])) for path in sorted(RAW_DIR.glob("*.csv")))
+
+
+def synthetic_raw(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Generates a raw course export with `rows` rows.
+    """
+    rng = np.random.default_rng(seed)
+    doc = np.sort(rng.integers(0, max(1, rows // 18), rows))
+
+    failed = rng.uniform(0, 100, rows)
+    failed1 = failed * rng.uniform(0.2, 0.6, rows)
+    failed2 = failed1 * rng.uniform(0.2, 0.7, rows)
+    failed3 = failed2 * rng.uniform(0.3, 0.8, rows)
+    # Fewer rows have a second and third wrong answer (about 14%, 22% and 38% are missing in data/raw).
+    missing = rng.random(rows)
+    failed1[missing < 0.14] = np.nan
+    failed2[missing < 0.22] = np.nan
+    failed3[missing < 0.38] = np.nan
+
+    def responses(percent: np.ndarray) -> np.ndarray:
+        values = RESPONSE_POOL[rng.integers(0, len(RESPONSE_POOL), rows)].astype(object)
+        values[np.isnan(percent)] = None
+        return values
+
+    def sometimes(high: float) -> np.ndarray:
+        return np.where(rng.random(rows) < 0.3, rng.uniform(0, high, rows), 0.0)
+
+    return pd.DataFrame(
+        {
+            "document_id": 9000 + doc,
+            "document_name": np.char.add("Document ", doc.astype(str)),
+            "version": rng.integers(1, 60, rows),
+            "pointer": np.char.add(np.char.add("body", rng.integers(1, 40, rows).astype(str)), "MultiAnswerProblem"),
+            "num_responses": rng.lognormal(7, 1.3, rows).astype(int) + 1,
+            "%failed": failed,
+            "%giveup": sometimes(100),
+            "%trigger_goto": sometimes(100),
+            "%failed1": failed1,
+            "failed1_response": responses(failed1),
+            "%failed2": failed2,
+            "failed2_response": responses(failed2),
+            "%failed3": failed3,
+            "failed3_response": responses(failed3),
+        }
+    )
+
+
+def measure(func, repeat: int) -> tuple[float, float]:
+    """
+    Returns (best wall time in seconds over `repeat` calls, peak memory in MB of one more call).
+    """
+    seconds = min(timeit.repeat(func, number=1, repeat=repeat))
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1e6
+
+
+def run_scale(rows: int, repeat: int, work_dir: Path) -> dict[str, dict]:
+    """
+    Runs every stage on `rows` synthetic rows and returns {stage: {"rows", "seconds", "peak_mb"}}.
+    """
+    raw = synthetic_raw(rows)
+    raw_path = work_dir / "synthetic_data.csv"
+    raw.to_csv(raw_path, index=False)
+    processed_dir = work_dir / "processed"
+    processed_dir.mkdir(exist_ok=True)
+
+    def process():
+        # process_file reports every file it writes; keep that out of the results table.
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_file(raw_path, processed_dir)
+
+    process()
+    processed = load_processed_data(processed_dir / "synthetic_data_cleaned.csv")
+    filtered = filter_data(processed, 30)
+
+    stages = {
+        "clean_data": (len(raw), lambda: clean_data(raw)),
+        "process_file": (len(raw), process),
+        "filter_data": (len(processed), lambda: filter_data(processed, 30)),
+        "summarize": (len(processed), lambda: summarize_wrong_answers_vectorized(processed)),
+        "build_summary_table": (len(processed), lambda: build_summary_table(processed)),
+        "create_bubble_chart": (len(filtered), lambda: create_bubble_chart(filtered)),
+    }
+    results = {}
+    for stage, (stage_rows, func) in stages.items():
+        seconds, peak_mb = measure(func, repeat)
+        results[stage] = {"rows": stage_rows, "seconds": seconds, "peak_mb": peak_mb}
+    return results
+
+
+def machine() -> str:
+    """
+    Identifies the machine a baseline was saved on.
+    """
+    return f"{platform.node()} {platform.machine()} {platform.processor()} Python {platform.python_version()}".strip()
+
+
+def compare(result: dict, baseline: dict | None, tolerance: float) -> tuple[str, bool]:
+    """
+    Returns (time and memory ratios against the baseline as text, whether either regressed).
+    """
+    if not baseline:
+        return "(no baseline)", False
+    time_ratio = result["seconds"] / baseline["seconds"]
+    memory_ratio = result["peak_mb"] / baseline["peak_mb"] if baseline["peak_mb"] else 1.0
+    regressed = time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance
+    return f"{time_ratio:>5.2f}x {memory_ratio:>5.2f}x{'  REGRESSION' if regressed else ''}", regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100], help="Multiples of the data/raw size.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timing repeats (best is reported).")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON file.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline.")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Exit with status 1 when a stage regressed against this machine's baseline.",
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5, help="Allowed slowdown/memory growth vs the baseline (0.5 = 50%%)."
+    )
+    args = parser.parse_args()
+
+    baseline = {}
+    same_machine = False
+    if args.baseline.exists() and not args.save_baseline:
+        stored = json.loads(args.baseline.read_text())
+        baseline = stored.get("results", {})
+        same_machine = stored.get("machine") == machine()
+        if not same_machine:
+            print(f"Baseline {args.baseline} was saved on {stored.get('machine', 'an unknown machine')}; not checking.")
+
+    base_rows = raw_row_count()
+    results = {}
+    regressions = 0
+    print(
+        f"{'scale':>5} {'stage':<20} {'rows':>8} {'seconds':>9} {'rows/s':>11} {'peak MB':>9}"
+        f"  {'vs baseline (time, memory)'}"
+    )
+    with tempfile.TemporaryDirectory() as work_dir:
+        for scale in args.scale:
+            scale_results = run_scale(base_rows * scale, args.repeat, Path(work_dir))
+            results[str(scale)] = scale_results
+            for stage, result in scale_results.items():
+                text, regressed = compare(result, baseline.get(str(scale), {}).get(stage), args.tolerance)
+                regressions += regressed
+                print(
+                    f"{scale:>4}x {stage:<20} {result['rows']:>8} {result['seconds']:>9.4f}"
+                    f" {result['rows'] / result['seconds']:>11.0f} {result['peak_mb']:>9.2f}  {text}"
+                )
+
+    if args.save_baseline:
+        stored = {"machine": machine(), "results": results}
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{regressions} stage(s) regressed by more than {args.tolerance:.0%}.")
+        if args.check and same_machine:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
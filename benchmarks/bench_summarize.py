@@ -0,0 +1,63 @@
+"""
+Compares the row-wise summarize_wrong_answers apply against the vectorized summarizer.
+
+Run from the project root:
+    python -m benchmarks.bench_summarize [--repeat 5] [--scale 1 10 100]
+"""
+
+import argparse
+import timeit
+from pathlib import Path
+
+import pandas as pd
+
+from src.analysis.summarize import summarize_wrong_answers
+from src.data.summary import summarize_wrong_answers_vectorized
+from src.utils.dashboard_helpers import summarize_wrong_answers as summarize_wrong_answers_rounded
+from src.utils.dashboard_helpers import summarize_wrong_answers_column
+
+PROCESSED_DIR = Path(__file__).resolve().parent.parent / "data" / "processed"
+
+
+def load_all_processed() -> pd.DataFrame:
+    """
+    Concatenates every processed course file into a single frame.
+    """
+    frames = [pd.read_csv(path) for path in sorted(PROCESSED_DIR.glob("*_cleaned.csv"))]
+    return pd.concat(frames, ignore_index=True)
+
+
+def time_call(func, repeat: int) -> float:
+    """
+    Returns the best wall time (in seconds) of `repeat` single calls.
+    """
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing repeats (best is reported).")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10], help="Copies of the processed data.")
+    args = parser.parse_args()
+
+    base = load_all_processed()
+    cases = [
+        ("raw", summarize_wrong_answers, lambda df: summarize_wrong_answers_vectorized(df)),
+        ("rounded", summarize_wrong_answers_rounded, summarize_wrong_answers_column),
+    ]
+
+    print(f"{'rows':>9}  {'format':<8} {'apply (s)':>10} {'vectorized (s)':>15} {'speedup':>8}")
+    for scale in args.scale:
+        df = pd.concat([base] * scale, ignore_index=True)
+        for name, row_func, column_func in cases:
+            # Check the outputs agree before timing anything.
+            expected = df.apply(row_func, axis=1)
+            assert expected.tolist() == column_func(df).tolist(), f"{name} output differs"
+
+            apply_time = time_call(lambda df=df, f=row_func: df.apply(f, axis=1), args.repeat)
+            vector_time = time_call(lambda df=df, f=column_func: f(df), args.repeat)
+            print(f"{len(df):>9}  {name:<8} {apply_time:>10.4f} {vector_time:>15.4f} {apply_time / vector_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
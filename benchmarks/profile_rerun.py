@@ -0,0 +1,131 @@
+"""
+Profiles the data work of one dashboard rerun, before and after the request path stopped copying
+and rounding whole frames: time and peak memory per stage.
+
+  - filter_data: the previous copy-then-filter implementation vs the single-mask one.
+  - table: rounding, sorting and copying every filtered row, then taking a page, vs sorting only
+    the sort column and rounding only the displayed columns of the page.
+  - chart: building the bubble chart from the rounded frame vs from the filtered rows as they are
+    (a figure cache miss; hits skip this stage entirely).
+
+Run from the project root:
+    python -m benchmarks.profile_rerun [--repeat 5] [--scale 1 10] [--min-attempts 0]
+"""
+
+import argparse
+import timeit
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+from src.analysis.visualization import create_bubble_chart
+from src.data.derived import wrong_combined
+from src.data.loader import load_processed_data
+from src.utils.course_store import combine_courses, prepare_course_data
+from src.utils.dashboard_helpers import (
+    build_response_index,
+    filter_by_min_responses,
+    filter_data,
+    paginate,
+    round_for_display,
+)
+
+PROCESSED_DIR = Path(__file__).resolve().parent.parent / "data" / "processed"
+
+# What the dashboard shows with every optional column toggled on, sorted by %failed.
+COLUMNS = ["course", "document_name", "pointer", "num_responses", "top three wrong answers", "%failed", "%giveup"]
+SORT_BY = "%failed"
+PAGE_SIZE = 50
+
+
+def load_courses(scale: int) -> pd.DataFrame:
+    """
+    Combines every processed course file (prepared like the dashboard does), repeated `scale` times.
+    """
+    frames = {
+        path.stem: prepare_course_data(load_processed_data(path))
+        for path in sorted(PROCESSED_DIR.glob("*_cleaned.csv"))
+    }
+    return pd.concat([combine_courses(frames)] * scale, ignore_index=True)
+
+
+def legacy_filter_data(df: pd.DataFrame, min_attempts: int) -> pd.DataFrame:
+    """
+    The copy-then-filter implementation filter_data replaced.
+    """
+    df = df.copy()
+    if "num_responses" in df.columns:
+        df = df[df["num_responses"] >= min_attempts]
+    if "%wrong_combined" not in df.columns:
+        df.loc[:, "%wrong_combined"] = wrong_combined(df)
+    df = df[df["%wrong_combined"] < 99]
+    df = df[df["%failed"] < 100]
+    return df
+
+
+def table_before(filtered: pd.DataFrame) -> pd.DataFrame:
+    df = round_for_display(filtered, 1)
+    df = df.sort_values(by=SORT_BY, ascending=False)
+    return paginate(df, 1, PAGE_SIZE)[COLUMNS].copy()
+
+
+def table_after(filtered: pd.DataFrame) -> pd.DataFrame:
+    return round_for_display(paginate(filtered, 1, PAGE_SIZE, sort_by=SORT_BY)[COLUMNS], 1)
+
+
+def chart_before(filtered: pd.DataFrame):
+    return create_bubble_chart(round_for_display(filtered, 1))
+
+
+def chart_after(filtered: pd.DataFrame):
+    return create_bubble_chart(filtered)
+
+
+def profile(func, *args, repeat: int) -> tuple[float, float]:
+    """
+    Returns (best wall time in seconds over `repeat` calls, peak memory in MB of one call).
+    """
+    best = min(timeit.repeat(lambda: func(*args), number=1, repeat=repeat))
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing repeats (best is reported).")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10], help="Copies of the processed data.")
+    parser.add_argument("--min-attempts", type=int, default=0, help="Minimum-responses slider value.")
+    args = parser.parse_args()
+
+    print(
+        f"{'stage':<12} {'rows':>8} {'before (s)':>11} {'after (s)':>10} {'before peak MB':>15} {'after peak MB':>14}"
+    )
+    for scale in args.scale:
+        df = load_courses(scale)
+
+        filtered = filter_by_min_responses(build_response_index(df), args.min_attempts)
+
+        # Check the outputs agree before timing anything.
+        pd.testing.assert_frame_equal(legacy_filter_data(df, args.min_attempts), filter_data(df, args.min_attempts))
+        assert table_before(filtered)[SORT_BY].tolist() == table_after(filtered)[SORT_BY].tolist(), "pages differ"
+
+        cases = [
+            ("filter_data", legacy_filter_data, filter_data, (df, args.min_attempts)),
+            ("table", table_before, table_after, (filtered,)),
+            ("chart", chart_before, chart_after, (filtered,)),
+        ]
+        for name, before, after, func_args in cases:
+            before_time, before_peak = profile(before, *func_args, repeat=args.repeat)
+            after_time, after_peak = profile(after, *func_args, repeat=args.repeat)
+            print(
+                f"{name:<12} {len(df):>8} {before_time:>11.4f} {after_time:>10.4f}"
+                f" {before_peak:>15.2f} {after_peak:>14.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
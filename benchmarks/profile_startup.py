@@ -0,0 +1,93 @@
+"""
+Measures dashboard startup with the chart stack imported lazily (as the app does) and eagerly (as it
+did when streamlit_app.py imported src.analysis.visualization at the top).
+
+Each run uses a fresh interpreter, so nothing is cached between runs:
+  - import: time to import the app module (streamlit itself is imported before timing starts).
+  - first paint: time from the start of the first script run until the summary table is sent.
+  - full run: time until the whole first script run (including the chart) has finished.
+It also checks that src.analysis and src.data.process_all import without pulling in Streamlit.
+
+Run from the project root:
+    python -m benchmarks.profile_startup [--repeat 5]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs the app once in a fresh interpreter and prints the timings as JSON. {eager} is "True" or "False".
+STARTUP_SCRIPT = """
+import json, sys, time
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+sys.path.insert(0, {root!r})
+first_paint = []
+data_editor = st.data_editor
+
+
+def timed_data_editor(*args, **kwargs):
+    first_paint.append(time.perf_counter())
+    return data_editor(*args, **kwargs)
+
+
+st.data_editor = timed_data_editor
+start = time.perf_counter()
+if {eager}:
+    import plotly.express  # noqa: F401
+    import src.analysis.visualization  # noqa: F401
+import streamlit_app  # noqa: F401
+imported = time.perf_counter()
+script_start = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+end = time.perf_counter()
+assert not at.exception, at.exception
+print(json.dumps({{
+    "import": imported - start,
+    "first_paint": first_paint[0] - script_start + (imported - start),
+    "full_run": end - script_start + (imported - start),
+}}))
+"""
+
+# Prints which heavy modules importing the batch-side packages pulls in.
+BATCH_IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import src.analysis.summarize, src.analysis.visualization, src.data.process_all  # noqa: E401, F401
+print(json.dumps({{"seconds": time.perf_counter() - start, "streamlit": "streamlit" in sys.modules}}))
+"""
+
+
+def run_python(code: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per mode (best is reported).")
+    args = parser.parse_args()
+
+    app = str(ROOT / "streamlit_app.py")
+    print(f"{'mode':<6} {'import (s)':>11} {'first paint (s)':>16} {'full run (s)':>13}")
+    for mode in ["eager", "lazy"]:
+        code = STARTUP_SCRIPT.format(root=str(ROOT), app=app, eager=mode == "eager")
+        runs = [run_python(code) for _ in range(args.repeat)]
+        best = {key: min(run[key] for run in runs) for key in runs[0]}
+        print(f"{mode:<6} {best['import']:>11.3f} {best['first_paint']:>16.3f} {best['full_run']:>13.3f}")
+
+    batch = run_python(BATCH_IMPORT_SCRIPT.format(root=str(ROOT)))
+    print(
+        f"Importing src.analysis and src.data.process_all: {batch['seconds']:.3f} s, "
+        f"Streamlit {'imported' if batch['streamlit'] else 'not imported'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,15 @@
+import argparse
+from pathlib import Path
+
 import pandas as pd
 
+from src.analysis.writers import WRITER_FORMATS, open_summary_writer
+from src.data.loader import load_processed_data
+from src.data.sketch import merged_course_sketch
+from src.data.summary import build_summary_table
+
+PROCESSED_DIR = Path(__file__).resolve().parent.parent.parent / "data" / "processed"
+
 
 def summarize_wrong_answers(row):
     """
@@ -16,86 +26,172 @@ def summarize_wrong_answers(row):
     return ", ".join(items)
 
 
-def build_summary_table(df):
+def compare_documents_across_courses(df: pd.DataFrame, min_courses: int = 2) -> pd.DataFrame:
     """
-    Builds a summary table that retains:
-      - document_name
-      - pointer
-      - num_responses
-      - %failed, %giveup, %trigger_goto (if present)
-      - %failed1, failed1_response, %failed2, failed2_response, %failed3, failed3_response (if present)
-      - %wrong_combined (the sum of %failed1, %failed2, %failed3)
-      - top three wrong answers (a single string)
+    Compares each document across courses in a combined dataset (one with a 'course' column).
+    Returns one row per document_id that appears in at least min_courses courses, with one
+    column per course holding the response-weighted %failed of that document in that course:
+        sum(%failed / 100 * num_responses) / sum(num_responses) * 100
+    Worst documents (highest mean across courses) come first.
     """
-    df_copy = df.copy()
-
-    # If %wrong_combined isn't already computed, compute it
-    if "%wrong_combined" not in df_copy.columns:
-        df_copy["%wrong_combined"] = (
-            df_copy["%failed1"].fillna(0) + df_copy["%failed2"].fillna(0) + df_copy["%failed3"].fillna(0)
+    fails = df["%failed"].fillna(0) / 100 * df["num_responses"]
+    grouped = (
+        pd.DataFrame(
+            {
+                "document_id": df["document_id"],
+                "course": df["course"],
+                "fails": fails,
+                "num_responses": df["num_responses"],
+            }
         )
+        .groupby(["document_id", "course"], observed=True)[["fails", "num_responses"]]
+        .sum()
+    )
+    weighted = (grouped["fails"] / grouped["num_responses"] * 100).unstack("course")
 
-    # Create the 'top three wrong answers' column
-    df_copy["top three wrong answers"] = df_copy.apply(summarize_wrong_answers, axis=1)
-
-    # Define the columns we want to keep (if they exist in df)
-    desired_cols = [
-        "document_name",
-        "pointer",
-        "num_responses",
-        "%failed",
-        "%giveup",
-        "%trigger_goto",
-        "%failed1",
-        "failed1_response",
-        "%failed2",
-        "failed2_response",
-        "%failed3",
-        "failed3_response",
-        "%wrong_combined",
-        "top three wrong answers",
-    ]
-
-    # Only select columns that actually exist in the DataFrame
-    keep_cols = [col for col in desired_cols if col in df_copy.columns]
-
-    # Return the subset with the columns we want to keep
-    summary_table = df_copy[keep_cols]
-    return summary_table
-
-
-def filter_by_num_responses_percentile(df, percentile=0.25):
+    names = df.groupby("document_id", observed=True)["document_name"].first()
+    comparison = weighted[weighted.notna().sum(axis=1) >= min_courses]
+    comparison = comparison.loc[comparison.mean(axis=1).sort_values(ascending=False).index]
+    comparison.insert(0, "document_name", names.reindex(comparison.index).astype(str))
+    comparison.columns = [str(col) for col in comparison.columns]
+    return comparison.reset_index()
+
+
+def filter_by_num_responses_percentile(df, percentile=0.25, sketch=None):
     """
     Filters out rows that fall below the given percentile of num_responses.
     E.g., percentile=0.25 -> remove bottom 25% of problems by response count.
+
+    With a QuantileSketch (see src/data/sketch.py), the cutoff is its approximate percentile instead
+    of the exact quantile of df. The sketch can summarize more than df, e.g. the merged sketches of
+    every course, so data that is processed piece by piece can share one cutoff.
     """
-    cutoff = df["num_responses"].quantile(percentile)
+    cutoff = df["num_responses"].quantile(percentile) if sketch is None else sketch.quantile(percentile)
     return df[df["num_responses"] >= cutoff]
 
 
-if __name__ == "__main__":
-    # 1. Load your cleaned CSV file from data/processed
-    df = pd.read_csv("data/processed/cleaned_data.csv")
+def filter_by_wrong_combined(df, lower=0.0, upper=99.0):
+    """
+    Keeps rows with lower < %wrong_combined < upper. The defaults drop rows with no wrong answers
+    and bogus rows (99% or higher).
+    """
+    return df[(df["%wrong_combined"] > lower) & (df["%wrong_combined"] < upper)]
+
+
+def top_k_rows(df, k, by="%wrong_combined"):
+    """
+    Returns the k rows with the largest `by`, in descending order. nlargest selects them with a
+    partial selection, so only those k rows get sorted rather than the whole frame.
+    """
+    return df.nlargest(k, by)
 
-    # 2. Compute %wrong_combined if not already computed
-    df["%wrong_combined"] = df["%failed1"].fillna(0) + df["%failed2"].fillna(0) + df["%failed3"].fillna(0)
 
-    # 3. Filter out rows with zero %wrong_combined (optional) and those >= 99 (bogus)
-    df = df[df["%wrong_combined"] > 0]
-    df = df[df["%wrong_combined"] < 99]
+def processed_course_files(processed_dir=PROCESSED_DIR) -> list[Path]:
+    """
+    Returns every processed course file in processed_dir, in name order.
+    """
+    return sorted(Path(processed_dir).glob("*_cleaned.csv"))
 
-    # 4. Filter out problems in the bottom 25% by num_responses (optional)
-    df = filter_by_num_responses_percentile(df, percentile=0.25)
 
-    # 5. Sort the remaining rows by %wrong_combined in descending order (optional)
-    df = df.sort_values(by="%wrong_combined", ascending=False)
+def summarize_course(df, percentile=0.25, lower=0.0, upper=99.0, top_k=None, sort_by="%wrong_combined", sketch=None):
+    """
+    Builds the exported summary of one course: filters by %wrong_combined bounds, drops problems
+    below the num_responses percentile (0 keeps all), then keeps the top_k rows by sort_by (all
+    rows when top_k is None), sorted by sort_by in descending order.
+
+    The percentile is taken over the course's rows within the bounds, or from sketch when one is
+    given (see filter_by_num_responses_percentile); it should summarize rows within the same bounds,
+    like merged_course_sketch does.
+    """
+    # Compute %wrong_combined if not already computed
+    if "%wrong_combined" not in df.columns:
+        df = df.assign(
+            **{"%wrong_combined": df["%failed1"].fillna(0) + df["%failed2"].fillna(0) + df["%failed3"].fillna(0)}
+        )
 
-    # 6. Build the summary table
-    summary_table = build_summary_table(df)
+    df = filter_by_wrong_combined(df, lower, upper)
+    if percentile > 0:
+        df = filter_by_num_responses_percentile(df, percentile=percentile, sketch=sketch)
+    if top_k is not None:
+        df = top_k_rows(df, top_k, by=sort_by)
+    else:
+        df = df.sort_values(by=sort_by, ascending=False)
+    return build_summary_table(df)
 
-    # 7. Display in console
-    print(summary_table.to_string(index=False))
 
-    # 8. Export the entire table (no top-20 limit) to CSV
-    summary_table.to_csv("all_failures_summary.csv", index=False)
-    print("Exported summary to all_failures_summary.csv")
+def export_summaries(course_files, writer, **options) -> int:
+    """
+    Summarizes each processed course file (see summarize_course for the options) and streams the
+    result to writer one course at a time, with a leading 'course' column. Only one course is held
+    in memory at once. Returns the number of rows written.
+    """
+    rows = 0
+    for course_file in course_files:
+        df = load_processed_data(course_file)
+        if "course" in df.columns and len(df):
+            course = str(df["course"].iloc[0])
+        else:
+            course = Path(course_file).stem.removesuffix("_cleaned")
+        summary = summarize_course(df, **options)
+        summary.insert(0, "course", course)
+        writer.write(summary)
+        rows += len(summary)
+    return rows
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the wrong-answer summary of every processed course.")
+    parser.add_argument("--processed-dir", type=Path, default=PROCESSED_DIR, help="Directory with processed courses.")
+    parser.add_argument(
+        "--output", type=Path, default=Path("all_failures_summary.csv"), help="Output file (.csv, .parquet or .jsonl)."
+    )
+    parser.add_argument(
+        "--format", choices=sorted(set(WRITER_FORMATS.values())), default=None, help="Default: from the suffix."
+    )
+    parser.add_argument(
+        "--percentile",
+        type=float,
+        default=0.25,
+        help="Drop each course's problems below this num_responses percentile (default: 0.25; 0 keeps all).",
+    )
+    parser.add_argument(
+        "--global-percentile",
+        action="store_true",
+        help="Use one approximate --percentile cutoff over all courses' rows (from their merged sketches).",
+    )
+    parser.add_argument("--min-wrong-combined", type=float, default=0.0, help="Keep rows above this %%wrong_combined.")
+    parser.add_argument("--max-wrong-combined", type=float, default=99.0, help="Keep rows below this %%wrong_combined.")
+    parser.add_argument("--top-k", type=int, default=None, help="Keep only the top K rows of each course.")
+    parser.add_argument("--sort-by", default="%wrong_combined", help="Column to rank by (descending).")
+    args = parser.parse_args(argv)
+
+    course_files = processed_course_files(args.processed_dir)
+    if not course_files:
+        print(f"No processed courses found in {args.processed_dir}")
+        return 1
+
+    # The stored per-course sketches are small, so the global cutoff needs no pass over the data.
+    # Sketched over the rows within the same %wrong_combined bounds the per-course percentile uses.
+    bounds = (args.min_wrong_combined, args.max_wrong_combined)
+    sketch = merged_course_sketch(course_files, bounds=bounds) if args.global_percentile else None
+    if sketch is not None and args.percentile > 0:
+        cutoff = sketch.quantile(args.percentile)
+        print(f"Global num_responses cutoff (approximate {args.percentile:.0%} percentile): {cutoff:g}")
+
+    with open_summary_writer(args.output, args.format) as writer:
+        rows = export_summaries(
+            course_files,
+            writer,
+            percentile=args.percentile,
+            lower=args.min_wrong_combined,
+            upper=args.max_wrong_combined,
+            top_k=args.top_k,
+            sort_by=args.sort_by,
+            sketch=sketch,
+        )
+    print(f"Exported {rows} rows from {len(course_files)} courses to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,111 @@
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import streamlit as st
+
+from src.data.derived import total_fails
+from src.utils.instrumentation import instrumented
+
+# Above this many bubbles, charts are drawn with WebGL (scattergl) instead of SVG.
+WEBGL_ROW_THRESHOLD = 1000
+
+# Number of bins along each axis in the "binned" chart.
+DEFAULT_BINS = 30
+
+# How many built figures to keep (least recently used are evicted first).
+MAX_CACHED_FIGURES = 32
+
+# Maps (cache key, mode) -> figure, in LRU order. Like the course cache, this lives in a module
+# so it survives Streamlit reruns.
+_FIGURES: "OrderedDict[tuple, go.Figure]" = OrderedDict()
+_FIGURES_LOCK = threading.Lock()
+
+HOVER_FORMATS = {"%wrong_combined": ":.1f", "num_responses": ":.0f", "total_fails": ":.1f"}
+
+CHART_MODES = ("points", "document", "binned")
+
+CHART_TITLES = {
+    "points": "Bubble Chart: Combined Wrong % vs # of Responses (Bubble size = total fails)",
+    "document": "Bubble Chart by Document: Combined Wrong % vs # of Responses (Bubble size = total fails)",
+    "binned": "Binned Bubble Chart: Combined Wrong % vs # of Responses (Bubble size = total fails)",
+}
+
+
+def aggregate_by_document(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collapses the pointers of each document (per course, when a 'course' column is present)
+    into one row:
+      - '%wrong_combined': averaged over the pointers, weighted by num_responses
+      - 'num_responses' and 'total_fails': summed
+      - 'pointers': number of pointers
+    """
+    keys = [col for col in ["course", "document_name"] if col in df.columns]
+    responses = df["num_responses"].fillna(0)
+    parts = pd.DataFrame(
+        {
+            "weighted": df["%wrong_combined"] * responses,
+            "num_responses": responses,
+            "total_fails": df["total_fails"],
+            "pointers": 1,
+        }
+    )
+    for key in keys:
+        parts[key] = df[key]
+    if not keys:
+        parts["document_name"] = "All documents"
+        keys = ["document_name"]
+
+    grouped = parts.groupby(keys, observed=True, sort=False).sum().reset_index()
+    totals = grouped.pop("weighted")
+    grouped.insert(len(keys), "%wrong_combined", (totals / grouped["num_responses"].where(lambda n: n > 0)).fillna(0))
+    return grouped
+
+
+def bin_points(df: pd.DataFrame, bins: int = DEFAULT_BINS) -> pd.DataFrame:
+    """
+    Bins the points on a bins x bins grid over '%wrong_combined' and 'num_responses' and returns one
+    row per non-empty bin, placed at the bin center, with 'points' (rows in the bin) and the summed
+    'total_fails'. The result has at most bins**2 rows however many rows df has.
+    """
+    df = df.dropna(subset=["%wrong_combined", "num_responses"])
+    x = df["%wrong_combined"].to_numpy(dtype=float)
+    y = df["num_responses"].to_numpy(dtype=float)
+    if len(df) == 0:
+        return pd.DataFrame(columns=["%wrong_combined", "num_responses", "points", "total_fails"])
+
+    x_edges = np.histogram_bin_edges(x, bins)
+    y_edges = np.histogram_bin_edges(y, bins)
+    x_bin = np.clip(np.searchsorted(x_edges, x, side="right") - 1, 0, bins - 1)
+    y_bin = np.clip(np.searchsorted(y_edges, y, side="right") - 1, 0, bins - 1)
+
+    grouped = (
+        pd.DataFrame({"x_bin": x_bin, "y_bin": y_bin, "points": 1, "total_fails": df["total_fails"].to_numpy()})
+        .groupby(["x_bin", "y_bin"])
+        .sum()
+        .reset_index()
+    )
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    return pd.DataFrame(
+        {
+            "%wrong_combined": x_centers[grouped["x_bin"]],
+            "num_responses": y_centers[grouped["y_bin"]],
+            "points": grouped["points"].to_numpy(),
+            "total_fails": grouped["total_fails"].to_numpy(),
+        }
+    )
 
 
-def create_bubble_chart(df: pd.DataFrame) -> go.Figure:
+def create_bubble_chart(
+    df: pd.DataFrame,
+    mode: str = "points",
+    webgl_threshold: int = WEBGL_ROW_THRESHOLD,
+    bins: int = DEFAULT_BINS,
+) -> go.Figure:
     """
     Creates a bubble chart where:
       - x-axis: '%wrong_combined'
@@ -13,36 +114,114 @@ def create_bubble_chart(df: pd.DataFrame) -> go.Figure:
       - color: 'document_name' if available
       - hover_data: includes 'pointer' and 'top three wrong answers'
     Returns the Plotly figure.
+
+    mode selects what each bubble is:
+      - "points": one bubble per pointer row. Above webgl_threshold rows, all rows go into a
+        single WebGL trace (no per-document colors), since one SVG trace per document gets slow
+        and heavy with hundreds of documents.
+      - "document": one bubble per document (see aggregate_by_document).
+      - "binned": one bubble per non-empty grid cell (see bin_points), so the figure size
+        doesn't grow with the number of rows.
     """
+    if mode not in CHART_MODES:
+        raise ValueError(f"Unknown bubble chart mode: {mode!r} (expected one of {CHART_MODES})")
     required_cols = {"%failed", "num_responses", "%wrong_combined"}
     missing = required_cols - set(df.columns)
     if missing:
         raise ValueError(f"Missing columns for bubble chart: {missing}")
 
-    # Compute total_fails as the actual number of fails
-    df = df.copy()
-    df["total_fails"] = (df["%failed"].fillna(0) / 100) * df["num_responses"].fillna(0)
+    # Compute total_fails as the actual number of fails, unless process_all already stored it.
+    if "total_fails" not in df.columns:
+        df = df.assign(total_fails=total_fails(df))
+
+    color = None
+    hover_name = None
+    if mode == "document":
+        plot_df = aggregate_by_document(df)
+        hover_name = "document_name"
+        hover_data = [col for col in ["course", "pointers"] if col in plot_df.columns]
+    elif mode == "binned":
+        plot_df = bin_points(df, bins)
+        hover_data = ["points"]
+    else:
+        plot_df = df
+        hover_data = ["pointer", "top three wrong answers"]
+        if len(df) <= webgl_threshold:
+            color = "document_name" if "document_name" in df.columns else None
+        elif "document_name" in df.columns:
+            hover_name = "document_name"
 
     fig = px.scatter(
-        df,
+        plot_df,
         x="%wrong_combined",
         y="num_responses",
         size="total_fails",
-        color="document_name" if "document_name" in df.columns else None,
-        hover_data=["pointer", "top three wrong answers"],
-        title="Bubble Chart: Combined Wrong % vs # of Responses (Bubble size = total fails)",
+        color=color,
+        hover_name=hover_name,
+        # Values are plotted unrounded; hover labels show them to 1 decimal place.
+        hover_data={**dict.fromkeys(hover_data, True), **HOVER_FORMATS},
+        render_mode="webgl" if len(plot_df) > webgl_threshold else "svg",
+        title=CHART_TITLES[mode],
         labels={"%wrong_combined": "Combined Wrong %", "num_responses": "Number of Attempts"},
     )
-    fig.update_traces(marker=dict(sizemin=2, sizemode="area", sizeref=2.0 * max(df["total_fails"]) / (40.0**2)))
+    max_size = plot_df["total_fails"].max() if len(plot_df) else 0
+    fig.update_traces(marker=dict(sizemin=2, sizemode="area", sizeref=2.0 * (max_size or 1) / (40.0**2)))
+    return fig
+
+
+def cached_bubble_chart(
+    df: pd.DataFrame | Callable[[], pd.DataFrame],
+    key: tuple,
+    mode: str = "points",
+    max_figures: int = MAX_CACHED_FIGURES,
+):
+    """
+    Returns create_bubble_chart(df, mode), building it only the first time (key, mode) is seen.
+    key must identify df completely, e.g. (course, min_attempts, data version); other widget
+    changes then reuse the cached figure. The figure is shared, so callers must not modify it.
+    df may also be a function returning the frame; it is then only called to build a new figure.
+    """
+    cache_key = (key, mode)
+    with _FIGURES_LOCK:
+        fig = _FIGURES.get(cache_key)
+        if fig is not None:
+            _FIGURES.move_to_end(cache_key)
+            return fig
+
+    fig = create_bubble_chart(df() if callable(df) else df, mode=mode)
+    with _FIGURES_LOCK:
+        _FIGURES[cache_key] = fig
+        _FIGURES.move_to_end(cache_key)
+        while len(_FIGURES) > max_figures:
+            _FIGURES.popitem(last=False)
     return fig
 
 
-def show_bubble_chart(df: pd.DataFrame):
+def clear_figure_cache():
     """
-    Calls create_bubble_chart and then renders the figure with Streamlit.
+    Drops every cached figure.
     """
+    with _FIGURES_LOCK:
+        _FIGURES.clear()
+
+
+@instrumented("show_bubble_chart")
+def show_bubble_chart(
+    df: pd.DataFrame | Callable[[], pd.DataFrame], mode: str = "points", cache_key: tuple | None = None
+):
+    """
+    Calls create_bubble_chart and then renders the figure with Streamlit. With a cache_key, the
+    figure comes from cached_bubble_chart instead of being rebuilt on every rerun (and a df given
+    as a function is only called then).
+    """
+    # Imported here so batch jobs can use this module without Streamlit installed.
+    import streamlit as st
+
     try:
-        fig = create_bubble_chart(df)
+        if cache_key is None:
+            fig = create_bubble_chart(df() if callable(df) else df, mode=mode)
+        else:
+            fig = cached_bubble_chart(df, cache_key, mode=mode)
         st.plotly_chart(fig, use_container_width=True)
     except ValueError as e:
         st.info(str(e))
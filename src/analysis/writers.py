@@ -0,0 +1,147 @@
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import pandas as pd
+
+from src.data.columnar import ColumnarWriter, columnar_available
+
+# Output formats by file suffix.
+WRITER_FORMATS = {".csv": "csv", ".parquet": "parquet", ".jsonl": "jsonl"}
+
+
+class SummaryWriter(ABC):
+    """
+    Writes a table to path one chunk at a time, so the whole table never has to be in memory.
+
+    Output goes to a temporary file that replaces path on a clean close; if the writer is left
+    through an exception, the temporary file is removed and path is left untouched.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.rows = 0
+        self._empty = None
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            # Remember the columns so an export with no rows still gets a header/schema.
+            if self._empty is None:
+                self._empty = df
+            return
+        self._write(df)
+        self.rows += len(df)
+
+    @abstractmethod
+    def _write(self, df: pd.DataFrame):
+        """
+        Appends df to the temporary file.
+        """
+
+    @abstractmethod
+    def _close(self):
+        """
+        Flushes and closes the temporary file.
+        """
+
+    def close(self):
+        if self.rows == 0 and self._empty is not None:
+            self._write(self._empty)
+        self._close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._close()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class CsvSummaryWriter(SummaryWriter):
+    """
+    Writes the header of the first chunk; later chunks are reindexed to its columns (columns it lacks
+    are dropped, missing ones left empty), so courses with different columns can't shift values
+    into the wrong column.
+    """
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._file = open(self.tmp_path, "w", newline="")
+        self._columns = None
+
+    def _write(self, df: pd.DataFrame):
+        if self._columns is None:
+            self._columns = list(df.columns)
+            df.to_csv(self._file, index=False)
+        else:
+            df.reindex(columns=self._columns).to_csv(self._file, index=False, header=False)
+
+    def _close(self):
+        self._file.close()
+
+
+class JsonlSummaryWriter(SummaryWriter):
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._file = open(self.tmp_path, "w")
+
+    def _write(self, df: pd.DataFrame):
+        # An export with no rows is an empty file (there is no header to write).
+        if not df.empty:
+            df.to_json(self._file, orient="records", lines=True, force_ascii=False)
+
+    def _close(self):
+        self._file.close()
+
+
+class ParquetSummaryWriter(SummaryWriter):
+    """
+    Writes each chunk as a row group with the typed columnar schema (see ColumnarWriter).
+    """
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._writer = ColumnarWriter(self.tmp_path)
+
+    def _write(self, df: pd.DataFrame):
+        self._writer.write(df)
+
+    def _close(self):
+        self._writer.close()
+
+
+def output_format(path: Path, fmt: str | None = None) -> str:
+    """
+    Returns fmt, or the format implied by path's suffix.
+    """
+    if fmt is not None:
+        return fmt
+    try:
+        return WRITER_FORMATS[Path(path).suffix.lower()]
+    except KeyError:
+        raise ValueError(f"Can't infer the output format of {path}; use one of {sorted(WRITER_FORMATS)}") from None
+
+
+def open_summary_writer(path: Path, fmt: str | None = None) -> SummaryWriter:
+    """
+    Returns a streaming writer for path in the given format ("csv", "parquet" or "jsonl"; by default
+    inferred from the suffix). Parquet needs pyarrow.
+    """
+    fmt = output_format(path, fmt)
+    if fmt == "csv":
+        return CsvSummaryWriter(path)
+    if fmt == "jsonl":
+        return JsonlSummaryWriter(path)
+    if fmt == "parquet":
+        if not columnar_available():
+            raise ValueError("Writing Parquet requires pyarrow")
+        return ParquetSummaryWriter(path)
+    raise ValueError(f"Unknown output format: {fmt!r}")
@@ -0,0 +1,206 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .columnar import COLUMNAR_SUFFIX, columnar_available, read_columnar, write_columnar
+from .loader import processed_source
+
+ANSWER_INDEX_NAME = "answer_index.parquet"
+
+# Columns read from each processed course to build the index.
+INDEX_SOURCE_COLUMNS = ["course", "document_id", "document_name", "pointer"]
+SLOTS = [1, 2, 3]
+
+
+def normalize_answers(values: pd.Series) -> pd.Series:
+    """
+    Returns the normalized form of each wrong answer as a categorical: surrounding whitespace and
+    double quotes removed, inner whitespace collapsed, case folded ('"Addition "' -> 'addition').
+    Only the distinct answers are normalized, so repeated answers cost nothing extra.
+    """
+    categorical = values.astype("category")
+    categories = pd.Series(categorical.cat.categories.astype(str))
+    normalized = categories.str.strip().str.strip('"').str.strip().str.replace(r"\s+", " ", regex=True).str.casefold()
+    codes = categorical.cat.codes.to_numpy()
+    result = np.where(codes >= 0, normalized.to_numpy(dtype=object)[codes], None)
+    return pd.Series(pd.Categorical(result), index=values.index)
+
+
+def course_answers(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns one row per non-empty wrong answer of a processed course:
+    (answer, course, document_id, document_name, pointer, slot, percent), where slot is 1-3 for
+    failed1_response..failed3_response and percent the matching %failedN.
+    """
+    parts = []
+    for slot in SLOTS:
+        resp_col, pct_col = f"failed{slot}_response", f"%failed{slot}"
+        if resp_col not in df.columns:
+            continue
+        part = df[[col for col in INDEX_SOURCE_COLUMNS if col in df.columns]].copy()
+        part.insert(0, "answer", normalize_answers(df[resp_col]))
+        part["slot"] = np.int8(slot)
+        part["percent"] = df[pct_col].astype("float32") if pct_col in df.columns else np.float32("nan")
+        parts.append(part[part["answer"].notna() & (part["answer"] != "")])
+    if not parts:
+        return pd.DataFrame(columns=["answer", *INDEX_SOURCE_COLUMNS, "slot", "percent"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def build_answer_index(course_files) -> pd.DataFrame:
+    """
+    Builds the inverted index of wrong answers over the given processed course files: every
+    (answer, course, document_id, pointer, slot) with the answer dictionary-encoded and the rows
+    sorted by answer, so all problems sharing an answer are one contiguous block. A course_file
+    column names the processed CSV each row came from (see update_answer_index).
+    """
+    frames = []
+    for course_file in course_files:
+        source = processed_source(course_file)
+        if source.suffix == COLUMNAR_SUFFIX:
+            df = read_columnar(source)
+        else:
+            header = pd.read_csv(source, nrows=0).columns
+            usecols = [col for col in header if col in INDEX_SOURCE_COLUMNS or "failed" in col]
+            # Read responses as text, like read_raw_csv: answers such as '7' must not become 7.0.
+            dtype = {col: "str" for col in usecols if col.endswith("_response")}
+            df = pd.read_csv(source, usecols=usecols, dtype=dtype)
+        frames.append(course_answers(df).assign(course_file=Path(course_file).name))
+    index = pd.concat(frames, ignore_index=True) if frames else course_answers(pd.DataFrame()).assign(course_file=None)
+    return _sorted_index(index)
+
+
+def _sorted_index(index: pd.DataFrame) -> pd.DataFrame:
+    # Categories are inferred in sorted order, so sorting by answer also sorts the answer codes.
+    for col in ["answer", "course", "document_name", "pointer", "course_file"]:
+        if col in index.columns:
+            index[col] = index[col].astype(str).astype("category")
+    sort_cols = [col for col in ["answer", "course", "document_id", "pointer", "slot"] if col in index.columns]
+    return index.sort_values(sort_cols, kind="stable").reset_index(drop=True)
+
+
+class AnswerIndex:
+    """
+    Looks up which problems share a wrong answer. Answers are stored as sorted dictionary codes, so
+    a lookup is a binary search over the codes rather than a scan of every course.
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        answers = table["answer"]
+        if not answers.cat.categories.is_monotonic_increasing:
+            table = table.assign(answer=answers.cat.reorder_categories(sorted(answers.cat.categories)))
+        if not table["answer"].cat.codes.is_monotonic_increasing:
+            table = table.sort_values("answer", kind="stable").reset_index(drop=True)
+        self.table = table
+        self._codes = table["answer"].cat.codes.to_numpy()
+
+    def lookup(self, answer: str) -> pd.DataFrame:
+        """
+        Returns every (course, document, pointer, slot) whose wrong answer normalizes like answer,
+        most common (highest percent) first.
+        """
+        normalized = normalize_answers(pd.Series([answer])).iloc[0]
+        categories = self.table["answer"].cat.categories
+        if normalized is None or normalized not in categories:
+            return self.table.iloc[0:0]
+        code = categories.get_loc(normalized)
+        start, stop = np.searchsorted(self._codes, [code, code + 1])
+        return self.table.iloc[start:stop].sort_values("percent", ascending=False)
+
+    def shared_answers(self, min_problems: int = 2) -> pd.DataFrame:
+        """
+        Returns the answers that occur in at least min_problems problems, with the number of
+        problems and courses they occur in, most widespread first.
+        """
+        problem_cols = [col for col in ["answer", "course", "document_id", "pointer"] if col in self.table.columns]
+        problems = self.table[problem_cols].drop_duplicates()
+        grouped = problems.groupby("answer", observed=True)
+        counts = pd.DataFrame({"problems": grouped.size(), "courses": grouped["course"].nunique()})
+        counts = counts[counts["problems"] >= min_problems]
+        return counts.sort_values(["problems", "courses"], ascending=False).reset_index()
+
+
+def answer_index_path(processed_dir: Path) -> Path:
+    return Path(processed_dir) / ANSWER_INDEX_NAME
+
+
+def write_answer_index(processed_dir: Path, course_files) -> Path | None:
+    """
+    Builds the answer index over course_files and stores it in processed_dir. Returns its path,
+    or None when pyarrow isn't installed (load_answer_index then builds it on demand).
+    """
+    if not columnar_available():
+        print("pyarrow is not installed; skipping the answer index.")
+        return None
+    path = answer_index_path(processed_dir)
+    tmp_path = path.with_name(path.name + ".tmp")
+    write_columnar(build_answer_index(course_files), tmp_path)
+    tmp_path.replace(path)
+    print(f"Answer index saved to {path}")
+    return path
+
+
+def update_answer_index(processed_dir: Path, course_files, changed_files) -> Path | None:
+    """
+    Brings the stored answer index up to date after the courses in changed_files were reprocessed
+    or removed: their rows are replaced (or dropped), and only those courses are read. Without a
+    stored index, or one from before the course_file column, rebuilds it from course_files with
+    write_answer_index. Returns its path, or None when pyarrow isn't installed.
+    """
+    path = answer_index_path(processed_dir)
+    if not columnar_available() or not path.exists():
+        return write_answer_index(processed_dir, course_files)
+    index = read_columnar(path)
+    if "course_file" not in index.columns:
+        return write_answer_index(processed_dir, course_files)
+
+    changed_names = {Path(course_file).name for course_file in changed_files}
+    present = [course_file for course_file in changed_files if processed_source(course_file).exists()]
+    kept = index[~index["course_file"].astype(str).isin(changed_names)]
+    index = _sorted_index(pd.concat([kept, build_answer_index(present)], ignore_index=True))
+    tmp_path = path.with_name(path.name + ".tmp")
+    write_columnar(index, tmp_path)
+    tmp_path.replace(path)
+    print(f"Answer index updated for {len(changed_names)} course(s) in {path}")
+    return path
+
+
+def load_answer_index(processed_dir: Path) -> AnswerIndex:
+    """
+    Returns the answer index of processed_dir: the stored one when it is at least as new as every
+    processed course, otherwise one built from the course files.
+    """
+    course_files = sorted(Path(processed_dir).glob("*_cleaned.csv"))
+    path = answer_index_path(processed_dir)
+    if path.exists() and columnar_available():
+        newest = max((processed_source(f).stat().st_mtime_ns for f in course_files), default=0)
+        if path.stat().st_mtime_ns >= newest:
+            return AnswerIndex(read_columnar(path))
+    return AnswerIndex(build_answer_index(course_files))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Find the problems that share a wrong answer.")
+    parser.add_argument("answer", nargs="?", help="Wrong answer to look up (omit to list widely shared answers).")
+    parser.add_argument(
+        "--processed-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent.parent / "data" / "processed",
+        help="Directory with processed courses (default: data/processed).",
+    )
+    parser.add_argument("--limit", type=int, default=20, help="Rows to print.")
+    args = parser.parse_args(argv)
+
+    index = load_answer_index(args.processed_dir)
+    if args.answer is None:
+        result = index.shared_answers()
+    else:
+        result = index.lookup(args.answer)[["course", "document_name", "pointer", "slot", "percent"]]
+    print(result.head(args.limit).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
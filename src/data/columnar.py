@@ -0,0 +1,110 @@
+import importlib.util
+from pathlib import Path
+
+import pandas as pd
+
+COLUMNAR_SUFFIX = ".parquet"
+
+# Typed schema for the columnar output. Everything not listed here keeps its inferred dtype.
+CATEGORICAL_COLUMNS = ["document_name", "pointer", "course"]
+INT32_COLUMNS = ["document_id", "version", "num_responses"]
+FLOAT64_COLUMNS = ["total_fails"]
+INT8_COLUMNS = ["schema_version"]
+
+
+def columnar_available() -> bool:
+    """
+    Returns True if a Parquet engine (pyarrow) is installed.
+    """
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def columnar_path(csv_path: Path) -> Path:
+    """
+    Returns the columnar file that sits next to a processed CSV,
+    e.g. algebra_a_data_cleaned.csv -> algebra_a_data_cleaned.parquet.
+    """
+    return Path(csv_path).with_suffix(COLUMNAR_SUFFIX)
+
+
+def apply_columnar_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns a copy of df cast to the explicit columnar schema:
+      - document_name, pointer, course: categorical
+      - response columns (e.g. failed1_response): categorical, i.e. dictionary-encoded strings
+      - percentage columns (any column with "%" in its name) and total_fails: float64, so they read
+        back exactly as from the CSV (summaries print the raw percentages)
+      - document_id, version, num_responses: int32 (left alone if they have missing values)
+      - schema_version: int8
+    """
+    dtypes = {}
+    for col in df.columns:
+        if col in INT32_COLUMNS:
+            if df[col].notna().all():
+                dtypes[col] = "int32"
+        elif col in CATEGORICAL_COLUMNS or col.lower().endswith("_response"):
+            dtypes[col] = "category"
+        elif "%" in col or col in FLOAT64_COLUMNS:
+            dtypes[col] = "float64"
+        elif col in INT8_COLUMNS:
+            dtypes[col] = "int8"
+    return df.astype(dtypes)
+
+
+def write_columnar(df: pd.DataFrame, path: Path):
+    """
+    Writes df to a Parquet file using the columnar schema.
+    """
+    apply_columnar_schema(df).to_parquet(path, index=False, engine="pyarrow")
+
+
+class ColumnarWriter:
+    """
+    Writes a DataFrame to a Parquet file in one or more chunks, each cast to the columnar schema.
+    Chunks become row groups of the same file, so large inputs can be written incrementally.
+
+    Each chunk's categoricals have their own categories; every dictionary column is stored with
+    int32 indices so the chunks share one file schema, and readers merge the dictionaries. Later
+    chunks are reindexed to the first chunk's columns (columns it lacks are dropped, missing ones
+    written as nulls), like CsvSummaryWriter does, so chunks from courses with different columns
+    still fit the schema.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._schema is not None:
+            df = df.reindex(columns=self._schema.names)
+        table = pa.Table.from_pandas(apply_columnar_schema(df), preserve_index=False)
+        if self._writer is None:
+            fields = []
+            for field in table.schema:
+                if pa.types.is_dictionary(field.type):
+                    field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+                fields.append(field)
+            self._schema = pa.schema(fields, metadata=table.schema.metadata)
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(table.cast(self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_columnar(path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Reads a Parquet file written by write_columnar. Categorical columns come back as categoricals.
+    """
+    return pd.read_parquet(path, columns=columns, engine="pyarrow")
@@ -0,0 +1,320 @@
+import argparse
+import os
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from .derived import add_derived_columns, has_derived_columns
+from .loader import load_processed_data, processed_source
+from .summary import build_summary_table
+
+COURSE_DB_NAME = "courses.sqlite"
+TABLE = "problems"
+
+# Rows the dashboard never shows (see filter_data): a combined wrong percentage of 99% or more, or
+# a %failed of 100%.
+VALID_ROWS = '"%wrong_combined" < 99 AND "%failed" < 100'
+
+# Columns with their own index, so filtering on them and sorting by them doesn't scan the table.
+INDEXED_COLUMNS = ["num_responses", "%failed", "%giveup", "%trigger_goto", "%wrong_combined"]
+
+# Columns build_summary_table works from.
+SUMMARY_SOURCE_COLUMNS = [
+    "document_name",
+    "pointer",
+    "num_responses",
+    "%failed",
+    "%giveup",
+    "%trigger_goto",
+    "%failed1",
+    "failed1_response",
+    "%failed2",
+    "failed2_response",
+    "%failed3",
+    "failed3_response",
+    "%wrong_combined",
+]
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def course_db_path(processed_dir: Path) -> Path:
+    return Path(processed_dir) / COURSE_DB_NAME
+
+
+def _append_course(con: sqlite3.Connection, df: pd.DataFrame):
+    existing = {row[1] for row in con.execute(f"PRAGMA table_info({TABLE})")}
+    if not existing:
+        categorical = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+        df.astype({col: object for col in categorical}).to_sql(TABLE, con, index=False, chunksize=10_000)
+        return
+    # Courses processed with an older schema may lack a column the others have, or vice versa.
+    for col in df.columns:
+        if col not in existing:
+            con.execute(f"ALTER TABLE {TABLE} ADD COLUMN {_quote(col)}")
+    # Inserted directly rather than with to_sql, which commits: update_course_db replaces a course
+    # in one transaction.
+    values = df.astype(object).where(df.notna(), None)
+    sql = f"INSERT INTO {TABLE} ({', '.join(map(_quote, df.columns))}) VALUES ({', '.join('?' * len(df.columns))})"
+    con.executemany(sql, values.itertuples(index=False, name=None))
+
+
+def _append_course_file(con: sqlite3.Connection, course_file):
+    df = load_processed_data(course_file)
+    if not has_derived_columns(df):
+        add_derived_columns(df)
+    df["course_file"] = Path(course_file).name
+    _append_course(con, df)
+
+
+def _create_indexes(con: sqlite3.Connection):
+    # Index names follow INDEXED_COLUMNS, so columns added by a later course get theirs too.
+    columns = {row[1] for row in con.execute(f"PRAGMA table_info({TABLE})")}
+    if "course_file" in columns:
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_course_file ON {TABLE} (course_file, num_responses)")
+    if "document_id" in columns:
+        con.execute(f"CREATE INDEX IF NOT EXISTS idx_document_id ON {TABLE} (document_id)")
+    for i, col in enumerate(INDEXED_COLUMNS):
+        if col in columns:
+            con.execute(f"CREATE INDEX IF NOT EXISTS idx_{i} ON {TABLE} ({_quote(col)})")
+
+
+def write_course_db(processed_dir: Path, course_files) -> Path:
+    """
+    Loads every processed course in course_files into one SQLite table (with the derived columns,
+    and a course_file column naming the processed CSV each row came from), indexes it for the
+    dashboard's filters and sort options, and stores it in processed_dir. Courses are loaded one at
+    a time, so memory stays bounded by the largest course. Returns the database path.
+    """
+    path = course_db_path(processed_dir)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    con = sqlite3.connect(tmp_path)
+    try:
+        for course_file in course_files:
+            _append_course_file(con, course_file)
+        _create_indexes(con)
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp_path, path)
+    print(f"Course database saved to {path}")
+    return path
+
+
+def update_course_db(processed_dir: Path, course_files, changed_files) -> Path:
+    """
+    Brings the course database up to date after the courses in changed_files were reprocessed or
+    removed: their rows are deleted and the courses that still exist reloaded, so only those are
+    read. Everything happens in one transaction on the live database, so readers (which only see
+    committed state) never see a course half replaced, and a failed update changes nothing.
+    Without a database, or one without the course_file column, rebuilds it from course_files with
+    write_course_db.
+    """
+    path = course_db_path(processed_dir)
+    if not path.exists() or "course_file" not in CourseDB(path).columns:
+        return write_course_db(processed_dir, course_files)
+    con = sqlite3.connect(path)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        for course_file in changed_files:
+            con.execute(f"DELETE FROM {TABLE} WHERE course_file = ?", (Path(course_file).name,))
+            if processed_source(course_file).exists():
+                _append_course_file(con, course_file)
+        _create_indexes(con)
+        con.commit()
+    finally:
+        # Closing without a commit rolls the transaction back.
+        con.close()
+    print(f"Course database updated for {len(changed_files)} course(s) in {path}")
+    return path
+
+
+class CourseDB:
+    """
+    Read-only queries over the course database written by write_course_db. Filters, sorting and
+    paging run inside SQLite, and only the requested columns of the matching rows are returned,
+    so the dashboard doesn't need whole courses in memory.
+
+    courses selects the rows of some processed files. It is either a list of course files or, like
+    load_all_courses_index, a dict of course name -> course file; with a dict, the returned 'course'
+    column holds the dict keys (categorical, in dict order) and unsorted rows follow the dict order.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self._connect() as con:
+            self.columns = [row[1] for row in con.execute(f"PRAGMA table_info({TABLE})")]
+
+    def _connect(self) -> sqlite3.Connection:
+        # A fresh connection per query keeps the object usable from any Streamlit session thread.
+        return sqlite3.connect(self.path.resolve().as_uri() + "?mode=ro", uri=True)
+
+    def _check_columns(self, columns):
+        unknown = [col for col in columns if col not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {unknown}")
+
+    @staticmethod
+    def _course_names(courses) -> list[str]:
+        return [Path(course_file).name for course_file in (courses.values() if isinstance(courses, dict) else courses)]
+
+    def _where(self, courses, min_attempts, valid_only: bool = True, document_id=None) -> tuple[str, list]:
+        clauses, params = [VALID_ROWS] if valid_only else [], []
+        if courses is not None:
+            names = self._course_names(courses)
+            clauses.append(f"course_file IN ({', '.join('?' * len(names))})" if names else "0")
+            params.extend(names)
+        if min_attempts is not None and "num_responses" in self.columns:
+            clauses.append("num_responses >= ?")
+            params.append(min_attempts)
+        if document_id is not None:
+            clauses.append("document_id = ?")
+            # sqlite3 can't bind numpy scalars (e.g. an id taken from a DataFrame).
+            params.append(document_id.item() if hasattr(document_id, "item") else document_id)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, courses=None, min_attempts: int | None = None, document_id=None) -> int:
+        """
+        Returns the number of rows filter_data would keep (for the given courses and document).
+        """
+        where, params = self._where(courses, min_attempts, document_id=document_id)
+        with self._connect() as con:
+            return con.execute(f"SELECT COUNT(*) FROM {TABLE}{where}", params).fetchone()[0]
+
+    def max_value(self, column: str, courses=None):
+        """
+        Returns the largest value of column over every row of the given courses (None if there are none).
+        """
+        self._check_columns([column])
+        where, params = self._where(courses, None, valid_only=False)
+        with self._connect() as con:
+            return con.execute(f"SELECT MAX({_quote(column)}) FROM {TABLE}{where}", params).fetchone()[0]
+
+    def fetch(
+        self,
+        columns=None,
+        courses=None,
+        min_attempts: int | None = None,
+        sort_by: str | None = None,
+        limit: int | None = None,
+        offset: int = 0,
+        document_id=None,
+    ) -> pd.DataFrame:
+        """
+        Returns the given columns (default: all) of the rows filter_data(df, min_attempts) would keep,
+        sorted by sort_by in descending order (missing values last) or in their original order,
+        optionally just limit rows starting at offset (e.g. one page of the dashboard table).
+        With document_id, only that document's pointers are returned (a drill-down).
+        """
+        columns = list(self.columns if columns is None else columns)
+        by_name = isinstance(courses, dict)
+        selected = [col for col in columns if not (by_name and col == "course")]
+        self._check_columns(selected + ([sort_by] if sort_by else []))
+
+        where, params = self._where(courses, min_attempts, document_id=document_id)
+        select = [_quote(col) for col in selected]
+        order = [f"{_quote(sort_by)} DESC"] if sort_by else []
+        if by_name:
+            names = self._course_names(courses)
+            position = "CASE course_file " + " ".join(f"WHEN ? THEN {i}" for i in range(len(names))) + " END"
+            select.append(f"{position} AS course_position")
+            order.append("course_position")
+            params = names + params
+        order.append("rowid")
+        sql = f"SELECT {', '.join(select)} FROM {TABLE}{where} ORDER BY {', '.join(order)}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [limit, offset]
+
+        with self._connect() as con:
+            df = pd.read_sql_query(sql, con, params=params)
+        if by_name:
+            dtype = pd.CategoricalDtype(list(courses))
+            df["course"] = pd.Categorical.from_codes(df.pop("course_position").to_numpy(), dtype=dtype)
+        if "top three wrong answers" in df.columns:
+            df["top three wrong answers"] = df["top three wrong answers"].fillna("")
+        return df[columns]
+
+    def document_failures(self, courses=None, min_attempts: int | None = None, document_id=None) -> pd.DataFrame:
+        """
+        Returns, for the rows filter_data(df, min_attempts) would keep, one row per document and course
+        (document_id, document_name, course, num_responses, %failed): the summed num_responses and the
+        response-weighted %failed, aggregated in SQLite. compare_documents_across_courses gives the
+        same result for these rows as for the pointer rows themselves. courses is like for fetch; the
+        course column holds the course file unless courses is a dict.
+        """
+        self._check_columns(["document_id", "document_name", "num_responses", "%failed"])
+        where, params = self._where(courses, min_attempts, document_id=document_id)
+        # With a single MIN() aggregate, SQLite takes the bare document_name from that (first) row.
+        sql = (
+            "SELECT document_id, course_file, document_name, MIN(rowid) AS first_row, "
+            'SUM(COALESCE("%failed", 0) / 100.0 * num_responses) AS fails, SUM(num_responses) AS num_responses '
+            f"FROM {TABLE}{where} GROUP BY document_id, course_file ORDER BY first_row"
+        )
+        with self._connect() as con:
+            df = pd.read_sql_query(sql, con, params=params)
+        if isinstance(courses, dict):
+            names = {Path(course_file).name: course for course, course_file in courses.items()}
+            df["course"] = pd.Categorical(df.pop("course_file").map(names), categories=list(courses))
+        else:
+            df["course"] = df.pop("course_file")
+        df["%failed"] = df.pop("fails") / df["num_responses"] * 100
+        return df[["document_id", "document_name", "course", "num_responses", "%failed"]]
+
+    def summary_table(self, courses=None, min_attempts: int | None = None, sort_by=None, limit=None) -> pd.DataFrame:
+        """
+        Returns build_summary_table of the matching rows, reading only the columns it needs.
+        """
+        columns = [col for col in SUMMARY_SOURCE_COLUMNS if col in self.columns]
+        return build_summary_table(self.fetch(columns, courses, min_attempts, sort_by, limit))
+
+
+def open_course_db(processed_dir: Path, course_files=()) -> CourseDB | None:
+    """
+    Returns the course database of processed_dir, or None when there is none or it is older than
+    one of course_files (it is then rebuilt by the next process_all run).
+    """
+    path = course_db_path(processed_dir)
+    if not path.exists():
+        return None
+    built = path.stat().st_mtime_ns
+    for course_file in course_files:
+        source = processed_source(course_file)
+        if not source.exists() or source.stat().st_mtime_ns > built:
+            return None
+    return CourseDB(path)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the processed courses without loading them whole.")
+    parser.add_argument(
+        "--processed-dir",
+        type=Path,
+        default=Path(__file__).resolve().parent.parent.parent / "data" / "processed",
+        help="Directory with processed courses (default: data/processed).",
+    )
+    parser.add_argument("--build", action="store_true", help="(Re)build the database before querying.")
+    parser.add_argument(
+        "--course-file", action="append", help="Only rows of this processed CSV, e.g. algebra_a_data_cleaned.csv."
+    )
+    parser.add_argument("--min-responses", type=int, default=0, help="Minimum num_responses (default: 0).")
+    parser.add_argument("--sort-by", default="%wrong_combined", help="Column to sort by, descending.")
+    parser.add_argument("--limit", type=int, default=20, help="Rows to print.")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        write_course_db(args.processed_dir, sorted(args.processed_dir.glob("*_cleaned.csv")))
+    if not course_db_path(args.processed_dir).exists():
+        parser.error("No course database yet; run process_all or pass --build.")
+    db = CourseDB(course_db_path(args.processed_dir))
+    table = db.summary_table(args.course_file, args.min_responses, args.sort_by, args.limit)
+    print(table.drop(columns=[col for col in table.columns if col.startswith("failed")]).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,48 @@
+import pandas as pd
+
+from .summary import summarize_wrong_answers_vectorized
+
+# Bump whenever the definition of a derived column changes. Processed files whose
+# 'schema_version' doesn't match get their derived columns recomputed on load.
+DERIVED_SCHEMA_VERSION = 1
+
+DERIVED_COLUMNS = ["%wrong_combined", "total_fails", "top three wrong answers", "schema_version"]
+
+
+def wrong_combined(df: pd.DataFrame) -> pd.Series:
+    """
+    Returns %wrong_combined: the sum of %failed1, %failed2 and %failed3 (missing values count as 0).
+    """
+    return df["%failed1"].fillna(0) + df["%failed2"].fillna(0) + df["%failed3"].fillna(0)
+
+
+def total_fails(df: pd.DataFrame) -> pd.Series:
+    """
+    Returns total_fails: the actual number of fails, (%failed / 100) * num_responses.
+    """
+    return (df["%failed"].fillna(0) / 100) * df["num_responses"].fillna(0)
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the derived columns to a cleaned frame (in place) and returns it:
+      - %wrong_combined
+      - total_fails (if %failed and num_responses are present)
+      - top three wrong answers (the dashboard's rounded summary string)
+      - schema_version (DERIVED_SCHEMA_VERSION)
+    """
+    df["%wrong_combined"] = wrong_combined(df)
+    if "%failed" in df.columns and "num_responses" in df.columns:
+        df["total_fails"] = total_fails(df)
+    df["top three wrong answers"] = summarize_wrong_answers_vectorized(df, round_pct=True)
+    df["schema_version"] = DERIVED_SCHEMA_VERSION
+    return df
+
+
+def has_derived_columns(df: pd.DataFrame) -> bool:
+    """
+    Returns True if df carries derived columns written with the current DERIVED_SCHEMA_VERSION.
+    """
+    if "schema_version" not in df.columns or "top three wrong answers" not in df.columns:
+        return False
+    return bool((df["schema_version"] == DERIVED_SCHEMA_VERSION).all())
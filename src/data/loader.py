@@ -1,8 +1,11 @@
 import os
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from .columnar import COLUMNAR_SUFFIX, columnar_available, columnar_path, read_columnar
+
 
 def load_csv_data(filename: str) -> pd.DataFrame:
     """
@@ -23,31 +26,107 @@ def load_csv_data(filename: str) -> pd.DataFrame:
     return df
 
 
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
+def clean_data_with_report(df: pd.DataFrame, copy: bool = True) -> tuple[pd.DataFrame, dict]:
     """
-    Cleans and preprocesses the data for analysis.
+    Cleans and preprocesses the data for analysis, and reports what was coerced.
 
-    - Converts any column whose name contains "%" to a numeric type.
+    - Converts any column whose name contains "%" to a float type.
     - Fills missing numeric values in percentage columns with 0.
     - Fills missing response columns (like 'failed3_response') with empty strings.
 
+    Each column group is found once and coerced according to its dtype: missing values in the numeric
+    percentage columns are counted in one pass and only the columns that need it are cast and
+    zero-filled (together, as one block); text ones are parsed. Columns that are already clean
+    (floats or responses without missing values) are not rewritten at all.
+
     Parameters:
         df (pd.DataFrame): The raw data.
+        copy (bool): If True (default), df is left untouched and a new frame is returned. Only the
+            cleaned columns are new; the other columns are shared with df. If False, df is cleaned
+            in place and returned.
 
     Returns:
-        pd.DataFrame: The cleaned data.
+        tuple[pd.DataFrame, dict]: The cleaned data, and the per-column coercion counts:
+            {"percent": {column: values that were missing or unparseable and became 0},
+             "response": {column: values that were missing and became ""}}
     """
+    result = df.copy(deep=False) if copy else df
+    report = {"percent": {}, "response": {}}
+
     # Identify columns with "%" in the name (e.g., %failed, %giveup, %trigger_goto, %failed1, etc.)
     percent_cols = [col for col in df.columns if "%" in col]
-    for col in percent_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+    numeric_cols = [col for col in percent_cols if pd.api.types.is_numeric_dtype(df[col].dtype)]
+    text_cols = [col for col in percent_cols if col not in numeric_cols]
+    if numeric_cols:
+        # One pass over the whole numeric group to count missing values. Float columns without
+        # missing values are already clean and are not rewritten at all.
+        missing_counts = df[numeric_cols].isna().sum()
+        dirty_cols = [col for col in numeric_cols if missing_counts[col] or df[col].dtype != np.float64]
+        if dirty_cols:
+            result[dirty_cols] = df[dirty_cols].astype(float).fillna(0)
+        report["percent"].update(missing_counts.astype(int).to_dict())
+    for col in text_cols:
+        # pd.to_numeric only takes one column at a time.
+        parsed = pd.to_numeric(df[col], errors="coerce")
+        report["percent"][col] = int(parsed.isna().sum())
+        result[col] = parsed.fillna(0).astype(float)
+    report["percent"] = {col: report["percent"][col] for col in percent_cols}
 
     # Identify columns that contain responses. Adjust the list if you have more columns.
-    response_cols = [col for col in df.columns if "response" in col.lower()]
-    for col in response_cols:
-        df[col] = df[col].fillna("")
+    response_cols = [col for col in result.columns if "response" in col.lower()]
+    if response_cols:
+        report["response"] = result[response_cols].isna().sum().to_dict()
+        # Only columns that actually have missing values need filling.
+        for col in response_cols:
+            if report["response"][col]:
+                result[col] = result[col].fillna("")
 
-    return df
+    return result, report
+
+
+def clean_data(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
+    """
+    Cleans and preprocesses the data for analysis (see clean_data_with_report).
+
+    Parameters:
+        df (pd.DataFrame): The raw data.
+        copy (bool): If True (default), df is left untouched; if False, df is cleaned in place.
+
+    Returns:
+        pd.DataFrame: The cleaned data.
+    """
+    return clean_data_with_report(df, copy=copy)[0]
+
+
+def processed_source(csv_path) -> Path:
+    """
+    Returns the file to read for a processed course: the columnar (Parquet) file written next to
+    the CSV when it exists, is at least as new as the CSV, and pyarrow is installed; otherwise the CSV.
+    """
+    csv_path = Path(csv_path)
+    parquet_path = columnar_path(csv_path)
+    if parquet_path.exists() and columnar_available():
+        if not csv_path.exists() or parquet_path.stat().st_mtime_ns >= csv_path.stat().st_mtime_ns:
+            return parquet_path
+    return csv_path
+
+
+def load_processed_data(csv_path) -> pd.DataFrame:
+    """
+    Loads a processed course file, preferring its typed columnar version (see processed_source).
+
+    Parameters:
+        csv_path: Path to the processed CSV (e.g. "data/processed/algebra_a_data_cleaned.csv").
+
+    Returns:
+        pd.DataFrame: The processed data.
+    """
+    source = processed_source(csv_path)
+    if source.suffix == COLUMNAR_SUFFIX:
+        return read_columnar(source)
+    # Wrong answers repeat a lot within a course; dictionary-encode them like the columnar copy does.
+    header = pd.read_csv(source, nrows=0).columns
+    return pd.read_csv(source, dtype={col: "category" for col in header if col.endswith("_response")})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+
+
+def manifest_path(processed_dir: Path) -> Path:
+    """
+    Returns the location of the manifest inside processed_dir.
+    """
+    return Path(processed_dir) / MANIFEST_NAME
+
+
+def load_manifest(processed_dir: Path) -> dict:
+    """
+    Loads the manifest from processed_dir. A missing or unreadable manifest is treated as empty,
+    which simply means every raw file gets processed again.
+
+    The manifest maps each raw file name to what was recorded when it was last processed:
+      {"files": {"algebra_a_data.csv": {"sha256", "size", "mtime_ns", "cleaning_version", "rows", "outputs"}}}
+    """
+    try:
+        with open(manifest_path(processed_dir)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+    if not isinstance(manifest.get("files"), dict):
+        return {"files": {}}
+    return manifest
+
+
+def save_manifest(processed_dir: Path, manifest: dict):
+    """
+    Writes the manifest to processed_dir. The file is replaced atomically so an interrupted run
+    never leaves a half-written manifest behind.
+    """
+    path = manifest_path(processed_dir)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 hex digest of a file, read in chunks so large exports aren't loaded whole.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_up_to_date(entry: dict | None, raw_filepath: Path, processed_dir: Path, cleaning_version: int | str) -> bool:
+    """
+    Returns True if raw_filepath doesn't need processing again, i.e. it was processed with the
+    current cleaning_version, all its recorded outputs still exist, and its content is unchanged.
+
+    Size and mtime are checked first; the file is only hashed when they differ (e.g. after a copy
+    that touched the file without changing it). When the hash still matches, entry's size and
+    mtime are refreshed so the next run can skip hashing.
+    """
+    if not entry or entry.get("cleaning_version") != cleaning_version:
+        return False
+    if not all((Path(processed_dir) / name).exists() for name in entry.get("outputs", [])):
+        return False
+
+    stat = raw_filepath.stat()
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    if entry.get("size") != stat.st_size or entry.get("sha256") != file_digest(raw_filepath):
+        return False
+
+    entry["mtime_ns"] = stat.st_mtime_ns
+    return True
+
+
+def file_state(raw_filepath: Path) -> dict:
+    """
+    Returns the content hash, size and mtime of a raw file, as recorded in its manifest entry.
+    Take it before processing the file: if the export is rewritten meanwhile, the entry then
+    describes the content that was processed, and the next run sees the change.
+    """
+    stat = raw_filepath.stat()
+    return {"sha256": file_digest(raw_filepath), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def make_entry(state: dict, cleaning_version: int | str, rows: int, outputs: list[Path]) -> dict:
+    """
+    Builds the manifest entry for a raw file that was just processed, from its file_state taken
+    before processing.
+    """
+    return {
+        "sha256": state["sha256"],
+        "size": state["size"],
+        "mtime_ns": state["mtime_ns"],
+        "cleaning_version": cleaning_version,
+        "rows": rows,
+        "outputs": sorted(Path(output).name for output in outputs),
+    }
+
+
+def prune_removed(manifest: dict, raw_names: set[str], processed_dir: Path) -> list[str]:
+    """
+    Deletes the outputs of every raw file recorded in the manifest that is no longer in raw_names,
+    and drops those entries. Returns the names of the pruned raw files.
+    """
+    removed = sorted(name for name in manifest["files"] if name not in raw_names)
+    for name in removed:
+        for output in manifest["files"].pop(name).get("outputs", []):
+            (Path(processed_dir) / output).unlink(missing_ok=True)
+    return removed
@@ -1,51 +1,302 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 import pandas as pd
 
+from src.utils.instrumentation import (
+    configure_logging,
+    enable_instrumentation,
+    instrumentation_enabled,
+    instrumented,
+)
+
+from .answer_index import answer_index_path, update_answer_index
+from .columnar import ColumnarWriter, columnar_available, columnar_path
+from .course_db import course_db_path, update_course_db
+from .derived import add_derived_columns
 from .loader import clean_data  # Reuse our cleaning function
+from .manifest import file_state, is_up_to_date, load_manifest, make_entry, prune_removed, save_manifest
+from .rollups import ROLLUP_SOURCE_COLUMNS, document_rollup, rollup_path
+from .sketch import QuantileSketch, rows_in_bounds, sketch_path, sketch_seed, write_sketch
+from .versions import DELTA_COLUMNS, VERSION_MODES, collapse_versions, problem_keys, version_deltas
+
+# Bump whenever clean_data/process_file change what they write, so the manifest
+# treats every previously processed file as stale.
+CLEANING_VERSION = 8
+
+VERSIONS_SUFFIX = ".versions.csv"
+
+
+def course_name_for(raw_filepath: Path) -> str:
+    """
+    Derives a course name from the raw filename.
+    We'll replace underscores with spaces and then apply title-case.
+    For files ending with '_data', we want a special rule.
+    """
+    raw_stem = raw_filepath.stem
+    if raw_stem.lower() == "dummy_data":
+        return "Dummy Data"
+    elif raw_stem.endswith("_data"):
+        # Remove the trailing '_data' and then replace underscores with spaces.
+        return raw_stem.replace("_data", "").replace("_", " ").title()
+    return raw_stem.replace("_", " ").title()
+
+
+def read_raw_csv(raw_filepath: Path, chunksize: int | None = None):
+    """
+    Reads a raw export. Response columns are always read as text, so a response like '05' or '1.50'
+    is kept verbatim instead of depending on what the rest of the column (or chunk) looks like.
+    With chunksize, returns an iterator of DataFrames with at most that many rows each.
+    """
+    header = pd.read_csv(raw_filepath, nrows=0).columns
+    dtype = {col: "str" for col in header if col.lower().endswith("_response")}
+    return pd.read_csv(raw_filepath, dtype=dtype, chunksize=chunksize)
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(path.name + ".tmp")
+
+
+def versions_path(processed_filepath: Path) -> Path:
+    """
+    Returns where process_file stores the version index of a processed CSV (see version_deltas).
+    """
+    return processed_filepath.with_name(processed_filepath.stem + VERSIONS_SUFFIX)
+
+
+def _clean_chunk(df: pd.DataFrame, course_name: str) -> pd.DataFrame:
+    """
+    Cleans one DataFrame (the whole file or one chunk of it), adds the course column and
+    materializes the derived columns (%wrong_combined, total_fails, the summary string).
+    """
+    # Clean the data using our cleaning function. df was just read, so clean it in place.
+    df_cleaned = clean_data(df, copy=False)
+    if "course" not in df_cleaned.columns:
+        df_cleaned["course"] = course_name
+    return add_derived_columns(df_cleaned)
 
 
-def process_file(raw_filepath: Path, processed_dir: Path):
+@instrumented("process_file")
+def process_file(raw_filepath: Path, processed_dir: Path, chunksize: int | None = None, versions: str = "all") -> int:
     """
     Processes a single CSV file:
       - Reads the CSV file from raw_filepath.
       - Cleans it using clean_data().
       - Adds a course identifier based on the filename.
+      - Adds the derived columns (see src/data/derived.py), so readers don't recompute them.
       - Saves the cleaned data to processed_dir, appending '_cleaned' to the filename.
+      - Also saves a typed columnar copy ('_cleaned.parquet') when pyarrow is installed.
+      - Saves a mergeable sketch of num_responses ('_cleaned.sketch.json', see src/data/sketch.py)
+        over the rows summarize_course keeps by default (0 < %wrong_combined < 99), built while the
+        chunks stream through, for approximate percentile cutoffs across courses.
+      - Saves the version index ('_cleaned.versions.csv', see src/data/versions.py): every version
+        of each problem with its %failed and the change since the previous version. Only written
+        when the export has a version column.
+      - Saves the per-document rollup ('_cleaned.documents.csv', see src/data/rollups.py) of the
+        rows written, so the dashboard can list documents without loading every pointer.
+    Returns the number of rows written.
+
+    versions (one of VERSION_MODES) decides what happens to problems exported with several
+    versions: "all" writes every version's rows, "latest" only the latest version's and "aggregate"
+    one response-weighted row per problem (see collapse_versions). The version index always covers
+    every version.
+
+    With chunksize, the raw file is streamed: at most chunksize rows are read, cleaned and appended
+    to the outputs at a time, so memory stays bounded for exports larger than RAM. clean_data works
+    row by row and gives percentage/response columns fixed dtypes, so the output is identical to the
+    in-memory path (as long as the id/count columns have no missing values, which would change their
+    dtype in some chunks only). When versions isn't "all", each chunk is collapsed together with
+    the rows kept from the previous ones and the result is written at the end, so memory is bounded
+    by the number of distinct problems rather than rows.
+
+    Outputs are written to temporary files and moved into place at the end, so readers never see
+    a partially written file.
     """
-    # Read the CSV directly from the provided raw_filepath.
-    df = pd.read_csv(raw_filepath)
+    if versions not in VERSION_MODES:
+        raise ValueError(f"Unknown version mode: {versions!r} (expected one of {VERSION_MODES})")
+    course_name = course_name_for(raw_filepath)
 
-    # Clean the data using our cleaning function.
-    df_cleaned = clean_data(df)
+    # Define the output file paths in the processed directory.
+    processed_filepath = processed_dir / f"{raw_filepath.stem}_cleaned.csv"
+    parquet_filepath = columnar_path(processed_filepath)
+    write_columnar_copy = columnar_available()
+    if not write_columnar_copy:
+        print("pyarrow is not installed; skipping columnar output.")
 
-    # Derive a course name from the filename.
-    # We'll replace underscores with spaces and then apply title-case.
-    # For files ending with '_data', we want a special rule.
-    raw_stem = raw_filepath.stem
-    if raw_stem.lower() == "dummy_data":
-        course_name = "Dummy Data"
-    elif raw_stem.endswith("_data"):
-        # Remove the trailing '_data' and then replace underscores with spaces.
-        course_name = raw_stem.replace("_data", "").replace("_", " ").title()
+    if chunksize:
+        chunks = read_raw_csv(raw_filepath, chunksize=chunksize)
     else:
-        course_name = raw_stem.replace("_", " ").title()
+        chunks = [read_raw_csv(raw_filepath)]
 
-    if "course" not in df_cleaned.columns:
-        df_cleaned["course"] = course_name
+    csv_tmp, parquet_tmp = _tmp_path(processed_filepath), _tmp_path(parquet_filepath)
+    rows = 0
+    # Seeded by file name: the sketch's compaction is randomized, and the same export must give the
+    # same sketch (and global cutoff) every time it is processed.
+    sketch = QuantileSketch(seed=sketch_seed(raw_filepath.name))
+    # The columns version_deltas needs, from every chunk; and the rows kept so far when collapsing.
+    version_parts = []
+    pending = None
+    # The columns document_rollup needs, from every row written.
+    rollup_parts = []
+    try:
+        with open(csv_tmp, "w", newline="") as csv_out:
+            columnar_out = ColumnarWriter(parquet_tmp) if write_columnar_copy else None
 
-    # Define the output file path in the processed directory.
-    processed_filepath = processed_dir / f"{raw_filepath.stem}_cleaned.csv"
-    df_cleaned.to_csv(processed_filepath, index=False)
+            def write_rows(df_out: pd.DataFrame):
+                nonlocal rows
+                df_out.to_csv(csv_out, header=csv_out.tell() == 0, index=False)
+                if columnar_out is not None:
+                    columnar_out.write(df_out)
+                if "num_responses" in df_out.columns:
+                    in_bounds = df_out.loc[rows_in_bounds(df_out), "num_responses"]
+                    sketch.update(in_bounds.to_numpy(dtype=float, na_value=float("nan")))
+                rollup_parts.append(df_out[[col for col in ROLLUP_SOURCE_COLUMNS if col in df_out.columns]])
+                rows += len(df_out)
+
+            try:
+                for chunk in chunks:
+                    df_cleaned = _clean_chunk(chunk, course_name)
+                    if "version" in df_cleaned.columns:
+                        version_cols = [*problem_keys(df_cleaned), "version", "num_responses", *DELTA_COLUMNS]
+                        version_parts.append(df_cleaned[[col for col in version_cols if col in df_cleaned.columns]])
+                    if versions == "all":
+                        write_rows(df_cleaned)
+                    elif pending is None:
+                        pending = df_cleaned
+                    else:
+                        pending = collapse_versions(pd.concat([pending, df_cleaned], ignore_index=True), versions)
+                if pending is not None:
+                    write_rows(collapse_versions(pending, versions))
+
+                # A header-only file yields no chunks in streaming mode; still write the header.
+                if csv_out.tell() == 0:
+                    df_cleaned = _clean_chunk(read_raw_csv(raw_filepath), course_name)
+                    df_cleaned.to_csv(csv_out, index=False)
+                    if columnar_out is not None:
+                        columnar_out.write(df_cleaned)
+            finally:
+                if columnar_out is not None:
+                    columnar_out.close()
+    except BaseException:
+        csv_tmp.unlink(missing_ok=True)
+        parquet_tmp.unlink(missing_ok=True)
+        raise
+
+    # Move the columnar copy into place after the CSV so loaders see it as the newer of the two.
+    os.replace(csv_tmp, processed_filepath)
     print(f"Processed file saved to {processed_filepath}")
+    if write_columnar_copy:
+        os.replace(parquet_tmp, parquet_filepath)
+        print(f"Columnar file saved to {parquet_filepath}")
+    write_sketch(sketch, sketch_path(processed_filepath))
+    if version_parts:
+        index_path = versions_path(processed_filepath)
+        version_deltas(pd.concat(version_parts, ignore_index=True)).to_csv(_tmp_path(index_path), index=False)
+        os.replace(_tmp_path(index_path), index_path)
+    else:
+        versions_path(processed_filepath).unlink(missing_ok=True)
+    if rollup_parts and "document_id" in rollup_parts[0].columns and "num_responses" in rollup_parts[0].columns:
+        documents_path = rollup_path(processed_filepath)
+        document_rollup(pd.concat(rollup_parts, ignore_index=True)).to_csv(_tmp_path(documents_path), index=False)
+        os.replace(_tmp_path(documents_path), documents_path)
+    else:
+        rollup_path(processed_filepath).unlink(missing_ok=True)
 
+    return rows
 
-def process_all_files(raw_dir: Path = None, processed_dir: Path = None):
+
+def processed_outputs(raw_filepath: Path, processed_dir: Path) -> list[Path]:
+    """
+    Returns the output files process_file has written for raw_filepath (CSV and, if present, Parquet,
+    the num_responses sketch, the version index and the document rollup).
+    """
+    processed_filepath = processed_dir / f"{raw_filepath.stem}_cleaned.csv"
+    candidates = [
+        processed_filepath,
+        columnar_path(processed_filepath),
+        sketch_path(processed_filepath),
+        versions_path(processed_filepath),
+        rollup_path(processed_filepath),
+    ]
+    return [path for path in candidates if path.exists()]
+
+
+def _process_file_safely(
+    raw_filepath: Path, processed_dir: Path, chunksize: int | None = None, versions: str = "all"
+) -> dict:
+    """
+    Runs process_file and returns a result record instead of raising, so one bad file
+    doesn't stop the rest of the run. Kept at module level so process pools can pickle it.
+    The record's "source" is the file_state of the raw file taken before it was read.
+    """
+    start = time.perf_counter()
+    result = {"file": raw_filepath.name, "status": "ok", "rows": 0, "seconds": 0.0, "error": ""}
+    try:
+        result["source"] = file_state(raw_filepath)
+        result["rows"] = process_file(raw_filepath, processed_dir, chunksize=chunksize, versions=versions)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def print_run_summary(results: list[dict]):
+    """
+    Prints one line per processed file (status, rows, seconds) followed by the totals.
+    """
+    print("\nRun summary:")
+    name_width = max(len(result["file"]) for result in results)
+    for result in results:
+        line = (
+            f"  {result['file']:<{name_width}}  {result['status']:<7}"
+            f"  {result['rows']:>8} rows  {result['seconds']:7.2f}s"
+        )
+        if result["error"]:
+            line += f"  {result['error']}"
+        print(line)
+
+    failed = sum(result["status"] == "failed" for result in results)
+    skipped = sum(result["status"] == "skipped" for result in results)
+    total_rows = sum(result["rows"] for result in results)
+    print(f"  {len(results)} files, {skipped} unchanged, {failed} failed, {total_rows} rows")
+
+
+def process_all_files(
+    raw_dir: Path = None,
+    processed_dir: Path = None,
+    workers: int = 1,
+    force: bool = False,
+    chunksize: int | None = None,
+    versions: str = "all",
+) -> list[dict]:
     """
     Processes all CSV files in raw_dir and saves the cleaned versions to processed_dir.
     If raw_dir or processed_dir are not provided, they default to:
       raw_dir: <project_root>/data/raw
       processed_dir: <project_root>/data/processed
+
+    Runs are incremental: a manifest in processed_dir records each raw file's hash, size, mtime,
+    the CLEANING_VERSION and the outputs written. Files that are unchanged since the last run are
+    skipped (force=True reprocesses everything), and the outputs of raw files that were removed
+    are deleted.
+
+    With workers > 1, files are processed in a pool of that many processes. A file that fails
+    is reported in the run summary without affecting the others. Files are handled and reported
+    in sorted order, and each one writes only its own outputs, so results don't depend on workers.
+
+    With chunksize, each file is streamed through process_file in chunks of that many rows.
+
+    versions is passed on to process_file. It is recorded in the manifest like the cleaning version,
+    so switching modes reprocesses every file.
+
+    After any file was (re)processed or removed, the wrong-answer index and the course database over
+    all processed courses are rebuilt (see src.data.answer_index and src.data.course_db).
+
+    Returns one result record per raw file (file, status, rows, seconds, error).
     """
     # Determine project root if directories are not provided.
     if raw_dir is None or processed_dir is None:
@@ -58,16 +309,172 @@ def process_all_files(raw_dir: Path = None, processed_dir: Path = None):
     # Ensure processed_dir exists.
     processed_dir.mkdir(parents=True, exist_ok=True)
 
+    manifest = load_manifest(processed_dir)
+    entries = manifest["files"]
+    # Collapsed outputs differ from the full ones, so the version mode is part of the cleaning version.
+    cleaning_version = CLEANING_VERSION if versions == "all" else f"{CLEANING_VERSION}-{versions}"
+
     # Find all CSV files in the raw directory.
-    csv_files = list(raw_dir.glob("*.csv"))
+    csv_files = sorted(raw_dir.glob("*.csv"))
     if not csv_files:
         print(f"No CSV files found in {raw_dir}")
-        return
 
+    # Split into files that need work and files that are unchanged since the last run.
+    to_process = []
+    results_by_name = {}
     for csv_file in csv_files:
-        print(f"Processing {csv_file.name}...")
-        process_file(csv_file, processed_dir)
+        entry = entries.get(csv_file.name)
+        if not force and is_up_to_date(entry, csv_file, processed_dir, cleaning_version):
+            results_by_name[csv_file.name] = {
+                "file": csv_file.name,
+                "status": "skipped",
+                "rows": entry.get("rows", 0),
+                "seconds": 0.0,
+                "error": "",
+            }
+        else:
+            to_process.append(csv_file)
+
+    if workers > 1 and len(to_process) > 1:
+        print(f"Processing {len(to_process)} files with {workers} workers...")
+        # Workers log their own stage records; make sure they have somewhere to go.
+        initializer = configure_logging if instrumentation_enabled() else None
+        results_by_file = {}
+        with ProcessPoolExecutor(max_workers=min(workers, len(to_process)), initializer=initializer) as executor:
+            futures = {
+                executor.submit(_process_file_safely, csv_file, processed_dir, chunksize, versions): csv_file
+                for csv_file in to_process
+            }
+            for future in as_completed(futures):
+                csv_file = futures[future]
+                try:
+                    results_by_file[csv_file] = future.result()
+                except Exception as e:
+                    # A worker that dies hard (out of memory, a crash in native code) breaks the pool:
+                    # its file and every file still queued fail with BrokenProcessPool. Record them
+                    # like any other failure, so the finished files still make it into the manifest.
+                    results_by_file[csv_file] = {
+                        "file": csv_file.name,
+                        "status": "failed",
+                        "rows": 0,
+                        "seconds": 0.0,
+                        "error": f"{type(e).__name__}: {e}",
+                    }
+        processed = [results_by_file[csv_file] for csv_file in to_process]
+    else:
+        processed = []
+        for csv_file in to_process:
+            print(f"Processing {csv_file.name}...")
+            processed.append(_process_file_safely(csv_file, processed_dir, chunksize=chunksize, versions=versions))
+
+    for csv_file, result in zip(to_process, processed):
+        results_by_name[csv_file.name] = result
+        if result["status"] == "ok":
+            outputs = processed_outputs(csv_file, processed_dir)
+            entries[csv_file.name] = make_entry(result["source"], cleaning_version, result["rows"], outputs)
+        else:
+            # Forget failed files so the next run retries them.
+            entries.pop(csv_file.name, None)
+
+    pruned = prune_removed(manifest, {csv_file.name for csv_file in csv_files}, processed_dir)
+    for name in pruned:
+        print(f"Removed outputs of deleted raw file {name}")
+    save_manifest(processed_dir, manifest)
+
+    # Update the cross-course outputs (wrong-answer index, course database) for the courses that
+    # were reprocessed or removed; they are only built from every course when missing.
+    changed_files = [
+        processed_dir / f"{csv_file.stem}_cleaned.csv"
+        for csv_file, result in zip(to_process, processed)
+        if result["status"] == "ok"
+    ] + [processed_dir / f"{Path(name).stem}_cleaned.csv" for name in pruned]
+    course_files = sorted(processed_dir.glob("*_cleaned.csv"))
+    if changed_files or not answer_index_path(processed_dir).exists():
+        update_answer_index(processed_dir, course_files, changed_files)
+    if changed_files or not course_db_path(processed_dir).exists():
+        update_course_db(processed_dir, course_files, changed_files)
+
+    results = [results_by_name[csv_file.name] for csv_file in csv_files]
+    if results:
+        print_run_summary(results)
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Clean every raw course CSV into data/processed.")
+    parser.add_argument("--raw-dir", type=Path, default=None, help="Directory with raw CSVs (default: data/raw).")
+    parser.add_argument("--processed-dir", type=Path, default=None, help="Output directory (default: data/processed).")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes; 0 uses one per CPU (default: 1, no pool).",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Reprocess every raw file, even if the manifest says it is unchanged."
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=None,
+        help="Stream each raw file in chunks of this many rows to bound memory (default: read whole files).",
+    )
+    parser.add_argument(
+        "--versions",
+        choices=VERSION_MODES,
+        default="all",
+        help="Problems with several document versions: keep every version's rows (default), only the latest "
+        "version, or one row aggregated over all versions weighted by num_responses.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and reprocess raw files as they are added, changed or removed (needs watchdog).",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="With --watch, seconds a changed file must stay untouched before it is processed (default: 2).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Log wall time, rows and memory of every processed file as JSON lines on stderr.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        enable_instrumentation()
+        configure_logging()
+    workers = args.workers or os.cpu_count() or 1
+    if args.watch:
+        try:
+            from .watch import watch
+        except ImportError:
+            parser.error("--watch needs the watchdog package (pip install watchdog)")
+        project_root = Path(__file__).resolve().parent.parent.parent
+        watch(
+            args.raw_dir or project_root / "data" / "raw",
+            args.processed_dir or project_root / "data" / "processed",
+            debounce=args.debounce,
+            workers=workers,
+            force=args.force,
+            chunksize=args.chunksize,
+            versions=args.versions,
+        )
+        return 0
+    results = process_all_files(
+        args.raw_dir,
+        args.processed_dir,
+        workers=workers,
+        force=args.force,
+        chunksize=args.chunksize,
+        versions=args.versions,
+    )
+    # Non-zero exit status if any file failed, so nightly jobs notice.
+    return 1 if any(result["status"] == "failed" for result in results) else 0
 
 
 if __name__ == "__main__":
-    process_all_files()
+    raise SystemExit(main())
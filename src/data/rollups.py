@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .derived import wrong_combined
+
+ROLLUP_SUFFIX = ".documents.csv"
+
+# Percentages rolled up per document, weighted by each pointer's num_responses.
+WEIGHTED_COLUMNS = ["%failed", "%giveup", "%trigger_goto", "%wrong_combined"]
+
+# Pointer columns document_rollup reads (process_file keeps only these for the rollup).
+ROLLUP_SOURCE_COLUMNS = ["course", "document_id", "document_name", "pointer", "num_responses", *WEIGHTED_COLUMNS]
+
+
+def rollup_path(processed_filepath: Path) -> Path:
+    """
+    Returns where process_file stores the per-document rollup of a processed CSV.
+    """
+    processed_filepath = Path(processed_filepath)
+    return processed_filepath.with_name(processed_filepath.stem + ROLLUP_SUFFIX)
+
+
+def document_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rolls pointer rows up into one row per document (per course, when df has a course column):
+      - pointers, num_responses (summed) and max_num_responses (of the busiest pointer),
+      - %failed, %giveup, %trigger_goto, %wrong_combined weighted by each pointer's num_responses
+        (the plain mean for documents without responses),
+      - worst_pointer, worst_%failed and worst_num_responses: the pointer with the highest %failed.
+    Rows the dashboard never shows (see filter_data: %wrong_combined of 99%+ or %failed of 100%) are
+    left out. Documents keep the order in which they first appear in df.
+    """
+    keys = [col for col in ["course", "document_id"] if col in df.columns]
+    if "%wrong_combined" not in df.columns and "%failed1" in df.columns:
+        df = df.assign(**{"%wrong_combined": wrong_combined(df)})
+    mask = pd.Series(True, index=df.index)
+    if "%wrong_combined" in df.columns:
+        mask &= df["%wrong_combined"] < 99
+    if "%failed" in df.columns:
+        mask &= df["%failed"] < 100
+    df = df[mask]
+
+    responses = df["num_responses"].fillna(0)
+    weighted_cols = [col for col in WEIGHTED_COLUMNS if col in df.columns]
+    parts = pd.DataFrame(
+        {
+            **{col: df[col] for col in keys},
+            "pointers": 1,
+            "num_responses": responses,
+            "max_num_responses": responses,
+            **{f"weighted {col}": df[col].fillna(0) * responses for col in weighted_cols},
+            **{f"mean {col}": df[col] for col in weighted_cols},
+        }
+    )
+    grouped = parts.groupby(keys, sort=False, observed=True)
+    rollup = grouped.agg(
+        pointers=("pointers", "sum"),
+        num_responses=("num_responses", "sum"),
+        max_num_responses=("max_num_responses", "max"),
+        **{f"weighted {col}": (f"weighted {col}", "sum") for col in weighted_cols},
+        **{f"mean {col}": (f"mean {col}", "mean") for col in weighted_cols},
+    )
+    totals = rollup["num_responses"].where(rollup["num_responses"] > 0)
+    for col in weighted_cols:
+        rollup[col] = (rollup.pop(f"weighted {col}") / totals).fillna(rollup.pop(f"mean {col}"))
+
+    names = df.groupby(keys, sort=False, observed=True)["document_name"].first()
+    rollup.insert(0, "document_name", names.astype(str))
+    if "%failed" in df.columns and "pointer" in df.columns:
+        # The first row of each document once sorted by %failed (highest first) is its worst pointer.
+        worst = (
+            df[[*keys, "pointer", "%failed", "num_responses"]]
+            .sort_values("%failed", ascending=False, kind="stable", na_position="last")
+            .drop_duplicates(keys)
+            .set_index(keys)
+        )
+        worst.columns = ["worst_pointer", "worst_%failed", "worst_num_responses"]
+        rollup = rollup.join(worst)
+    rollup = rollup.reset_index()
+    rollup["pointers"] = rollup["pointers"].astype(np.int64)
+    return rollup
+
+
+def read_rollup(path: Path) -> pd.DataFrame:
+    """
+    Reads a rollup written by process_file.
+    """
+    return pd.read_csv(path, dtype={"worst_pointer": "str", "document_name": "str"})
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# The summary strings and the summary table are shared by the data layer (derived columns, the course
+# database) and the analysis scripts, so they live here rather than in src.analysis.
+
+
+def _as_text(values: np.ndarray) -> np.ndarray:
+    """
+    Returns str(value) for every element as an object array. When the values are strings
+    (possibly with a few missing entries) only the missing entries go through str().
+    """
+    values = np.asarray(values, dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=True) != "string":
+        return values.astype(str).astype(object)
+
+    missing = pd.isna(values)
+    if missing.any():
+        values = values.copy()
+        values[missing] = [str(value) for value in values[missing]]
+    return values
+
+
+def _response_text(column: pd.Series, mask: np.ndarray) -> np.ndarray:
+    """
+    Returns _as_text of the masked responses. Dictionary-encoded (categorical) responses are
+    rendered once per distinct answer and then looked up by code.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Code -1 (missing) picks the trailing entry, which is what str() gives a missing value.
+        lookup = np.append(_as_text(np.asarray(column.cat.categories, dtype=object)), str(np.nan))
+        return lookup[column.cat.codes.to_numpy()[mask]]
+    return _as_text(np.asarray(column, dtype=object)[mask])
+
+
+def summarize_wrong_answers_vectorized(df: pd.DataFrame, round_pct: bool = False) -> pd.Series:
+    """
+    Column-wise equivalent of df.apply(summarize_wrong_answers, axis=1).
+
+    The strings are assembled one column at a time instead of one row at a time, and the
+    output is byte-identical to the row-wise helpers:
+      - round_pct=False matches summarize_wrong_answers in src.analysis.summarize (raw percentages).
+      - round_pct=True matches the dashboard helper, which formats percentages with ':.0f'.
+    """
+    summary = np.full(len(df), "", dtype=object)
+    for i in [1, 2, 3]:
+        pct_col = f"%failed{i}"
+        if pct_col not in df.columns:
+            continue
+        pct = df[pct_col]
+        mask = (pct.notna() & (pct > 0)).to_numpy()
+        if not mask.any():
+            continue
+
+        pct_values = pct.to_numpy()[mask]
+        if round_pct:
+            # Percentages repeat a lot, so each distinct value is formatted once. Formatting the
+            # values themselves (not a table indexed by them) also copes with inf or huge values.
+            uniques, inverse = np.unique(pct_values.astype(float), return_inverse=True)
+            pct_text = np.array([f"{value:.0f}" for value in uniques], dtype=object)[inverse.ravel()]
+        else:
+            pct_text = _as_text(pct_values)
+
+        resp_col = f"failed{i}_response"
+        if resp_col in df.columns:
+            resp_text = _response_text(df[resp_col], mask)
+        else:
+            resp_text = np.full(mask.sum(), "", dtype=object)
+
+        item = f"{i}) " + resp_text + " (" + pct_text + "%)"
+        previous = summary[mask]
+        separator = np.where(previous == "", "", ", ").astype(object)
+        summary[mask] = previous + separator + item
+
+    return pd.Series(summary, index=df.index, dtype="str")
+
+
+def build_summary_table(df):
+    """
+    Builds a summary table that retains:
+      - document_name
+      - pointer
+      - num_responses
+      - %failed, %giveup, %trigger_goto (if present)
+      - %failed1, failed1_response, %failed2, failed2_response, %failed3, failed3_response (if present)
+      - %wrong_combined (the sum of %failed1, %failed2, %failed3)
+      - top three wrong answers (a single string)
+    """
+    df_copy = df.copy()
+
+    # If %wrong_combined isn't already computed (process_all stores it), compute it
+    if "%wrong_combined" not in df_copy.columns:
+        df_copy["%wrong_combined"] = (
+            df_copy["%failed1"].fillna(0) + df_copy["%failed2"].fillna(0) + df_copy["%failed3"].fillna(0)
+        )
+
+    # Create the 'top three wrong answers' column
+    df_copy["top three wrong answers"] = summarize_wrong_answers_vectorized(df_copy)
+
+    # Define the columns we want to keep (if they exist in df)
+    desired_cols = [
+        "document_name",
+        "pointer",
+        "num_responses",
+        "%failed",
+        "%giveup",
+        "%trigger_goto",
+        "%failed1",
+        "failed1_response",
+        "%failed2",
+        "failed2_response",
+        "%failed3",
+        "failed3_response",
+        "%wrong_combined",
+        "top three wrong answers",
+    ]
+
+    # Only select columns that actually exist in the DataFrame
+    keep_cols = [col for col in desired_cols if col in df_copy.columns]
+
+    # Return the subset with the columns we want to keep
+    summary_table = df_copy[keep_cols]
+    return summary_table
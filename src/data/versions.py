@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from .derived import add_derived_columns, has_derived_columns
+
+# How process_all treats problems exported with several document versions (see collapse_versions).
+VERSION_MODES = ("all", "latest", "aggregate")
+
+# Columns that identify a problem across versions (course is only used when present).
+PROBLEM_KEYS = ["course", "document_id", "pointer"]
+
+# Columns compared between consecutive versions by version_deltas by default.
+DELTA_COLUMNS = ["%failed"]
+
+# Problem-level percentages aggregate_versions weights across versions. The per-answer %failed1-3
+# belong to their failedN_response texts, which differ between versions, so they aren't averaged.
+WEIGHTED_COLUMNS = ["%failed", "%giveup", "%trigger_goto"]
+
+
+def problem_keys(df: pd.DataFrame) -> list[str]:
+    return [col for col in PROBLEM_KEYS if col in df.columns]
+
+
+def _version_order(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns (order, codes, first) for df's rows: the positions sorted by problem and then version,
+    each sorted row's problem code, and whether it is the first (oldest) version of its problem.
+    Rows with the same problem and version keep their original order.
+    """
+    codes = df.groupby(problem_keys(df), sort=False, observed=True, dropna=False).ngroup().to_numpy()
+    versions = pd.to_numeric(df["version"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    order = np.lexsort((np.arange(len(df)), versions, codes))
+    sorted_codes = codes[order]
+    first = np.ones(len(df), dtype=bool)
+    first[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    return order, sorted_codes, first
+
+
+def _last_of_group(first: np.ndarray) -> np.ndarray:
+    last = np.ones(len(first), dtype=bool)
+    last[:-1] = first[1:]
+    return last
+
+
+def latest_versions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the rows of each problem's latest version (the last of them if a version repeats), in
+    their original order. Frames without a version column are returned unchanged.
+    """
+    if "version" not in df.columns or df.empty:
+        return df
+    order, _, first = _version_order(df)
+    return df.iloc[np.sort(order[_last_of_group(first)])]
+
+
+def aggregate_versions(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns one row per problem that combines all its versions: num_responses is summed and the
+    problem-level percentages (WEIGHTED_COLUMNS) are the num_responses-weighted mean over the
+    versions (so e.g. %failed is the share of all attempts that failed). Everything else, including
+    version and the top wrong answers with their %failed1-3, comes from the latest version, and a
+    'versions' column counts the versions combined. Derived columns are recomputed. Aggregating
+    already aggregated rows again (e.g. per chunk) gives the same result as aggregating all rows at
+    once.
+    """
+    if "version" not in df.columns or df.empty:
+        return df
+    order, _, first = _version_order(df)
+    starts = np.flatnonzero(first)
+    latest = df.iloc[order[_last_of_group(first)]].copy()
+
+    # Rows that were aggregated before already stand for several versions.
+    counts = df["versions"].fillna(1) if "versions" in df.columns else pd.Series(1, index=df.index)
+    counts = counts.to_numpy(dtype=np.int64)[order]
+    latest["versions"] = np.add.reduceat(counts, starts) if len(starts) else counts[:0]
+    if "num_responses" in df.columns:
+        weights = df["num_responses"].fillna(0).to_numpy(dtype=float)[order]
+        totals = np.add.reduceat(weights, starts)
+        for col in [col for col in WEIGHTED_COLUMNS if col in df.columns]:
+            values = df[col].to_numpy(dtype=float, na_value=np.nan)[order]
+            weighted = np.add.reduceat(np.nan_to_num(values) * weights, starts)
+            # Problems nobody attempted keep their latest percentages.
+            with np.errstate(invalid="ignore", divide="ignore"):
+                latest[col] = np.where(totals > 0, weighted / totals, latest[col].to_numpy(dtype=float))
+        latest["num_responses"] = np.add.reduceat(df["num_responses"].fillna(0).to_numpy()[order], starts)
+
+    latest = latest.sort_index()
+    if has_derived_columns(df):
+        add_derived_columns(latest)
+    return latest
+
+
+def collapse_versions(df: pd.DataFrame, mode: str) -> pd.DataFrame:
+    """
+    Applies a VERSION_MODES entry: "all" keeps every version's rows, "latest" keeps only each
+    problem's latest version (latest_versions) and "aggregate" combines them (aggregate_versions).
+    """
+    if mode == "all":
+        return df
+    if mode == "latest":
+        return latest_versions(df)
+    if mode == "aggregate":
+        return aggregate_versions(df)
+    raise ValueError(f"Unknown version mode: {mode!r} (expected one of {VERSION_MODES})")
+
+
+def version_deltas(df: pd.DataFrame, columns=DELTA_COLUMNS) -> pd.DataFrame:
+    """
+    Builds the version index of df: one row per problem and version, sorted by problem and version,
+    with num_responses, the given columns, 'delta_<column>' (the change since the problem's
+    previous version, missing for its first version) and 'latest' (whether it is the problem's
+    newest version). Computed in one sorted pass over all problems rather than per group.
+    """
+    keys = problem_keys(df)
+    columns = [col for col in columns if col in df.columns]
+    value_cols = [col for col in ["num_responses", *columns] if col in df.columns]
+    if "version" not in df.columns or df.empty:
+        return pd.DataFrame(columns=[*keys, "version", *value_cols, *[f"delta_{col}" for col in columns], "latest"])
+
+    order, _, first = _version_order(df)
+    index = df[[*keys, "version", *value_cols]].iloc[order].reset_index(drop=True)
+    for col in columns:
+        values = index[col].to_numpy(dtype=float, na_value=np.nan)
+        delta = np.full(len(values), np.nan)
+        delta[1:] = values[1:] - values[:-1]
+        delta[first] = np.nan
+        index[f"delta_{col}"] = delta
+    index["latest"] = _last_of_group(first)
+    return index
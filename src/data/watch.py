@@ -0,0 +1,109 @@
+import threading
+import time
+from pathlib import Path
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+from .process_all import process_all_files
+
+# Seconds without new events before changed exports are processed. Exports are often written in
+# several steps (or copied in pieces), so a file is only picked up once it has settled.
+DEFAULT_DEBOUNCE = 2.0
+
+# Events that can change a raw export. Opening or reading a file (which processing itself does)
+# must not trigger another run.
+CHANGE_EVENTS = {"created", "modified", "moved", "deleted", "closed"}
+
+# How often the watch loop checks for settled changes (and for stop).
+POLL_SECONDS = 0.1
+
+
+def is_raw_export(path) -> bool:
+    """
+    Returns True for files process_all_files picks up (*.csv), ignoring hidden and temporary files.
+    """
+    path = Path(path)
+    return path.suffix.lower() == ".csv" and not path.name.startswith((".", "~"))
+
+
+class RawFileHandler(FileSystemEventHandler):
+    """
+    Collects the raw exports that change. settled() hands them over once no change has come in for
+    debounce seconds, so a burst of events (e.g. a large file being written) leads to one run.
+    Events arrive on the observer's thread; processing stays with whoever calls settled().
+    """
+
+    def __init__(self, debounce: float = DEFAULT_DEBOUNCE):
+        super().__init__()
+        self.debounce = debounce
+        self._pending = set()
+        self._last_event = 0.0
+        self._lock = threading.Lock()
+
+    def on_any_event(self, event: FileSystemEvent):
+        if event.is_directory or event.event_type not in CHANGE_EVENTS:
+            return
+        paths = [Path(path) for path in [event.src_path, getattr(event, "dest_path", "")] if path]
+        paths = [path for path in paths if is_raw_export(path)]
+        if not paths:
+            return
+        with self._lock:
+            self._pending.update(paths)
+            self._last_event = time.monotonic()
+
+    def settled(self) -> list[Path]:
+        """
+        Returns the changed exports (and forgets them) once they have settled, otherwise [].
+        """
+        with self._lock:
+            if not self._pending or time.monotonic() - self._last_event < self.debounce:
+                return []
+            paths, self._pending = sorted(self._pending), set()
+        return paths
+
+
+def watch(
+    raw_dir: Path,
+    processed_dir: Path,
+    debounce: float = DEFAULT_DEBOUNCE,
+    stop: threading.Event | None = None,
+    force: bool = False,
+    **options,
+):
+    """
+    Keeps processed_dir in sync with raw_dir until interrupted (or until stop is set): processes
+    raw_dir once to catch up (everything, with force), then reruns process_all_files (with options,
+    e.g. workers or chunksize) whenever exports in raw_dir settle after a change. Processing runs on
+    the calling thread, one run at a time; changes that land during a run are handled by the next.
+
+    Each run is incremental, so only the exports that changed are reprocessed (and the outputs of
+    deleted ones removed); outputs are replaced atomically. The dashboard notices rewritten files
+    by their modification time and refreshes its cached data on its own.
+    """
+    raw_dir, processed_dir = Path(raw_dir), Path(processed_dir)
+    stop = stop or threading.Event()
+
+    handler = RawFileHandler(debounce)
+    observer = Observer()
+    observer.schedule(handler, str(raw_dir), recursive=False)
+    observer.start()
+    try:
+        # Catch up only once the observer runs, so exports landing meanwhile aren't missed.
+        process_all_files(raw_dir, processed_dir, force=force, **options)
+        print(f"Watching {raw_dir} for changes (Ctrl+C to stop)...")
+        while observer.is_alive() and not stop.wait(POLL_SECONDS):
+            paths = handler.settled()
+            if not paths:
+                continue
+            print(f"\nChanged: {', '.join(path.name for path in paths)}")
+            try:
+                process_all_files(raw_dir, processed_dir, **options)
+            except Exception as e:
+                # Keep watching; the next change retries.
+                print(f"Processing failed: {type(e).__name__}: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
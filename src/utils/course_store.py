@@ -0,0 +1,243 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data.derived import add_derived_columns, has_derived_columns
+from src.data.loader import load_processed_data, processed_source
+from src.data.rollups import document_rollup, read_rollup, rollup_path
+from src.utils.dashboard_helpers import build_response_index
+
+# How many course response indexes to keep in memory (least recently used are evicted first).
+MAX_CACHED_COURSES = 8
+
+# Maps resolved source file path -> (file signature, response index), in LRU order. Only the
+# response index (see build_response_index) is kept, not the prepared frame it is built from: it has
+# every column and every row the dashboard shows, so keeping both would hold each course twice.
+# Streamlit re-executes the app script on every rerun but keeps imported modules,
+# so this cache lives here rather than in streamlit_app.py.
+_CACHE: "OrderedDict[str, tuple[tuple[int, int], pd.DataFrame]]" = OrderedDict()
+# The combined "all courses" response index: (course files with their signatures, response index).
+_COMBINED: tuple | None = None
+# Maps resolved rollup path -> ((course data signature, rollup signature), rollup). Rollups are small,
+# so they are all kept.
+_ROLLUPS: dict[str, tuple] = {}
+_LOCK = threading.Lock()
+
+
+def file_signature(course_file) -> tuple[int, int]:
+    """
+    Returns (mtime_ns, size) for course_file. Any rewrite of the file (e.g. by process_all)
+    changes the signature, which invalidates the cached frame.
+    """
+    stat = os.stat(course_file)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def data_version(*course_files) -> tuple:
+    """
+    Returns a value that changes whenever one of the processed files behind course_files is
+    rewritten: (source path, file signature) for each, with the source chosen like the loaders do.
+    Used to key caches of things derived from the course data (e.g. figures).
+    """
+    version = []
+    for course_file in course_files:
+        source = processed_source(Path(course_file).resolve())
+        version.append((str(source), file_signature(source)))
+    return tuple(version)
+
+
+def prepare_course_data(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Makes sure a freshly loaded course frame has the derived columns the dashboard needs
+    ('%wrong_combined', 'total_fails', 'top three wrong answers'). process_all writes them, so
+    they're only computed here for files processed before they existed (or with an older schema).
+    """
+    if not has_derived_columns(df):
+        add_derived_columns(df)
+    else:
+        # Empty summaries come back from CSV as missing values.
+        df["top three wrong answers"] = df["top three wrong answers"].fillna("")
+    return df
+
+
+def _load_entry(course_file, max_courses: int) -> tuple[pd.DataFrame, tuple]:
+    """
+    Returns (response index, data version) for course_file, from the cache when it is still valid.
+    """
+    key = str(processed_source(Path(course_file).resolve()))
+    # Taken before reading: if the file is rewritten meanwhile, the next call sees a new signature.
+    signature = file_signature(key)
+    version = ((key, signature),)
+
+    with _LOCK:
+        cached = _CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            _CACHE.move_to_end(key)
+            return cached[1], version
+
+    # Load outside the lock so one slow course doesn't block the others. The prepared frame is
+    # dropped once the index is built.
+    index = build_response_index(load_course(key))
+
+    with _LOCK:
+        _CACHE[key] = (signature, index)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > max_courses:
+            _CACHE.popitem(last=False)
+    return index, version
+
+
+def load_course_entry(course_file, max_courses: int = MAX_CACHED_COURSES) -> tuple[pd.DataFrame, tuple]:
+    """
+    Returns (response index, data version) of course_file (see load_course_index). The version is
+    the data_version of the file the index was read from, taken with it, so caches keyed by it
+    (e.g. figures) never pair a version with other data than it describes.
+    """
+    return _load_entry(course_file, max_courses)
+
+
+def load_course(course_file) -> pd.DataFrame:
+    """
+    Reads course_file and returns the prepared DataFrame, with every row. The typed columnar copy of
+    course_file is read instead when process_all wrote one (see load_processed_data). It is not
+    cached: the dashboard works from load_course_index.
+    """
+    return prepare_course_data(load_processed_data(course_file))
+
+
+def load_course_index(course_file, max_courses: int = MAX_CACHED_COURSES) -> pd.DataFrame:
+    """
+    Returns the response index of course_file (see build_response_index), for fast
+    minimum-responses filtering with filter_by_min_responses. It is read and built only when it is
+    not cached yet or the file changed on disk since it was cached. The result is shared between
+    reruns and sessions; callers must not modify it in place. Its last row has the highest
+    num_responses.
+    """
+    return _load_entry(course_file, max_courses)[0]
+
+
+def combine_courses(frames: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenates per-course frames into one dataset with a categorical 'course' column holding the
+    dict keys (the dashboard's course names), in dict order. Columns that are categorical in every
+    frame that has them stay categorical (with the union of the categories), so the result takes
+    about as much memory as the inputs combined. Courses lacking a column get missing values in it.
+    """
+    frames = {course: df.copy(deep=False) for course, df in frames.items()}
+    first = next(iter(frames.values()), pd.DataFrame())
+    for col in first.columns:
+        having = [df for df in frames.values() if col in df.columns]
+        if all(isinstance(df[col].dtype, pd.CategoricalDtype) for df in having):
+            categories = pd.api.types.union_categoricals([df[col] for df in having]).categories
+            for df in having:
+                df[col] = df[col].cat.set_categories(categories)
+
+    course_dtype = pd.CategoricalDtype(list(frames))
+    for code, df in enumerate(frames.values()):
+        df["course"] = pd.Categorical.from_codes(np.full(len(df), code), dtype=course_dtype)
+    return pd.concat(frames.values(), ignore_index=True)
+
+
+def _take_course_index(course_file) -> pd.DataFrame:
+    """
+    Returns the response index of course_file and drops it from the per-course cache: it is about
+    to be copied into the combined index, and keeping both would hold every course twice.
+    """
+    key = str(processed_source(Path(course_file).resolve()))
+    signature = file_signature(key)
+    with _LOCK:
+        cached = _CACHE.pop(key, None)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    return build_response_index(load_course(key))
+
+
+def _load_combined_entry(course_files: dict[str, str]) -> tuple[pd.DataFrame, tuple]:
+    """
+    Returns (combined response index, data version) for all course_files, rebuilding it only when
+    one of the files changed on disk. The course indexes are taken out of the per-course cache
+    while building it (see _take_course_index), so only the combined copy stays in memory.
+    """
+    global _COMBINED
+    sources = (tuple(course_files), data_version(*course_files.values()))
+    with _LOCK:
+        if _COMBINED is not None and _COMBINED[0] == sources:
+            return _COMBINED[1], sources[1]
+
+    indexes = {course: _take_course_index(path) for course, path in course_files.items()}
+    # Shift each course's row labels past the previous course's, so sorting by the index still gives
+    # the course order and, within a course, the file order (see paginate(..., chronological=True)).
+    labels, offset = [], 0
+    for index in indexes.values():
+        labels.append(index.index.to_numpy() + offset)
+        offset += int(index.index.max()) + 1 if len(index) else 0
+    combined = combine_courses(indexes)
+    combined.index = np.concatenate(labels) if labels else combined.index
+    if "num_responses" in combined.columns:
+        combined = combined.sort_values("num_responses", kind="stable")
+    with _LOCK:
+        _COMBINED = (sources, combined)
+    return combined, sources[1]
+
+
+def load_all_courses_entry(course_files: dict[str, str]) -> tuple[pd.DataFrame, tuple]:
+    """
+    Returns (combined response index, data version) of course_files, like load_course_entry
+    (see load_all_courses_index).
+    """
+    return _load_combined_entry(course_files)
+
+
+def load_all_courses_index(course_files: dict[str, str]) -> pd.DataFrame:
+    """
+    Returns one response index over every course in course_files (course name -> processed file),
+    combined with combine_courses (so it has a categorical 'course' column) and sorted by
+    num_responses like build_response_index. Cached until one of the files changes. Must not be
+    modified in place.
+    """
+    return _load_combined_entry(course_files)[0]
+
+
+def _load_rollup(course_file) -> pd.DataFrame:
+    course_file = Path(course_file).resolve()
+    source, stored = processed_source(course_file), rollup_path(course_file)
+    signature = (file_signature(source), file_signature(stored) if stored.exists() else None)
+    key = str(stored)
+    with _LOCK:
+        cached = _ROLLUPS.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    if signature[1] is not None and signature[1][0] >= signature[0][0]:
+        rollup = read_rollup(stored)
+    else:
+        # Processed before rollups existed, or the rollup is outdated: compute it from the course.
+        rollup = document_rollup(load_course(course_file))
+    with _LOCK:
+        _ROLLUPS[key] = (signature, rollup)
+    return rollup
+
+
+def load_document_rollups(course_files: dict[str, str]) -> pd.DataFrame:
+    """
+    Returns the per-document rollups (see document_rollup) of course_files (course name -> processed
+    file) as one frame whose 'course' column holds the dict keys. Each rollup is the one process_all
+    wrote next to the course when it is at least as new as the course data, so the course itself
+    isn't loaded; otherwise it is computed from the course. Cached until the files change.
+    """
+    return combine_courses({course: _load_rollup(path) for course, path in course_files.items()})
+
+
+def clear_course_cache():
+    """
+    Drops every cached response index (per course and combined) and the document rollups.
+    """
+    global _COMBINED
+    with _LOCK:
+        _CACHE.clear()
+        _ROLLUPS.clear()
+        _COMBINED = None
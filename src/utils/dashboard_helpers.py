@@ -1,5 +1,10 @@
+import numpy as np
 import pandas as pd
 
+from src.data.derived import wrong_combined
+from src.data.summary import summarize_wrong_answers_vectorized
+from src.utils.instrumentation import instrumented
+
 
 def summarize_wrong_answers(row):
     """
@@ -16,27 +21,120 @@ def summarize_wrong_answers(row):
     return ", ".join(items)
 
 
+def summarize_wrong_answers_column(df: pd.DataFrame) -> pd.Series:
+    """
+    Vectorized version of df.apply(summarize_wrong_answers, axis=1) for the dashboard,
+    with percentages rounded to whole numbers.
+    """
+    return summarize_wrong_answers_vectorized(df, round_pct=True)
+
+
+def build_document_links(df: pd.DataFrame, prefix: str) -> pd.Series:
+    """
+    Builds the 'document_link' column for every row of df in one vectorized pass.
+    The link embeds the document_name as a query parameter so the table can display it, e.g.
+    '<prefix>10299?docName=What is a Percent?'. Rows get an empty link if df has no
+    document_id or document_name column. prefix may be a per-row Series; rows where it is
+    missing get no link (a missing value).
+    """
+    if "document_id" not in df.columns or "document_name" not in df.columns:
+        return pd.Series("", index=df.index, dtype="str", name="document_link")
+
+    links = prefix + df["document_id"].astype(str) + "?docName=" + df["document_name"].astype(str)
+    return links.rename("document_link")
+
+
+@instrumented("filter_data")
 def filter_data(df: pd.DataFrame, min_attempts: int) -> pd.DataFrame:
     """
     Filters data based on a minimum number of responses and removes bogus rows.
-    Computes a combined wrong percentage and filters out rows where it is 99% or higher.
+    Uses the combined wrong percentage (computed here unless process_all already stored it)
+    and filters out rows where it is 99% or higher.
     """
-    # Ensure we work on a copy to avoid SettingWithCopyWarning.
-    df = df.copy()
-
+    # Build one mask and select once, so the kept rows are copied a single time.
+    combined = df["%wrong_combined"] if "%wrong_combined" in df.columns else wrong_combined(df)
+    # Filter out rows where the combined wrong percentage is 99% or higher.
+    mask = (combined < 99) & (df["%failed"] < 100)
     if "num_responses" in df.columns:
-        df = df[df["num_responses"] >= min_attempts]
+        mask &= df["num_responses"] >= min_attempts
 
-    # Use .loc to explicitly assign to a new column.
-    df.loc[:, "%wrong_combined"] = df["%failed1"].fillna(0) + df["%failed2"].fillna(0) + df["%failed3"].fillna(0)
+    filtered = df[mask]
+    if "%wrong_combined" not in df.columns:
+        filtered = filtered.assign(**{"%wrong_combined": combined[mask]})
+    return filtered
 
-    # Filter out rows where the combined wrong percentage is 99% or higher.
-    df = df[df["%wrong_combined"] < 99]
 
-    df = df[df["%failed"] < 100]
-    return df
+def build_response_index(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prepares df for repeated minimum-responses filtering with filter_by_min_responses:
+      - applies filter_data's bogus-row exclusions once (they don't depend on the threshold),
+      - sorts the remaining rows by num_responses (stable, keeping the original index).
+    """
+    indexed = filter_data(df, min_attempts=float("-inf"))
+    if "num_responses" in indexed.columns:
+        indexed = indexed.sort_values("num_responses", kind="stable")
+    return indexed
+
+
+@instrumented("filter_by_min_responses")
+def filter_by_min_responses(indexed: pd.DataFrame, min_attempts: int) -> pd.DataFrame:
+    """
+    Returns the same rows as filter_data(df, min_attempts), given indexed = build_response_index(df).
+    The threshold is resolved with a binary search (searchsorted) and the rows are one slice of the
+    index, so nothing is reordered or copied per call. They come in ascending num_responses order
+    with their original index; sort_index() (or paginate(..., chronological=True) for one page)
+    gives back the original order.
+    """
+    if "num_responses" not in indexed.columns:
+        return indexed
+    start = indexed["num_responses"].searchsorted(min_attempts, side="left")
+    return indexed.iloc[start:]
+
+
+def page_count(num_rows: int, page_size: int) -> int:
+    """
+    Returns the number of pages needed for num_rows rows (at least 1, so an empty table has one page).
+    """
+    return max(1, -(-num_rows // page_size))
+
+
+def paginate(
+    df: pd.DataFrame, page: int, page_size: int, sort_by: str | None = None, chronological: bool = False
+) -> pd.DataFrame:
+    """
+    Returns the rows of the given page (1-based) of df. Out-of-range pages are clamped to the
+    first/last page.
+
+    With sort_by, pages follow df sorted by that column in descending order (like
+    df.sort_values(sort_by, ascending=False)); only that column is sorted and just the page's rows
+    are taken from df, so the rest of the frame is never reordered or copied. Without it, pages
+    follow df's current order, or with chronological, df's index order (the original row order of
+    rows from filter_by_min_responses); again only the index is sorted.
+    """
+    page = min(max(page, 1), page_count(len(df), page_size))
+    start = (page - 1) * page_size
+    if sort_by is None and chronological:
+        order = np.argsort(df.index.to_numpy(), kind="stable")
+        return df.iloc[order[start : start + page_size]]
+    if sort_by is None:
+        return df.iloc[start : start + page_size]
+    order = df[sort_by].reset_index(drop=True).sort_values(ascending=False).index
+    return df.iloc[order[start : start + page_size]]
+
+
+def round_for_display(df: pd.DataFrame, decimals: int = 1) -> pd.DataFrame:
+    """
+    Rounds every numeric column to the given number of decimals for display.
+    float32 columns (from the columnar files) are widened to float64 first; otherwise values like
+    29.9 come out as 29.899999618530273 once the table is serialized.
+    """
+    float32_cols = df.select_dtypes(include="float32").columns
+    if len(float32_cols):
+        df = df.astype({col: "float64" for col in float32_cols})
+    return df.round(decimals)
 
 
+@instrumented("build_column_toggles")
 def build_column_toggles(df: pd.DataFrame, sidebar) -> list[str]:
     """
     Returns the list of columns to display based on individual toggle checkboxes.
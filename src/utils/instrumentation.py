@@ -0,0 +1,161 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+# Set to "1" to record stage timings. It is an environment variable so worker processes started by
+# process_all inherit it.
+ENV_VAR = "STAGE_INSTRUMENTATION"
+
+logger = logging.getLogger("src.instrumentation")
+
+# Per-thread state: the records made since the last drain_records() call, and the stages currently
+# running. Streamlit runs each session's reruns on its own thread, so one session never sees
+# another's records.
+_LOCAL = threading.local()
+
+# Number of instrumented calls running in any thread. tracemalloc is started by the first and stopped
+# by the last, so allocations are only traced (and slowed down) while a stage runs. Tracing someone
+# else started (_OWN_TRACING False) is left running.
+_ACTIVE = 0
+_OWN_TRACING = False
+_ACTIVE_LOCK = threading.Lock()
+
+
+def instrumentation_enabled() -> bool:
+    """
+    Returns True if stage instrumentation is on (see enable_instrumentation).
+    """
+    return os.environ.get(ENV_VAR) == "1"
+
+
+def enable_instrumentation(enabled: bool = True):
+    """
+    Turns stage instrumentation on or off for this process and the processes it starts.
+    Memory is measured with tracemalloc, which slows Python allocations down while a stage runs.
+    """
+    if enabled:
+        os.environ[ENV_VAR] = "1"
+    else:
+        os.environ.pop(ENV_VAR, None)
+
+
+def _rows(value) -> int | None:
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def configure_logging():
+    """
+    Sends instrumentation records (and other INFO logs) to stderr, one JSON object per line.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+
+def instrumented(stage: str):
+    """
+    Decorator that records a stage each time the function runs, when instrumentation is enabled:
+      {"stage", "seconds", "rows_in", "rows_out", "memory_delta_mb", "peak_mb"}
+    rows_in is the length of the first DataFrame argument and rows_out the length of the returned
+    DataFrame (or of the first item of a returned tuple, or the returned int, e.g. process_file's
+    row count); either is None when not applicable. memory_delta_mb is the change in traced memory
+    over the call and peak_mb the most memory allocated at once during it, on top of what was
+    allocated before. Stages may be nested. Tracing is process-wide and only on while a stage runs,
+    so memory figures include other threads working at the same time.
+
+    Each record is logged as JSON to the "src.instrumentation" logger and kept for drain_records().
+    When instrumentation is disabled, the function is simply called.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instrumentation_enabled():
+                return func(*args, **kwargs)
+
+            _start_tracing()
+            stack = _stack()
+            if stack:
+                # reset_peak() below would lose the enclosing stage's peak so far; keep it.
+                stack[-1]["peak"] = max(stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+            memory_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            frame = {"peak": 0}
+            stack.append(frame)
+            rows_in = next((len(arg) for arg in args if isinstance(arg, pd.DataFrame)), None)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                memory_after, peak = tracemalloc.get_traced_memory()
+            finally:
+                seconds = time.perf_counter() - start
+                stack.pop()
+                _stop_tracing()
+            peak = max(peak, frame["peak"])
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+
+            record = {
+                "stage": stage,
+                "seconds": round(seconds, 6),
+                "rows_in": rows_in,
+                "rows_out": _rows(result),
+                "memory_delta_mb": round((memory_after - memory_before) / 1e6, 3),
+                "peak_mb": round((peak - memory_before) / 1e6, 3),
+            }
+            logger.info(json.dumps(record))
+            _records().append(record)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _start_tracing():
+    global _ACTIVE, _OWN_TRACING
+    with _ACTIVE_LOCK:
+        if _ACTIVE == 0:
+            _OWN_TRACING = not tracemalloc.is_tracing()
+            if _OWN_TRACING:
+                tracemalloc.start()
+        _ACTIVE += 1
+
+
+def _stop_tracing():
+    global _ACTIVE
+    with _ACTIVE_LOCK:
+        _ACTIVE -= 1
+        if _ACTIVE == 0 and _OWN_TRACING:
+            tracemalloc.stop()
+
+
+def _stack() -> list[dict]:
+    if not hasattr(_LOCAL, "stack"):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+def _records() -> list[dict]:
+    if not hasattr(_LOCAL, "records"):
+        _LOCAL.records = []
+    return _LOCAL.records
+
+
+def drain_records() -> list[dict]:
+    """
+    Returns the stage records made on this thread since the last call, and forgets them.
+    """
+    records = getattr(_LOCAL, "records", [])
+    _LOCAL.records = []
+    return records
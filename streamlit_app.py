@@ -1,10 +1,26 @@
+import os
+from functools import partial
+from pathlib import Path
+
 import pandas as pd
 import streamlit as st
 
-from src.analysis.visualization import show_bubble_chart
-from src.utils.dashboard_helpers import build_column_toggles, filter_data, summarize_wrong_answers
+from src.analysis.summarize import compare_documents_across_courses
+from src.data.course_db import open_course_db
+from src.data.process_all import course_name_for
+from src.utils.course_store import data_version, load_all_courses_entry, load_course_entry, load_document_rollups
+from src.utils.dashboard_helpers import (
+    build_column_toggles,
+    build_document_links,
+    filter_by_min_responses,
+    page_count,
+    paginate,
+    round_for_display,
+)
+from src.utils.instrumentation import configure_logging, drain_records, instrumentation_enabled, instrumented
 
-# Define course files and URL prefixes.
+# Define course files and URL prefixes. These courses are listed first, in this order; any other
+# course process_all writes to PROCESSED_DIR is listed after them (see discover_courses).
 COURSE_FILES = {
     "Prealgebra 1": "data/processed/prealgebra_1_data_cleaned.csv",
     "Prealgebra 2": "data/processed/prealgebra_2_data_cleaned.csv",
@@ -22,72 +38,263 @@ COURSE_LINK_PREFIX = {
     "Algebra B": "https://www.aops.com/crypt/composite/562/",
 }
 
+# Bubble chart options: what each bubble stands for (see create_bubble_chart).
+CHART_MODE_LABELS = {"Each pointer": "points", "By document": "document", "Binned": "binned"}
+
+# Choices for the number of table rows sent to the browser per page.
+PAGE_SIZES = [25, 50, 100, 250]
+
+# Course picker entry that shows every available course as one dataset.
+ALL_COURSES = "All courses"
+
+# Columns of the per-document rollup shown above the pointer table (see document_rollup).
+ROLLUP_COLUMNS = [
+    "course",
+    "document_name",
+    "pointers",
+    "num_responses",
+    "%failed",
+    "%giveup",
+    "%trigger_goto",
+    "worst_pointer",
+    "worst_%failed",
+]
+
+# Drill-down entry that loads the pointers of every document (an explicit opt-in: nothing is
+# loaded until a document is picked).
+ALL_DOCUMENTS = "All documents"
+
+# How often (in seconds) an open dashboard checks whether process_all rewrote the data it shows,
+# e.g. when `process_all --watch` picked up a new export.
+REFRESH_SECONDS = 5
+
+# Session state key for the courses listed, the files behind the page last rendered and their
+# data_version as read.
+SHOWN_DATA_KEY = "shown_data_version"
+
+# Where process_all writes the course database (see src/data/course_db.py).
+PROCESSED_DIR = "data/processed"
+
+# Set to "1" to serve the pointer rows from the course database instead of the in-process course
+# cache. Each rerun then queries SQLite, which is slower than the cached frames once a course is
+# loaded, but keeps the courses out of the Streamlit process.
+COURSE_DB_ENV_VAR = "USE_COURSE_DB"
 
-def load_and_rename_data(course_file: str, course_key: str) -> pd.DataFrame:
+# Columns the course database provides for the filtered rows: everything the column toggles and
+# the chart use. Table pages, the row count and the cross-course comparison are queried separately.
+DASHBOARD_COLUMNS = [
+    "course",
+    "document_id",
+    "document_name",
+    "pointer",
+    "num_responses",
+    "%failed",
+    "%giveup",
+    "%trigger_goto",
+    "%wrong_combined",
+    "total_fails",
+    "top three wrong answers",
+]
+
+
+@instrumented("load_and_rename_data")
+def load_and_rename_data(course_file: str, max_courses: int) -> tuple[pd.DataFrame, tuple]:
+    """
+    Returns the response index of the course data (with the 'top three wrong answers' column) and
+    the data version it was read at. The index is cached across reruns and only reloaded when the
+    file changes on disk, so widget interactions only pay for filtering. Do not modify the returned
+    frame in place. The 'document_link' column is built later, only for the rows that are displayed.
+    """
+    return load_course_entry(course_file, max_courses=max_courses)
+
+
+@instrumented("load_course_data")
+def load_course_data(selected_course: str, available: dict[str, str]) -> tuple[pd.DataFrame, tuple]:
     """
-    Loads CSV, creates the 'top three wrong answers' column,
-    and constructs a 'document_link' column that embeds the document_name
-    in the URL as a query parameter for later extraction.
+    Returns (response index, data version) for the selected course. For ALL_COURSES this is one
+    combined index with a categorical 'course' column, built once and cached like single courses.
+    The version comes with the data, so it always describes the index returned.
     """
-    df = pd.read_csv(course_file)
-    # Use helper function to summarize wrong answers.
-    df["top three wrong answers"] = df.apply(summarize_wrong_answers, axis=1)
+    if selected_course == ALL_COURSES:
+        return load_all_courses_entry(available)
+    return load_and_rename_data(available[selected_course], max_courses=len(available))
 
-    prefix = COURSE_LINK_PREFIX.get(course_key, "")
 
-    def make_link(row):
-        if "document_id" in row and "document_name" in row:
-            base_url = f"{prefix}{row['document_id']}"
-            # Append document_name as a query parameter so we can extract it for display.
-            return f"{base_url}?docName={row['document_name']}"
-        return ""
+def course_db_enabled() -> bool:
+    return os.environ.get(COURSE_DB_ENV_VAR) == "1"
 
-    df["document_link"] = df.apply(make_link, axis=1)
-    return df
 
+def discover_courses(processed_dir: str = PROCESSED_DIR) -> dict[str, str]:
+    """
+    Returns course name -> processed file for every course processed into processed_dir: those
+    of COURSE_FILES first, in that order, then any other course (e.g. a new export picked up by
+    `process_all --watch`), named the way process_all names it.
+    """
+    processed = {course_file.name: course_file for course_file in sorted(Path(processed_dir).glob("*_cleaned.csv"))}
+    available = {}
+    for course, course_file in COURSE_FILES.items():
+        name = Path(course_file).name
+        if name in processed:
+            available[course] = str(processed.pop(name))
+    for course_file in processed.values():
+        available[course_name_for(Path(course_file.stem.removesuffix("_cleaned")))] = str(course_file)
+    return available
 
-def select_course() -> str:
+
+def courses_for(selected_course: str, available: dict[str, str]) -> dict[str, str]:
+    """
+    Returns course name -> processed file for the courses shown for the selected course.
+    """
+    if selected_course == ALL_COURSES:
+        return dict(available)
+    return {selected_course: available[selected_course]}
+
+
+def course_files_for(selected_course: str, available: dict[str, str]) -> list[str]:
+    """
+    Returns the processed files shown for the selected course.
+    """
+    return list(courses_for(selected_course, available).values())
+
+
+def link_prefix(df: pd.DataFrame, selected_course: str):
+    """
+    Returns the document URL prefix: one string for a single course, or a per-row Series
+    (looked up from each row's course) in the combined view. Courses without a known prefix
+    (e.g. ones found by discover_courses) get None, i.e. no link.
+    """
+    if selected_course == ALL_COURSES:
+        return df["course"].astype(str).map(COURSE_LINK_PREFIX)
+    return COURSE_LINK_PREFIX.get(selected_course)
+
+
+def select_course(available: dict[str, str]) -> str:
     st.sidebar.header("Dashboard Filters")
-    return st.sidebar.selectbox("Select Course", list(COURSE_FILES.keys()))
+    return st.sidebar.selectbox("Select Course", list(available.keys()) + [ALL_COURSES], key="course")
 
 
-def main():
-    st.set_page_config(layout="wide")
-    st.title("Common Mistakes Dashboard")
+@instrumented("show_documents")
+def show_documents(selected_course: str, available: dict[str, str]) -> pd.DataFrame:
+    """
+    Shows the per-document rollup of the selected course(s), worst (highest response-weighted
+    %failed) first, and returns it. Rollups are precomputed by process_all, so this is sent before
+    any pointer rows are loaded.
+    """
+    rollup = load_document_rollups(courses_for(selected_course, available))
+    rollup = rollup.sort_values("%failed", ascending=False, kind="stable")
+    st.header(f"Documents in {selected_course}")
+    st.caption("Percentages are weighted by each pointer's responses, over every pointer of the document.")
+    columns = [
+        col for col in ROLLUP_COLUMNS if col in rollup.columns and (col != "course" or selected_course == ALL_COURSES)
+    ]
+    st.dataframe(round_for_display(rollup[columns], 1), hide_index=True)
+    return rollup
+
 
-    # 1) Select Course
-    selected_course = select_course()
-    course_file = COURSE_FILES[selected_course]
+def select_document(rollup: pd.DataFrame):
+    """
+    Returns the document_id to drill down into, ALL_DOCUMENTS for every document, or None while
+    nothing is picked (the default, so the first page shows only the rollup). Documents are listed
+    worst first, like the rollup table.
+    """
+    names = rollup.drop_duplicates("document_id").set_index("document_id")["document_name"]
+    return st.selectbox(
+        "Drill down into document",
+        [ALL_DOCUMENTS, *names.index],
+        index=None,
+        placeholder="Choose a document",
+        format_func=lambda document_id: ALL_DOCUMENTS if document_id == ALL_DOCUMENTS else names[document_id],
+    )
 
-    # 2) Load data
-    df = load_and_rename_data(course_file, selected_course)
 
-    # 3) Filter data using the helper. This applies:
-    #    - Minimum number of responses (via slider)
-    #    - Computation of "%wrong_combined" and filtering out rows with 99%+.
-    if "num_responses" in df.columns:
-        max_responses = int(df["num_responses"].max())
+@st.fragment(run_every=REFRESH_SECONDS)
+def refresh_on_new_data():
+    """
+    Reruns the app when a course was added to or removed from PROCESSED_DIR, or a file behind the
+    page last rendered has been rewritten since. The course caches are keyed by file signatures,
+    so the rerun reloads exactly the courses that changed.
+    """
+    shown = st.session_state.get(SHOWN_DATA_KEY)
+    if shown is None:
+        return
+    available, course_files, version = shown
+    if discover_courses() != available:
+        st.rerun()
+    try:
+        changed = data_version(*course_files) != version
+    except OSError:
+        # A course file is being replaced or was removed; check again on the next tick.
+        return
+    if changed:
+        st.rerun()
+
+
+def show_pointers(selected_course: str, available: dict[str, str], rollup: pd.DataFrame, document_id):
+    """
+    Shows the pointer table, the cross-course comparison and the bubble chart for one document of
+    the selected course(s), or for every document when document_id is None.
+    """
+    # 3) Load data. The course's response index is loaded (and cached) in this process. With USE_COURSE_DB=1
+    #    and a course database from process_all that is up to date, filters, counting, sorting and
+    #    paging run there instead, and only the rows shown are read.
+    #    The data version (what the chart is cached by and the page is refreshed on) is taken
+    #    together with the data, before it is read, never separately afterwards.
+    courses = courses_for(selected_course, available)
+    db = open_course_db(PROCESSED_DIR, courses.values()) if course_db_enabled() else None
+    if db is None:
+        watched_files = course_files_for(selected_course, available)
+        response_index, version = load_course_data(selected_course, available)
+        # The index is sorted by num_responses, so its last row has the most.
+        if "num_responses" in response_index.columns and len(response_index):
+            max_responses = int(response_index["num_responses"].iloc[-1])
+        else:
+            max_responses = 100
     else:
-        max_responses = 100
+        watched_files = [*course_files_for(selected_course, available), db.path]
+        version = data_version(*watched_files)
+        max_responses = int(db.max_value("num_responses", courses) or 100)
+    st.session_state[SHOWN_DATA_KEY] = (available, watched_files, version)
 
+    # 4) Filter data. The cached response index already excludes bogus rows (%wrong_combined of
+    #    99%+, %failed of 100%) and is sorted by num_responses, so the minimum number of responses
+    #    (via slider) is a binary search rather than a full scan. The rows stay in num_responses
+    #    order; the table restores the original order for its page only. The database applies the
+    #    same filters in its query.
     min_attempts = st.sidebar.slider(
         "Minimum Number of Responses", min_value=0, max_value=max_responses, value=30, key="min_attempts"
     )
-    df = filter_data(df, min_attempts)
-
-    # Round every numeric column to 1 decimal place.
-    df = df.round(1)
+    # The filtered rows are used as they are; only the columns actually shown get rounded, at render time.
+    if db is None:
+        df = filter_by_min_responses(response_index, min_attempts)
+        if document_id is not None:
+            df = df[df["document_id"] == document_id]
+        row_count = len(df)
+    else:
+        # No rows are read here: only the columns are needed up front, and the page, the comparison
+        # and the chart each query what they show.
+        columns = [col for col in DASHBOARD_COLUMNS if col in db.columns or col == "course"]
+        df = pd.DataFrame(columns=columns)
+        row_count = db.count(courses, min_attempts, document_id=document_id)
 
-    # 4) Build the list of columns to display using the helper.
+    # 5) Build the list of columns to display using the helper.
     # The helper returns ["document_name", "pointer", "num_responses", "top three wrong answers"]
     # plus any optional columns the user toggles (e.g. "%failed", etc.)
-    # We swap out "document_name" for "document_link" so that our clickable link is used.
+    # We swap out "document_name" for "document_link" so that our clickable link is used. Courses
+    # without a known link prefix keep the plain document_name; when only some of the courses shown
+    # have one, the link column is added next to it.
     columns_to_display = build_column_toggles(df, st.sidebar)
-    if "document_name" in columns_to_display:
+    linked = [course in COURSE_LINK_PREFIX for course in courses]
+    if "document_name" in columns_to_display and any(linked):
         idx = columns_to_display.index("document_name")
-        columns_to_display[idx] = "document_link"
+        if all(linked):
+            columns_to_display[idx] = "document_link"
+        else:
+            columns_to_display.insert(idx + 1, "document_link")
+    # In the combined view, show which course each row belongs to.
+    if selected_course == ALL_COURSES:
+        columns_to_display.insert(0, "course")
 
-    # 5) Build the Sort by dropdown.
+    # 6) Build the Sort by dropdown.
     # Start with "Chronological" and optionally "num_responses"
     sort_options = ["Chronological"]
     if "num_responses" in df.columns:
@@ -95,27 +302,53 @@ def main():
 
     # Determine which optional columns were toggled.
     # (They will be among columns_to_display if activated.)
-    optional_cols = [
-        col
-        for col in columns_to_display
-        if col not in ["document_link", "pointer", "num_responses", "top three wrong answers"]
-    ]
+    always_shown = ["course", "document_name", "document_link", "pointer", "num_responses", "top three wrong answers"]
+    optional_cols = [col for col in columns_to_display if col not in always_shown]
 
     # Add these to the sort options.
     sort_options.extend(optional_cols)
 
     sort_option = st.sidebar.selectbox("Sort by", options=sort_options, index=0)
 
-    # Apply the chosen sort if not "Chronological".
-    if sort_option != "Chronological" and sort_option in df.columns:
-        df = df.sort_values(by=sort_option, ascending=False)
+    # The chosen sort (if not "Chronological") is applied when the page is selected below.
+    sort_by = sort_option if sort_option != "Chronological" and sort_option in df.columns else None
 
-    # 6) Display the interactive data table.
-    st.header(f"Summary for {selected_course}")
-    if df.empty:
+    # 7) Display the interactive data table.
+    if document_id is None:
+        st.header(f"Summary for {selected_course}")
+    else:
+        st.header(f"Pointers of {rollup.loc[rollup['document_id'] == document_id, 'document_name'].iloc[0]}")
+    if row_count == 0:
         st.warning("No data available after filtering. Please adjust your filters.")
     else:
-        sub_df = df[columns_to_display].copy()
+        # Only the current page is sent to the browser. The sort covers every filtered row, so pages
+        # follow the chosen order across the whole table.
+        page_size_col, page_col = st.columns(2)
+        page_size = page_size_col.selectbox("Rows per page", PAGE_SIZES, index=1)
+        pages = page_count(row_count, page_size)
+        page = page_col.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+        if db is None:
+            page_df = paginate(df, int(page), page_size, sort_by=sort_by, chronological=True)
+        else:
+            page_columns = list(dict.fromkeys([*columns_to_display, "document_id", "document_name"]))
+            page_df = db.fetch(
+                [col for col in page_columns if col in df.columns],
+                courses,
+                min_attempts,
+                sort_by=sort_by,
+                limit=page_size,
+                offset=(min(int(page), pages) - 1) * page_size,
+                document_id=document_id,
+            )
+        first_row = (int(page) - 1) * page_size + 1
+        st.caption(f"Rows {first_row}-{first_row + len(page_df) - 1} of {row_count}")
+
+        # Links embed the document_name, so build them only for the rows being displayed.
+        # Round every numeric column shown to 1 decimal place.
+        sub_df = round_for_display(page_df[[col for col in columns_to_display if col != "document_link"]], 1)
+        if "document_link" in columns_to_display:
+            links = build_document_links(page_df, link_prefix(page_df, selected_course))
+            sub_df.insert(columns_to_display.index("document_link"), "document_link", links)
 
         st.data_editor(
             sub_df,
@@ -130,9 +363,63 @@ def main():
             hide_index=True,
         )
 
-    # 7) Display visualizations.
+    # In the combined view, compare the same documents across courses (response-weighted %failed).
+    if selected_course == ALL_COURSES and row_count:
+        st.header("Documents Across Courses")
+        if db is None:
+            comparison = compare_documents_across_courses(df)
+        else:
+            comparison = compare_documents_across_courses(db.document_failures(courses, min_attempts, document_id))
+        if comparison.empty:
+            st.info("No document appears in more than one course after filtering.")
+        else:
+            st.dataframe(round_for_display(comparison, 1), hide_index=True)
+
+    # 8) Display visualizations.
     st.header("Visualizations")
-    show_bubble_chart(df)
+    # Plotly is imported only now, so the table above is sent before the chart stack loads.
+    from src.analysis.visualization import show_bubble_chart
+
+    chart_mode = st.radio("Bubbles", list(CHART_MODE_LABELS), horizontal=True)
+    # The chart only depends on the course, the slider and the data it was built from, so display
+    # toggles and sorting reuse the cached figure. The database rows are only read to build it.
+    cache_key = (selected_course, document_id, min_attempts, version)
+    chart_data = df if db is None else partial(db.fetch, columns, courses, min_attempts, document_id=document_id)
+    show_bubble_chart(chart_data, mode=CHART_MODE_LABELS[chart_mode], cache_key=cache_key)
+
+
+def main():
+    st.set_page_config(layout="wide")
+    st.title("Common Mistakes Dashboard")
+    if instrumentation_enabled():
+        configure_logging()
+        drain_records()
+
+    # 1) Select Course. Courses are discovered on every rerun, so new exports show up.
+    available = discover_courses()
+    selected_course = select_course(available)
+
+    # 2) The per-document rollup comes first: it is small, and the pointer rows below are only
+    #    needed for the documents the user drills down into.
+    #    Nothing else is loaded until a document (or every document) is picked.
+    rollup = show_documents(selected_course, available)
+    selection = select_document(rollup)
+
+    if selection is None:
+        st.info(f'Pick a document above to list its pointers, or "{ALL_DOCUMENTS}" to load every pointer.')
+        # The rollup is refreshed when its courses are reprocessed.
+        watched_files = course_files_for(selected_course, available)
+        st.session_state[SHOWN_DATA_KEY] = (available, watched_files, data_version(*watched_files))
+    else:
+        show_pointers(selected_course, available, rollup, None if selection == ALL_DOCUMENTS else selection)
+
+    refresh_on_new_data()
+
+    # 9) Stage timings for this rerun (only with STAGE_INSTRUMENTATION=1).
+    if instrumentation_enabled():
+        records = drain_records()
+        with st.sidebar.expander("Debug: stage timings"):
+            st.dataframe(pd.DataFrame(records), hide_index=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import os
+
+import pandas as pd
+
+from src.data.answer_index import (
+    AnswerIndex,
+    build_answer_index,
+    load_answer_index,
+    normalize_answers,
+    update_answer_index,
+    write_answer_index,
+)
+from src.data.columnar import read_columnar
+from src.data.loader import load_processed_data
+from src.data.summary import summarize_wrong_answers_vectorized
+
+
+def write_course(path, course, responses):
+    pd.DataFrame(
+        {
+            "course": course,
+            "document_id": range(len(responses)),
+            "document_name": [f"Doc {i}" for i in range(len(responses))],
+            "pointer": "p1",
+            "num_responses": 100,
+            "%failed1": 10.0,
+            "failed1_response": responses,
+            "%failed2": 5.0,
+            "failed2_response": "[0]",
+        }
+    ).to_csv(path, index=False)
+
+
+def test_normalize_answers():
+    normalized = normalize_answers(pd.Series(['"Addition "', "addition", "  A   B ", None]))
+    assert normalized.tolist()[:3] == ["addition", "addition", "a b"]
+    assert pd.isna(normalized.iloc[3])
+    assert isinstance(normalized.dtype, pd.CategoricalDtype)
+
+
+def test_lookup_and_shared_answers(tmp_path):
+    write_course(tmp_path / "a_cleaned.csv", "A", ["Addition", "7", None])
+    write_course(tmp_path / "b_cleaned.csv", "B", ['"addition"', "8"])
+    index = AnswerIndex(build_answer_index(sorted(tmp_path.glob("*_cleaned.csv"))))
+
+    hits = index.lookup("ADDITION")
+    assert sorted(hits["course"].astype(str)) == ["A", "B"]
+    assert index.lookup("missing").empty
+
+    shared = index.shared_answers()
+    assert shared["answer"].astype(str).tolist() == ["[0]", "addition"]
+    assert shared["problems"].tolist() == [5, 2]
+    assert shared["courses"].tolist() == [2, 2]
+
+
+def test_numeric_looking_answers_stay_text(tmp_path):
+    write_course(tmp_path / "a_cleaned.csv", "A", ["7", "12", "05"])
+    index = AnswerIndex(build_answer_index([tmp_path / "a_cleaned.csv"]))
+    assert len(index.lookup("7")) == 1
+    assert len(index.lookup("05")) == 1
+    assert index.lookup("7.0").empty
+
+
+def test_stored_index_is_rebuilt_when_stale(tmp_path):
+    course = tmp_path / "a_cleaned.csv"
+    write_course(course, "A", ["x"])
+    write_answer_index(tmp_path, [course])
+    assert load_answer_index(tmp_path).lookup("y").empty
+
+    write_course(course, "A", ["y"])
+    stored = (tmp_path / "answer_index.parquet").stat().st_mtime_ns
+    os.utime(course, ns=(stored + 10**9, stored + 10**9))
+    assert len(load_answer_index(tmp_path).lookup("y")) == 1
+
+
+def test_update_replaces_only_the_changed_courses(tmp_path):
+    write_course(tmp_path / "a_cleaned.csv", "A", ["x", "y"])
+    write_course(tmp_path / "b_cleaned.csv", "B", ["x"])
+    write_course(tmp_path / "c_cleaned.csv", "C", ["z"])
+    write_answer_index(tmp_path, sorted(tmp_path.glob("*_cleaned.csv")))
+
+    write_course(tmp_path / "a_cleaned.csv", "A", ["y", "w"])
+    (tmp_path / "c_cleaned.csv").unlink()
+    course_files = sorted(tmp_path.glob("*_cleaned.csv"))
+    update_answer_index(tmp_path, course_files, [tmp_path / "a_cleaned.csv", tmp_path / "c_cleaned.csv"])
+
+    updated = read_columnar(tmp_path / "answer_index.parquet")
+    pd.testing.assert_frame_equal(updated, build_answer_index(course_files), check_dtype=False)
+    assert AnswerIndex(updated).lookup("x")["course"].astype(str).tolist() == ["B"]
+    assert AnswerIndex(updated).lookup("z").empty
+
+
+def test_csv_responses_load_dictionary_encoded(tmp_path):
+    course = tmp_path / "a_cleaned.csv"
+    write_course(course, "A", ["x", "x", None])
+    df = load_processed_data(course)
+    assert isinstance(df["failed1_response"].dtype, pd.CategoricalDtype)
+    plain = pd.read_csv(course)
+    assert summarize_wrong_answers_vectorized(df).equals(summarize_wrong_answers_vectorized(plain))
@@ -0,0 +1,129 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.analysis.summarize import compare_documents_across_courses
+from src.data.course_db import CourseDB, open_course_db, update_course_db, write_course_db
+from src.data.derived import add_derived_columns
+from src.data.summary import build_summary_table
+from src.utils.dashboard_helpers import filter_data, paginate
+
+
+def write_course(path, course, num_responses, failed):
+    df = pd.DataFrame(
+        {
+            "course": course,
+            "document_id": range(len(num_responses)),
+            "document_name": [f"Doc {i}" for i in range(len(num_responses))],
+            "pointer": "p1",
+            "num_responses": num_responses,
+            "%failed": failed,
+            "%giveup": 0.0,
+            "%trigger_goto": 0.0,
+            "%failed1": [f / 2 for f in failed],
+            "failed1_response": "[0]",
+            "%failed2": [f / 4 for f in failed],
+            "failed2_response": "[1]",
+            "%failed3": 0.0,
+            "failed3_response": None,
+        }
+    )
+    add_derived_columns(df).to_csv(path, index=False)
+    return df
+
+
+@pytest.fixture
+def courses(tmp_path):
+    frames = {
+        "B": write_course(tmp_path / "b_cleaned.csv", "B", [10, 50, 90, 200], [20.0, 100.0, 60.0, 40.0]),
+        "A": write_course(tmp_path / "a_cleaned.csv", "A", [5, 40, 80], [30.0, 70.0, 10.0]),
+    }
+    write_course_db(tmp_path, sorted(tmp_path.glob("*_cleaned.csv")))
+    return tmp_path, frames
+
+
+def test_fetch_matches_filter_data(courses):
+    tmp_path, frames = courses
+    db = CourseDB(tmp_path / "courses.sqlite")
+    expected = filter_data(frames["A"], 30)
+    got = db.fetch(["document_id", "num_responses", "%wrong_combined"], [tmp_path / "a_cleaned.csv"], 30)
+    assert got["document_id"].tolist() == expected["document_id"].tolist()
+    assert db.count([tmp_path / "a_cleaned.csv"], 30) == len(expected)
+    assert db.max_value("num_responses", [tmp_path / "a_cleaned.csv"]) == 80
+
+
+def test_fetch_pages_sorted_rows_in_course_order(courses):
+    tmp_path, frames = courses
+    db = CourseDB(tmp_path / "courses.sqlite")
+    course_files = {"B": tmp_path / "b_cleaned.csv", "A": tmp_path / "a_cleaned.csv"}
+
+    # The dict order decides the course order of unsorted rows; the 'course' column holds its keys.
+    rows = db.fetch(["course", "document_id"], course_files, 0)
+    # Doc 1 of course B has a %failed of 100% and is never shown.
+    assert rows["course"].astype(str).tolist() == ["B", "B", "B", "A", "A", "A"]
+    assert rows["document_id"].tolist() == [0, 2, 3, 0, 1, 2]
+    assert list(rows["course"].cat.categories) == ["B", "A"]
+
+    combined = pd.concat([frames["B"], frames["A"]], ignore_index=True)
+    expected = paginate(filter_data(combined, 0), 2, 2, sort_by="%failed")
+    page = db.fetch(["%failed"], course_files, 0, sort_by="%failed", limit=2, offset=2)
+    assert page["%failed"].tolist() == expected["%failed"].tolist()
+
+
+def test_document_failures_compare_like_the_pointer_rows(courses):
+    tmp_path, frames = courses
+    db = CourseDB(tmp_path / "courses.sqlite")
+    course_files = {"B": tmp_path / "b_cleaned.csv", "A": tmp_path / "a_cleaned.csv"}
+    combined = pd.concat([frames["B"], frames["A"]], ignore_index=True)
+    expected = compare_documents_across_courses(filter_data(combined, 0))
+    got = compare_documents_across_courses(db.document_failures(course_files, 0))
+    assert got["document_id"].tolist() == expected["document_id"].tolist() == [2, 0]
+    pd.testing.assert_frame_equal(got, expected, check_like=True)
+
+
+def test_summary_table_and_unknown_columns(courses):
+    tmp_path, frames = courses
+    db = CourseDB(tmp_path / "courses.sqlite")
+    table = db.summary_table([tmp_path / "b_cleaned.csv"], 50)
+    expected = build_summary_table(filter_data(frames["B"], 50))
+    assert table["top three wrong answers"].tolist() == expected["top three wrong answers"].tolist()
+    with pytest.raises(ValueError):
+        db.fetch(["num_responses; DROP TABLE problems"])
+
+
+def test_open_course_db_ignores_stale_database(courses):
+    tmp_path, _ = courses
+    assert open_course_db(tmp_path, [tmp_path / "a_cleaned.csv"]) is not None
+    built = (tmp_path / "courses.sqlite").stat().st_mtime_ns
+    os.utime(tmp_path / "a_cleaned.csv", ns=(built + 10**9, built + 10**9))
+    assert open_course_db(tmp_path, [tmp_path / "a_cleaned.csv"]) is None
+    assert open_course_db(tmp_path / "missing") is None
+
+
+def test_update_course_db_replaces_only_the_changed_courses(courses):
+    tmp_path, frames = courses
+    frames["A"] = write_course(tmp_path / "a_cleaned.csv", "A", [60, 70], [50.0, 20.0])
+    write_course(tmp_path / "c_cleaned.csv", "C", [100], [10.0])
+    update_course_db(tmp_path, [], [tmp_path / "a_cleaned.csv", tmp_path / "c_cleaned.csv"])
+
+    db = CourseDB(tmp_path / "courses.sqlite")
+    assert db.count([tmp_path / "a_cleaned.csv"], 0) == 2
+    assert db.count([tmp_path / "b_cleaned.csv"], 0) == len(filter_data(frames["B"], 0))
+    assert db.count([tmp_path / "c_cleaned.csv"], 0) == 1
+    assert open_course_db(tmp_path, sorted(tmp_path.glob("*_cleaned.csv"))) is not None
+
+    (tmp_path / "c_cleaned.csv").unlink()
+    update_course_db(tmp_path, [], [tmp_path / "c_cleaned.csv"])
+    assert CourseDB(tmp_path / "courses.sqlite").count([tmp_path / "c_cleaned.csv"], 0) == 0
+
+
+def test_failed_update_leaves_the_course_db_unchanged(courses):
+    tmp_path, frames = courses
+    write_course(tmp_path / "a_cleaned.csv", "A", [60, 70], [50.0, 20.0])
+    (tmp_path / "broken_cleaned.csv").write_text("not,a\ncourse")
+    with pytest.raises(KeyError):
+        update_course_db(tmp_path, [], [tmp_path / "a_cleaned.csv", tmp_path / "broken_cleaned.csv"])
+
+    db = CourseDB(tmp_path / "courses.sqlite")
+    assert db.count([tmp_path / "a_cleaned.csv"], 0) == len(filter_data(frames["A"], 0))
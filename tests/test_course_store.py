@@ -0,0 +1,171 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.data.rollups import rollup_path
+from src.utils import course_store
+from src.utils.course_store import (
+    clear_course_cache,
+    data_version,
+    load_all_courses_index,
+    load_course,
+    load_course_entry,
+    load_course_index,
+    load_document_rollups,
+)
+
+
+def write_course_csv(path, num_responses):
+    data = {
+        "document_id": [1, 1],
+        "document_name": ["Doc", "Doc"],
+        "pointer": ["p1", "p2"],
+        "num_responses": num_responses,
+        "%failed": [35, 55],
+        "%failed1": [20, 30],
+        "failed1_response": ["[0]", "[1]"],
+        "%failed2": [10, 15],
+        "failed2_response": ["[2]", "[3]"],
+        "%failed3": [5, 10],
+        "failed3_response": ["[4]", "[5]"],
+    }
+    pd.DataFrame(data).to_csv(path, index=False)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_course_cache()
+    yield
+    clear_course_cache()
+
+
+def test_load_course_prepares_data(tmp_path):
+    course_file = tmp_path / "course_cleaned.csv"
+    write_course_csv(course_file, [100, 200])
+
+    df = load_course(course_file)
+    assert df["top three wrong answers"].iloc[0] == "1) [0] (20%), 2) [2] (10%), 3) [4] (5%)"
+
+
+def test_load_course_index_caches_only_the_index(tmp_path):
+    course_file = tmp_path / "course_cleaned.csv"
+    write_course_csv(course_file, [200, 100])
+
+    index = load_course_index(course_file)
+    assert index["num_responses"].tolist() == [100, 200]
+    assert index["top three wrong answers"].iloc[1] == "1) [0] (20%), 2) [2] (10%), 3) [4] (5%)"
+    # A second call (e.g. a slider move) returns the cached index without re-reading the file.
+    assert load_course_index(course_file) is index
+    # The prepared frame the index was built from is not kept alongside it.
+    assert [len(entry) for entry in course_store._CACHE.values()] == [2]
+
+
+def test_load_course_index_reloads_when_file_changes(tmp_path):
+    course_file = tmp_path / "course_cleaned.csv"
+    write_course_csv(course_file, [100, 200])
+    index = load_course_index(course_file)
+
+    write_course_csv(course_file, [1000, 2000])
+    # Make sure the mtime changes even on filesystems with coarse timestamps.
+    stat = os.stat(course_file)
+    os.utime(course_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    reloaded = load_course_index(course_file)
+    assert reloaded is not index
+    assert reloaded["num_responses"].tolist() == [1000, 2000]
+
+
+def test_load_course_entry_returns_the_version_it_read(tmp_path):
+    course_file = tmp_path / "course_cleaned.csv"
+    write_course_csv(course_file, [100, 200])
+    _, version = load_course_entry(course_file)
+    assert version == data_version(course_file)
+
+    write_course_csv(course_file, [1000, 2000])
+    stat = os.stat(course_file)
+    os.utime(course_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    reloaded, new_version = load_course_entry(course_file)
+    assert new_version != version
+    assert (reloaded["num_responses"].tolist(), new_version) == ([1000, 2000], data_version(course_file))
+
+
+def test_load_course_index_evicts_least_recently_used(tmp_path):
+    files = []
+    for name in ["a", "b", "c"]:
+        path = tmp_path / f"{name}_cleaned.csv"
+        write_course_csv(path, [100, 200])
+        files.append(path)
+
+    first = load_course_index(files[0], max_courses=2)
+    load_course_index(files[1], max_courses=2)
+    load_course_index(files[2], max_courses=2)
+
+    # The first course was evicted, so it is loaded again.
+    assert load_course_index(files[0], max_courses=2) is not first
+
+
+def test_load_all_courses_index_combines_with_course_column(tmp_path):
+    course_files = {}
+    for name, responses in [("Course A", [300, 100]), ("Course B", [200, 400])]:
+        path = tmp_path / f"{name[-1].lower()}_cleaned.csv"
+        write_course_csv(path, responses)
+        course_files[name] = path
+
+    index = load_all_courses_index(course_files)
+    assert list(index["course"].cat.categories) == ["Course A", "Course B"]
+    assert index["num_responses"].tolist() == [100, 200, 300, 400]
+    assert index["course"].astype(str).tolist() == ["Course A", "Course B", "Course A", "Course B"]
+    # Sorting by the index gives back the course order, then the file order.
+    assert index.sort_index()["num_responses"].tolist() == [300, 100, 200, 400]
+    # Cached like single courses.
+    assert load_all_courses_index(course_files) is index
+
+
+def test_load_all_courses_index_does_not_keep_courses_twice(tmp_path):
+    course_files = {}
+    for name, responses in [("Course A", [100, 200]), ("Course B", [300, 400])]:
+        path = tmp_path / f"{name[-1].lower()}_cleaned.csv"
+        write_course_csv(path, responses)
+        course_files[name] = path
+    # Course B has no third wrong answer column at all.
+    pd.read_csv(course_files["Course B"]).drop(columns=["failed3_response"]).to_csv(
+        course_files["Course B"], index=False
+    )
+    load_course_index(course_files["Course A"])
+
+    index = load_all_courses_index(course_files)
+    assert isinstance(index["failed3_response"].dtype, pd.CategoricalDtype)
+    assert index["failed3_response"].isna().tolist() == [False, False, True, True]
+    # The per-course indexes were handed over to the combined one.
+    assert not course_store._CACHE
+
+
+def test_data_version_changes_when_file_changes(tmp_path):
+    course_file = tmp_path / "course_cleaned.csv"
+    write_course_csv(course_file, [100, 200])
+    version = data_version(course_file)
+    assert data_version(course_file) == version
+
+    stat = os.stat(course_file)
+    os.utime(course_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert data_version(course_file) != version
+
+
+def test_load_document_rollups_prefers_stored_rollup(tmp_path):
+    a, b = tmp_path / "a_cleaned.csv", tmp_path / "b_cleaned.csv"
+    write_course_csv(a, [100, 300])
+    write_course_csv(b, [10, 30])
+    # A stored rollup that is newer than the course is used as is; b's is computed from the course.
+    stored = pd.DataFrame({"document_id": [1], "document_name": ["Doc"], "%failed": [12.5]})
+    stored.to_csv(rollup_path(a), index=False)
+    signature = os.stat(a).st_mtime_ns
+    os.utime(rollup_path(a), ns=(signature + 10**9, signature + 10**9))
+
+    rollups = load_document_rollups({"A": str(a), "B": str(b)})
+    assert rollups["course"].astype(str).tolist() == ["A", "B"]
+    assert rollups["%failed"].tolist() == [12.5, 50.0]
+
+    # Once the course is newer than its rollup, the rollup is recomputed.
+    os.utime(a, ns=(signature + 2 * 10**9, signature + 2 * 10**9))
+    assert load_document_rollups({"A": str(a)})["%failed"].tolist() == [50.0]
@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+
+from src.utils.dashboard_helpers import (
+    build_document_links,
+    build_response_index,
+    filter_by_min_responses,
+    filter_data,
+    page_count,
+    paginate,
+)
+
+
+@pytest.fixture
+def sample_df():
+    data = {
+        "document_id": [10299, 9298],
+        "document_name": ["What is a Percent?", "What's a Writing Problem?"],
+        "pointer": ["body11MultiAnswerProblem", "body3MultiAnswerProblem"],
+    }
+    return pd.DataFrame(data)
+
+
+def test_build_document_links(sample_df):
+    prefix = "https://www.aops.com/crypt/composite/519/"
+    links = build_document_links(sample_df, prefix)
+
+    # Same format as building each link with an f-string per row.
+    expected = [f"{prefix}{row['document_id']}?docName={row['document_name']}" for _, row in sample_df.iterrows()]
+    assert links.tolist() == expected
+    assert links.name == "document_link"
+
+
+def test_build_document_links_keeps_index(sample_df):
+    # Only the displayed (filtered) rows get links, so the index must line up with them.
+    subset = sample_df.iloc[[1]]
+    links = build_document_links(subset, "prefix/")
+    assert links.index.tolist() == [1]
+    assert links.iloc[0] == "prefix/9298?docName=What's a Writing Problem?"
+
+
+def test_build_document_links_leaves_rows_without_prefix_unlinked(sample_df):
+    links = build_document_links(sample_df, pd.Series(["prefix/", None], index=sample_df.index))
+    assert links.iloc[0] == "prefix/10299?docName=What is a Percent?"
+    assert pd.isna(links.iloc[1])
+
+
+def test_build_document_links_missing_columns(sample_df):
+    links = build_document_links(sample_df.drop(columns=["document_id"]), "prefix/")
+    assert (links == "").all()
+
+
+def test_filter_data_reuses_stored_wrong_combined():
+    df = pd.DataFrame(
+        {
+            "num_responses": [100, 200, 10],
+            "%failed": [35, 100, 35],
+            "%failed1": [20, 20, 20],
+            "%failed2": [10, 10, 10],
+            "%failed3": [5, 5, 5],
+            # Deliberately different from the sum of %failed1..3 to show it isn't recomputed.
+            "%wrong_combined": [99, 50, 50],
+        }
+    )
+    filtered = filter_data(df, min_attempts=50)
+    # Row 0 is dropped for %wrong_combined >= 99, row 1 for %failed == 100, row 2 for too few responses.
+    assert filtered.empty
+
+    filtered = filter_data(df.drop(columns=["%wrong_combined"]), min_attempts=50)
+    assert filtered["%wrong_combined"].tolist() == [35]
+
+
+def test_filter_by_min_responses_matches_filter_data():
+    df = pd.DataFrame(
+        {
+            "pointer": [f"p{i}" for i in range(8)],
+            "num_responses": [50, 10, 30, 30, None, 200, 5, 30],
+            "%failed": [10, 20, 100, 30, 10, 40, 10, 50],
+            "%failed1": [5, 60, 10, 10, 5, 20, 1, 5],
+            "%failed2": [0, 39, 0, 5, 0, 10, 0, 5],
+            "%failed3": [0, 1, 0, 0, 0, 5, 0, 5],
+        }
+    )
+    indexed = build_response_index(df)
+    for min_attempts in [0, 5, 6, 30, 31, 200, 201]:
+        expected = filter_data(df, min_attempts)
+        filtered = filter_by_min_responses(indexed, min_attempts)
+        pd.testing.assert_frame_equal(filtered.sort_index(), expected)
+        # The slice comes in num_responses order; chronological pages restore the original order.
+        assert filtered["num_responses"].is_monotonic_increasing
+        for page in [1, 2]:
+            pd.testing.assert_frame_equal(paginate(filtered, page, 2, chronological=True), paginate(expected, page, 2))
+
+
+def test_paginate_slices_in_current_order():
+    df = pd.DataFrame({"num_responses": range(10)}).sort_values("num_responses", ascending=False)
+    assert page_count(len(df), 4) == 3
+    assert paginate(df, 1, 4)["num_responses"].tolist() == [9, 8, 7, 6]
+    assert paginate(df, 3, 4)["num_responses"].tolist() == [1, 0]
+    # Out-of-range pages are clamped.
+    assert paginate(df, 5, 4)["num_responses"].tolist() == [1, 0]
+    assert paginate(df, 0, 4)["num_responses"].tolist() == [9, 8, 7, 6]
+
+
+def test_page_count_of_empty_table():
+    assert page_count(0, 25) == 1
+    assert paginate(pd.DataFrame({"num_responses": []}), 1, 25).empty
+
+
+def test_paginate_sort_by_matches_sorted_frame():
+    df = pd.DataFrame({"%failed": [10.0, 50.0, 30.0, 40.0, 20.0], "pointer": list("abcde")}, index=[7, 3, 5, 1, 9])
+    expected = df.sort_values(by="%failed", ascending=False)
+    pd.testing.assert_frame_equal(paginate(df, 1, 2, sort_by="%failed"), expected.iloc[0:2])
+    pd.testing.assert_frame_equal(paginate(df, 3, 2, sort_by="%failed"), expected.iloc[4:5])
@@ -0,0 +1,60 @@
+import tracemalloc
+
+import pandas as pd
+
+from src.utils.instrumentation import ENV_VAR, drain_records, instrumented
+
+
+@instrumented("keep_even")
+def keep_even(df):
+    return df[df["n"] % 2 == 0]
+
+
+@instrumented("outer")
+def outer(df):
+    return keep_even(df.copy())
+
+
+def test_disabled_records_nothing(monkeypatch):
+    monkeypatch.delenv(ENV_VAR, raising=False)
+    drain_records()
+    assert len(keep_even(pd.DataFrame({"n": range(10)}))) == 5
+    assert drain_records() == []
+
+
+def test_enabled_records_rows_time_and_memory(monkeypatch):
+    monkeypatch.setenv(ENV_VAR, "1")
+    drain_records()
+    keep_even(pd.DataFrame({"n": range(10)}))
+
+    [record] = drain_records()
+    assert record["stage"] == "keep_even"
+    assert record["rows_in"] == 10
+    assert record["rows_out"] == 5
+    assert record["seconds"] >= 0
+    assert set(record) == {"stage", "seconds", "rows_in", "rows_out", "memory_delta_mb", "peak_mb"}
+    assert drain_records() == []
+    # Allocations are only traced while a stage runs.
+    assert not tracemalloc.is_tracing()
+
+
+def test_leaves_tracing_started_elsewhere_running(monkeypatch):
+    monkeypatch.setenv(ENV_VAR, "1")
+    tracemalloc.start()
+    try:
+        outer(pd.DataFrame({"n": range(10)}))
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+    drain_records()
+
+
+def test_nested_stages_keep_outer_peak(monkeypatch):
+    monkeypatch.setenv(ENV_VAR, "1")
+    drain_records()
+    outer(pd.DataFrame({"n": range(100_000)}))
+
+    inner_record, outer_record = drain_records()
+    assert (inner_record["stage"], outer_record["stage"]) == ("keep_even", "outer")
+    # The outer stage's copy is allocated before the inner stage starts.
+    assert outer_record["peak_mb"] >= inner_record["peak_mb"] + 0.5
@@ -1,7 +1,7 @@
 import pandas as pd
 import pytest
 
-from src.data.loader import clean_data
+from src.data.loader import clean_data, clean_data_with_report
 
 
 @pytest.fixture
@@ -47,3 +47,30 @@ def test_clean_data(sample_raw_data):
     assert row0["failed1_response"] == "[1]"
     assert row0["%failed2"] == 1.0
     assert row0["failed2_response"] == "[2]"
+
+
+def test_clean_data_copy_leaves_input_untouched(sample_raw_data):
+    original = sample_raw_data.copy()
+    cleaned_df = clean_data(sample_raw_data)
+
+    pd.testing.assert_frame_equal(sample_raw_data, original)
+    assert (cleaned_df["%failed3"] == 0).all()
+
+
+def test_clean_data_in_place(sample_raw_data):
+    cleaned_df = clean_data(sample_raw_data, copy=False)
+
+    assert cleaned_df is sample_raw_data
+    assert (sample_raw_data["failed3_response"] == "").all()
+
+
+def test_clean_data_with_report_counts_coercions(sample_raw_data):
+    sample_raw_data["%giveup"] = ["0", "not a number"]
+    cleaned_df, report = clean_data_with_report(sample_raw_data)
+
+    assert cleaned_df["%giveup"].tolist() == [0.0, 0.0]
+    assert report["percent"]["%giveup"] == 1
+    assert report["percent"]["%failed3"] == 2
+    assert report["percent"]["%failed1"] == 0
+    assert report["response"]["failed3_response"] == 2
+    assert report["response"]["failed1_response"] == 0
@@ -1,8 +1,17 @@
+import json
+import os
 from pathlib import Path
 
 import pandas as pd
+import pytest
 
-from src.data.process_all import process_file
+from src.data import course_db, process_all
+from src.data.course_db import CourseDB
+from src.data.derived import DERIVED_SCHEMA_VERSION
+from src.data.loader import load_processed_data
+from src.data.process_all import process_all_files, process_file
+from src.data.sketch import read_sketch
+from src.data.summary import build_summary_table
 
 
 def create_dummy_csv(path: Path):
@@ -48,3 +57,286 @@ def test_process_file(tmp_path):
     # Check that the course name is computed as expected (e.g., "Dummy Data")
     expected_course = "Dummy Data".title()
     assert df_processed["course"].iloc[0] == expected_course
+
+    # Derived columns are materialized once, here, with the schema version.
+    row = df_processed.iloc[0]
+    assert row["%wrong_combined"] == 35
+    assert row["total_fails"] == 35
+    assert row["top three wrong answers"] == "1) [0] (20%), 2) [1] (10%), 3) [2] (5%)"
+    assert row["schema_version"] == DERIVED_SCHEMA_VERSION
+
+
+def test_process_file_writes_typed_columnar_copy(tmp_path):
+    pytest.importorskip("pyarrow")
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    processed_dir = tmp_path / "processed"
+    processed_dir.mkdir()
+    dummy_csv = raw_dir / "dummy_data.csv"
+    create_dummy_csv(dummy_csv)
+
+    process_file(dummy_csv, processed_dir)
+
+    parquet_file = processed_dir / "dummy_data_cleaned.parquet"
+    assert parquet_file.exists(), "Columnar file was not created"
+
+    # Loaders prefer the columnar copy and get the typed schema back.
+    df = load_processed_data(processed_dir / "dummy_data_cleaned.csv")
+    assert isinstance(df["document_name"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["pointer"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["course"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["failed1_response"].dtype, pd.CategoricalDtype)
+    assert df["%failed1"].dtype == "float64"
+    assert df["num_responses"].dtype == "int32"
+    assert df["failed1_response"].iloc[0] == "[0]"
+    assert df["course"].iloc[0] == "Dummy Data"
+
+
+def test_columnar_copy_gives_the_same_summary_as_the_csv(tmp_path):
+    pytest.importorskip("pyarrow")
+    raw_csv = tmp_path / "dummy_data.csv"
+    create_dummy_csv(raw_csv)
+    raw = pd.read_csv(raw_csv)
+    raw["%failed1"] = 7.67913048614803
+    raw.to_csv(raw_csv, index=False)
+
+    process_file(raw_csv, tmp_path)
+
+    # The raw percentages survive the Parquet round trip unchanged.
+    from_parquet = build_summary_table(load_processed_data(tmp_path / "dummy_data_cleaned.csv"))
+    from_csv = build_summary_table(pd.read_csv(tmp_path / "dummy_data_cleaned.csv"))
+    assert from_parquet["top three wrong answers"].tolist() == from_csv["top three wrong answers"].tolist()
+    assert from_parquet["top three wrong answers"].iloc[0].startswith("1) [0] (7.67913048614803%)")
+
+
+def test_process_all_files_parallel_isolates_failures(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    processed_dir = tmp_path / "processed"
+    create_dummy_csv(raw_dir / "b_data.csv")
+    create_dummy_csv(raw_dir / "a_data.csv")
+    # An empty file can't be parsed; it should fail without stopping the other files.
+    (raw_dir / "broken_data.csv").write_text("")
+
+    results = process_all_files(raw_dir, processed_dir, workers=2)
+
+    # Results are reported in sorted file order regardless of which worker finished first.
+    assert [result["file"] for result in results] == ["a_data.csv", "b_data.csv", "broken_data.csv"]
+    assert [result["status"] for result in results] == ["ok", "ok", "failed"]
+    assert [result["rows"] for result in results] == [1, 1, 0]
+    assert "EmptyDataError" in results[2]["error"]
+    assert (processed_dir / "a_data_cleaned.csv").exists()
+    assert (processed_dir / "b_data_cleaned.csv").exists()
+    assert not (processed_dir / "broken_data_cleaned.csv").exists()
+
+
+def _crash_on_crash_data(raw_filepath, processed_dir, **options):
+    # Dies like a worker killed by the OOM killer: no exception, the process is just gone.
+    if raw_filepath.name == "crash_data.csv":
+        os._exit(1)
+    return process_file(raw_filepath, processed_dir, **options)
+
+
+def test_process_all_files_survives_a_dead_worker(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    processed_dir = tmp_path / "processed"
+    for name in ["a_data.csv", "b_data.csv", "crash_data.csv"]:
+        create_dummy_csv(raw_dir / name)
+    # Workers are forked, so they see the patched process_file.
+    monkeypatch.setattr("src.data.process_all.process_file", _crash_on_crash_data)
+
+    results = process_all_files(raw_dir, processed_dir, workers=2)
+
+    assert [result["file"] for result in results] == ["a_data.csv", "b_data.csv", "crash_data.csv"]
+    assert results[2]["status"] == "failed"
+    assert "BrokenProcessPool" in results[2]["error"]
+    # Files that finished before the pool broke are recorded; the others are retried next run.
+    manifest = json.loads((processed_dir / "manifest.json").read_text())
+    assert set(manifest["files"]) == {result["file"] for result in results if result["status"] == "ok"}
+
+
+def test_process_all_files_reprocesses_a_file_rewritten_while_processing(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    processed_dir = tmp_path / "processed"
+    raw_file = raw_dir / "a_data.csv"
+    create_dummy_csv(raw_file)
+
+    original = process_all.process_file
+
+    def process_then_rewrite(raw_filepath, *args, **kwargs):
+        rows = original(raw_filepath, *args, **kwargs)
+        # A new export lands after the old one was read.
+        pd.read_csv(raw_filepath).assign(num_responses=5000).to_csv(raw_filepath, index=False)
+        return rows
+
+    monkeypatch.setattr(process_all, "process_file", process_then_rewrite)
+    process_all_files(raw_dir, processed_dir)
+    monkeypatch.setattr(process_all, "process_file", original)
+
+    assert [result["status"] for result in process_all_files(raw_dir, processed_dir)] == ["ok"]
+    assert pd.read_csv(processed_dir / "a_data_cleaned.csv")["num_responses"].tolist() == [5000]
+
+
+def test_process_all_files_skips_unchanged_and_prunes_removed(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    processed_dir = tmp_path / "processed"
+    create_dummy_csv(raw_dir / "a_data.csv")
+    create_dummy_csv(raw_dir / "b_data.csv")
+
+    first = process_all_files(raw_dir, processed_dir)
+    assert [result["status"] for result in first] == ["ok", "ok"]
+    assert (processed_dir / "manifest.json").exists()
+
+    # Nothing changed, so nothing is reprocessed.
+    second = process_all_files(raw_dir, processed_dir)
+    assert [result["status"] for result in second] == ["skipped", "skipped"]
+    assert [result["rows"] for result in second] == [1, 1]
+
+    # Change one file and delete the other.
+    df = pd.read_csv(raw_dir / "a_data.csv")
+    pd.concat([df, df]).to_csv(raw_dir / "a_data.csv", index=False)
+    (raw_dir / "b_data.csv").unlink()
+
+    third = process_all_files(raw_dir, processed_dir)
+    assert [(result["file"], result["status"], result["rows"]) for result in third] == [("a_data.csv", "ok", 2)]
+    assert not (processed_dir / "b_data_cleaned.csv").exists()
+    assert not (processed_dir / "b_data_cleaned.sketch.json").exists()
+    # The course database only holds the remaining course.
+    assert CourseDB(processed_dir / "courses.sqlite").count(min_attempts=0) == 2
+
+    # force=True reprocesses even unchanged files.
+    assert process_all_files(raw_dir, processed_dir, force=True)[0]["status"] == "ok"
+
+
+def test_process_all_files_updates_only_changed_courses_in_the_course_db(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    processed_dir = tmp_path / "processed"
+    create_dummy_csv(raw_dir / "a_data.csv")
+    create_dummy_csv(raw_dir / "b_data.csv")
+    process_all_files(raw_dir, processed_dir)
+
+    loaded = []
+    original = course_db.load_processed_data
+    monkeypatch.setattr(course_db, "load_processed_data", lambda path: loaded.append(Path(path).name) or original(path))
+    create_dummy_csv(raw_dir / "c_data.csv")
+    process_all_files(raw_dir, processed_dir)
+    assert loaded == ["c_data_cleaned.csv"]
+    assert CourseDB(processed_dir / "courses.sqlite").count(min_attempts=0) == 3
+
+
+def test_process_all_files_reprocesses_on_cleaning_version_change(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    processed_dir = tmp_path / "processed"
+    create_dummy_csv(raw_dir / "a_data.csv")
+    process_all_files(raw_dir, processed_dir)
+
+    monkeypatch.setattr("src.data.process_all.CLEANING_VERSION", 999)
+    assert process_all_files(raw_dir, processed_dir)[0]["status"] == "ok"
+
+
+def test_process_file_streaming_matches_in_memory(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    raw_csv = raw_dir / "mixed_data.csv"
+    # Chunks of two rows see different shapes of data: ints vs floats, a fully empty %failed3,
+    # a numeric-looking response and missing responses.
+    raw_csv.write_text(
+        "document_id,document_name,pointer,num_responses,%failed,%failed1,failed1_response,"
+        "%failed2,failed2_response,%failed3,failed3_response\n"
+        "1,Doc A,p1,100,35,20,[0],10,[1],,\n"
+        "1,Doc A,p2,120,12.5,7.5,05,5,[1],,\n"
+        "2,Doc B,p1,80,40.25,30,addition,bad,[2],5.5,[3]\n"
+        "2,Doc B,p2,90,0,0,,0,,0,\n"
+        "3,Doc C,p1,70,9,9,1.50,,,,\n"
+    )
+
+    in_memory_dir = tmp_path / "in_memory"
+    in_memory_dir.mkdir()
+    streaming_dir = tmp_path / "streaming"
+    streaming_dir.mkdir()
+    assert process_file(raw_csv, in_memory_dir) == 5
+    assert process_file(raw_csv, streaming_dir, chunksize=2) == 5
+
+    in_memory_csv = (in_memory_dir / "mixed_data_cleaned.csv").read_bytes()
+    assert (streaming_dir / "mixed_data_cleaned.csv").read_bytes() == in_memory_csv
+    # Responses are kept verbatim.
+    assert b",05," in in_memory_csv and b",1.50," in in_memory_csv
+
+    if (in_memory_dir / "mixed_data_cleaned.parquet").exists():
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(streaming_dir / "mixed_data_cleaned.parquet"),
+            pd.read_parquet(in_memory_dir / "mixed_data_cleaned.parquet"),
+            check_categorical=False,
+        )
+    # No temporary files are left behind.
+    assert not list(streaming_dir.glob("*.tmp"))
+
+
+def test_process_file_writes_num_responses_sketch(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    processed_dir = tmp_path / "processed"
+    processed_dir.mkdir()
+    raw_csv = raw_dir / "big_data.csv"
+    create_dummy_csv(raw_csv)
+    df = pd.read_csv(raw_csv)
+    df = df.loc[df.index.repeat(1000)].reset_index(drop=True).assign(num_responses=range(1000))
+    # Rows summarize_course drops by default (no wrong answers) are left out of the sketch too.
+    df.loc[:99, ["%failed1", "%failed2", "%failed3"]] = 0
+    df.to_csv(raw_csv, index=False)
+
+    process_file(raw_csv, processed_dir, chunksize=128)
+    sketch_file = processed_dir / "big_data_cleaned.sketch.json"
+    sketch = read_sketch(sketch_file)
+    assert sketch.n == 900
+    assert abs(sketch.quantile(0.25) - 325) <= 25
+
+    # The sketch is seeded by file name, so processing the same export again writes the same sketch.
+    first = sketch_file.read_bytes()
+    process_file(raw_csv, processed_dir, chunksize=128)
+    assert sketch_file.read_bytes() == first
+
+
+def test_process_file_collapses_versions_while_streaming(tmp_path):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    raw_csv = raw_dir / "versioned_data.csv"
+    create_dummy_csv(raw_csv)
+    df = pd.read_csv(raw_csv)
+    # Three versions of problem 1 and two of problem 2, interleaved across chunks.
+    df = pd.concat([df] * 5, ignore_index=True).assign(
+        document_id=[1, 2, 1, 2, 1],
+        version=[1, 1, 2, 2, 3],
+        num_responses=[100, 50, 300, 150, 0],
+        **{"%failed": [10.0, 40.0, 20.0, 60.0, 99.0]},
+    )
+    df.to_csv(raw_csv, index=False)
+
+    for versions, rows in [("all", 5), ("latest", 2), ("aggregate", 2)]:
+        in_memory_dir, streaming_dir = tmp_path / f"{versions}_in_memory", tmp_path / f"{versions}_streaming"
+        in_memory_dir.mkdir()
+        streaming_dir.mkdir()
+        assert process_file(raw_csv, in_memory_dir, versions=versions) == rows
+        assert process_file(raw_csv, streaming_dir, chunksize=2, versions=versions) == rows
+        in_memory = (in_memory_dir / "versioned_data_cleaned.csv").read_bytes()
+        assert (streaming_dir / "versioned_data_cleaned.csv").read_bytes() == in_memory
+
+    aggregated = pd.read_csv(tmp_path / "aggregate_in_memory" / "versioned_data_cleaned.csv")
+    # Rows are where each problem's latest version was: problem 2 first.
+    assert aggregated["%failed"].tolist() == [55.0, 17.5]
+    assert aggregated["versions"].tolist() == [2, 3]
+
+    # The version index covers every version, whatever was written.
+    # The document rollup covers the rows that were written.
+    rollup = pd.read_csv(tmp_path / "aggregate_streaming" / "versioned_data_cleaned.documents.csv")
+    assert rollup["num_responses"].tolist() == [200, 400]
+
+    index = pd.read_csv(tmp_path / "latest_streaming" / "versioned_data_cleaned.versions.csv")
+    assert index["version"].tolist() == [1, 2, 3, 1, 2]
+    assert index["delta_%failed"].fillna(-1).tolist() == [-1, 10.0, 79.0, -1, 20.0]
+    assert index["latest"].tolist() == [False, False, True, False, True]
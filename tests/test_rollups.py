@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from src.data.rollups import document_rollup
+
+
+def pointers():
+    return pd.DataFrame(
+        {
+            "course": "A",
+            "document_id": [7, 7, 7, 3, 3, 9],
+            "document_name": ["Seven", "Seven", "Seven", "Three", "Three", "Nine"],
+            "pointer": ["p1", "p2", "p3", "p1", "p2", "p1"],
+            "num_responses": [100, 300, 50, 0, 0, 10],
+            "%failed": [10.0, 30.0, 100.0, 20.0, 40.0, 5.0],
+            "%giveup": [0.0, 4.0, 0.0, 1.0, 3.0, 0.0],
+            "%trigger_goto": 0.0,
+            "%wrong_combined": [5.0, 20.0, 99.5, 10.0, 30.0, 5.0],
+        }
+    )
+
+
+def test_document_rollup_weights_by_responses():
+    rollup = document_rollup(pointers())
+    # Documents keep their first-appearance order; p3 of document 7 is a bogus row and is left out.
+    assert rollup["document_id"].tolist() == [7, 3, 9]
+    assert rollup["pointers"].tolist() == [2, 2, 1]
+    assert rollup["num_responses"].tolist() == [400, 0, 10]
+    # (10 * 100 + 30 * 300) / 400; document 3 has no responses, so it gets the plain mean.
+    np.testing.assert_allclose(rollup["%failed"], [25.0, 30.0, 5.0])
+    np.testing.assert_allclose(rollup["%giveup"], [3.0, 2.0, 0.0])
+
+
+def test_document_rollup_worst_pointer():
+    rollup = document_rollup(pointers()).set_index("document_id")
+    assert rollup["worst_pointer"].to_dict() == {7: "p2", 3: "p2", 9: "p1"}
+    assert rollup["worst_%failed"].to_dict() == {7: 30.0, 3: 40.0, 9: 5.0}
+    assert rollup.loc[7, "max_num_responses"] == 300
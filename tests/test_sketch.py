@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from src.analysis.summarize import filter_by_num_responses_percentile
+from src.data.sketch import QuantileSketch, load_course_sketch, merged_course_sketch, sketch_of
+
+
+def rank_error(values: np.ndarray, sketch: QuantileSketch, q: float) -> float:
+    """
+    Returns how far (as a fraction of all values) the sketch's q-quantile is from rank q.
+    """
+    ordered = np.sort(values)
+    estimate = sketch.quantile(q)
+    low = np.searchsorted(ordered, estimate, side="left") / len(values)
+    high = np.searchsorted(ordered, estimate, side="right") / len(values)
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+
+def test_sketch_rank_error_is_bounded():
+    values = np.random.default_rng(0).lognormal(7, 1.3, 200_000).astype(int)
+    sketch = QuantileSketch(seed=0)
+    for chunk in np.array_split(values, 20):
+        sketch.update(chunk)
+
+    assert sketch.n == len(values)
+    assert sum(len(items) for items in sketch.levels) < 1000
+    assert max(rank_error(values, sketch, q) for q in np.linspace(0.01, 0.99, 99)) < 0.03
+
+
+def test_merged_sketches_match_one_pass():
+    rng = np.random.default_rng(1)
+    parts = [rng.integers(0, 1000, 30_000), rng.integers(500, 5000, 50_000), rng.integers(0, 100, 20_000)]
+    merged = QuantileSketch(seed=1)
+    for part in parts:
+        merged.merge(QuantileSketch(seed=2).update(part))
+
+    values = np.concatenate(parts)
+    assert merged.n == len(values)
+    assert max(rank_error(values, merged, q) for q in [0.1, 0.25, 0.5, 0.75, 0.9]) < 0.03
+
+
+def test_sketch_round_trips_and_handles_empty():
+    sketch = QuantileSketch(k=50).update([3, 1, 2, np.nan])
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.n == 3
+    assert restored.quantile(0.5) == sketch.quantile(0.5) == 2
+    assert np.isnan(QuantileSketch().quantile(0.5))
+
+
+def test_course_sketches_fall_back_to_the_column(tmp_path):
+    for name, responses in [("a", range(0, 100)), ("b", range(100, 200))]:
+        df = pd.DataFrame({"num_responses": responses, "%wrong_combined": 50.0})
+        # Rows outside the %wrong_combined bounds aren't sketched.
+        df.loc[:9, "%wrong_combined"] = 0.0
+        df.to_csv(tmp_path / f"{name}_cleaned.csv", index=False)
+
+    assert load_course_sketch(tmp_path / "a_cleaned.csv").n == 90
+    merged = merged_course_sketch(sorted(tmp_path.glob("*_cleaned.csv")))
+    assert merged.n == 180
+    assert abs(merged.quantile(0.5) - 104.5) <= 10
+    # Other bounds rebuild the sketches; merging is seeded, so the cutoff is the same on every call.
+    assert merged_course_sketch(sorted(tmp_path.glob("*_cleaned.csv")), bounds=(-1, 99)).n == 200
+    assert merged_course_sketch(sorted(tmp_path.glob("*_cleaned.csv"))).quantile(0.5) == merged.quantile(0.5)
+
+
+def test_filter_by_percentile_with_sketch():
+    df = pd.DataFrame({"num_responses": range(100)})
+    assert filter_by_num_responses_percentile(df, 0.5)["num_responses"].min() == 50
+    # The sketch holds every value here, so its cutoff is the lower median rather than an interpolated one.
+    approximate = filter_by_num_responses_percentile(df, 0.5, sketch=sketch_of(df["num_responses"]))
+    assert approximate["num_responses"].min() == 49
@@ -1,6 +1,9 @@
 import pandas as pd
 
-from src.analysis.summarize import build_summary_table, summarize_wrong_answers
+from src.analysis.summarize import compare_documents_across_courses, main, summarize_course, summarize_wrong_answers
+from src.data.summary import build_summary_table, summarize_wrong_answers_vectorized
+from src.utils.dashboard_helpers import summarize_wrong_answers as summarize_wrong_answers_rounded
+from src.utils.dashboard_helpers import summarize_wrong_answers_column
 
 
 def test_summarize_wrong_answers():
@@ -56,3 +59,92 @@ def test_build_summary_table():
     pd.testing.assert_series_equal(
         summary_table["%wrong_combined"], pd.Series(expected_wrong_combined, name="%wrong_combined")
     )
+
+
+def test_summarize_wrong_answers_vectorized_matches_apply():
+    # Mix of ints, floats, zeros, missing percentages and missing responses.
+    df = pd.DataFrame(
+        {
+            "document_name": ["Doc", "Doc", "Doc", "Doc"],
+            "%failed1": [30, 7.67913048614803, 0, 2.5],
+            "failed1_response": ["[0]", "[1]", "[2]", None],
+            "%failed2": [15, 0.6143304388918424, 12.5, None],
+            "failed2_response": ["[1]", "[1]", "addition", "[3]"],
+            "%failed3": [5, 0, 0.4, 99.5],
+            "failed3_response": ["[2]", "", "[4]", "[5]"],
+        }
+    )
+
+    raw = summarize_wrong_answers_vectorized(df)
+    assert raw.tolist() == df.apply(summarize_wrong_answers, axis=1).tolist()
+
+    rounded = summarize_wrong_answers_column(df)
+    assert rounded.tolist() == df.apply(summarize_wrong_answers_rounded, axis=1).tolist()
+    assert rounded.iloc[0] == "1) [0] (30%), 2) [1] (15%), 3) [2] (5%)"
+
+
+def test_summarize_wrong_answers_vectorized_handles_huge_percentages():
+    df = pd.DataFrame({"%failed1": [float("inf"), 1e18, 12.5], "failed1_response": ["[0]", "[1]", "[2]"]})
+    rounded = summarize_wrong_answers_column(df)
+    assert rounded.tolist() == df.apply(summarize_wrong_answers_rounded, axis=1).tolist()
+    assert rounded.iloc[0] == "1) [0] (inf%)"
+
+
+def test_compare_documents_across_courses():
+    df = pd.DataFrame(
+        {
+            "document_id": [1, 1, 1, 2],
+            "document_name": ["Doc 1", "Doc 1", "Doc 1", "Doc 2"],
+            "course": ["A", "A", "B", "A"],
+            "num_responses": [100, 300, 50, 10],
+            "%failed": [40.0, 20.0, 60.0, 90.0],
+        }
+    )
+    comparison = compare_documents_across_courses(df)
+    # Doc 2 is only in one course; Doc 1's %failed in course A is weighted by num_responses.
+    assert comparison["document_id"].tolist() == [1]
+    assert comparison["document_name"].tolist() == ["Doc 1"]
+    assert comparison["A"].tolist() == [25.0]
+    assert comparison["B"].tolist() == [60.0]
+
+
+def make_course_df(n=40):
+    return pd.DataFrame(
+        {
+            "course": ["Course A"] * n,
+            "document_name": [f"Doc {i // 4}" for i in range(n)],
+            "pointer": [f"p{i}" for i in range(n)],
+            "num_responses": [10 * (i + 1) for i in range(n)],
+            "%failed": [50.0] * n,
+            "%failed1": [float(i % 17) for i in range(n)],
+            "failed1_response": ["[0]"] * n,
+            "%failed2": [float(i % 5) for i in range(n)],
+            "failed2_response": ["[1]"] * n,
+            "%failed3": [0.0] * n,
+            "failed3_response": [""] * n,
+        }
+    )
+
+
+def test_summarize_course_top_k_matches_full_sort():
+    df = make_course_df()
+    full = summarize_course(df, percentile=0.25)
+    top = summarize_course(df, percentile=0.25, top_k=5)
+    assert top["%wrong_combined"].tolist() == full["%wrong_combined"].head(5).tolist()
+    # The bounds and the percentile cutoff are applied before ranking.
+    assert (full["%wrong_combined"] > 0).all()
+    assert full["num_responses"].min() >= df["num_responses"].quantile(0.25)
+    assert summarize_course(df, lower=10, upper=12)["%wrong_combined"].between(10, 12, inclusive="neither").all()
+
+
+def test_export_cli_writes_every_course(tmp_path):
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    make_course_df().to_csv(processed / "course_a_data_cleaned.csv", index=False)
+    make_course_df().assign(course="Course B").to_csv(processed / "course_b_data_cleaned.csv", index=False)
+
+    output = tmp_path / "summary.jsonl"
+    assert main(["--processed-dir", str(processed), "--output", str(output), "--top-k", "3"]) == 0
+    exported = pd.read_json(output, lines=True)
+    assert exported["course"].tolist() == ["Course A"] * 3 + ["Course B"] * 3
+    assert "top three wrong answers" in exported.columns
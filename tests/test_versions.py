@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.derived import add_derived_columns
+from src.data.versions import aggregate_versions, collapse_versions, latest_versions, version_deltas
+
+
+@pytest.fixture
+def versioned():
+    return pd.DataFrame(
+        {
+            "document_id": [1, 1, 2, 1, 2, 3],
+            "pointer": "p1",
+            "version": [1, 2, 1, 3, 2, 1],
+            "num_responses": [100, 300, 50, 0, 150, 10],
+            "%failed": [10.0, 20.0, 40.0, 99.0, 60.0, 5.0],
+            "%failed1": [5.0, 10.0, 20.0, 50.0, 30.0, 5.0],
+            "failed1_response": ["a", "b", "c", "d", "e", "f"],
+            "%failed2": 0.0,
+            "%failed3": 0.0,
+        }
+    )
+
+
+def test_latest_versions_keeps_original_order(versioned):
+    latest = latest_versions(versioned)
+    assert latest.index.tolist() == [3, 4, 5]
+    assert latest["version"].tolist() == [3, 2, 1]
+
+
+def test_aggregate_versions_weights_by_num_responses(versioned):
+    aggregated = aggregate_versions(add_derived_columns(versioned.copy()))
+    assert aggregated["num_responses"].tolist() == [400, 200, 10]
+    assert aggregated["versions"].tolist() == [3, 2, 1]
+    # (10 * 100 + 20 * 300 + 99 * 0) / 400; the latest version had no responses.
+    np.testing.assert_allclose(aggregated["%failed"], [17.5, 55.0, 5.0])
+    # The wrong answers keep their latest version's percentages, and derived columns follow them.
+    assert aggregated["failed1_response"].tolist() == ["d", "e", "f"]
+    np.testing.assert_allclose(aggregated["%failed1"], [50.0, 30.0, 5.0])
+    np.testing.assert_allclose(aggregated["%wrong_combined"], aggregated["%failed1"])
+    assert aggregated["top three wrong answers"].tolist() == ["1) d (50%)", "1) e (30%)", "1) f (5%)"]
+
+
+def test_aggregating_in_parts_matches_one_pass(versioned):
+    parts = aggregate_versions(pd.concat([aggregate_versions(versioned.iloc[:3]), versioned.iloc[3:]]))
+    whole = aggregate_versions(versioned)
+    pd.testing.assert_frame_equal(parts.reset_index(drop=True), whole.reset_index(drop=True))
+
+
+def test_version_deltas(versioned):
+    index = version_deltas(versioned)
+    assert index[["document_id", "version"]].values.tolist() == [[1, 1], [1, 2], [1, 3], [2, 1], [2, 2], [3, 1]]
+    np.testing.assert_allclose(index["delta_%failed"], [np.nan, 10.0, 79.0, np.nan, 20.0, np.nan])
+    assert index["latest"].tolist() == [False, False, True, False, True, True]
+
+
+def test_collapse_versions_modes(versioned):
+    assert collapse_versions(versioned, "all") is versioned
+    assert len(collapse_versions(versioned, "latest")) == 3
+    without_versions = versioned.drop(columns="version")
+    assert collapse_versions(without_versions, "aggregate") is without_versions
+    with pytest.raises(ValueError):
+        collapse_versions(versioned, "newest")
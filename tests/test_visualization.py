@@ -1,8 +1,15 @@
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import pytest
 
-from src.analysis.visualization import create_bubble_chart
+from src.analysis.visualization import (
+    aggregate_by_document,
+    bin_points,
+    cached_bubble_chart,
+    clear_figure_cache,
+    create_bubble_chart,
+)
 
 
 @pytest.fixture
@@ -45,3 +52,87 @@ def test_create_bubble_chart_trace_data(sample_df):
     expected_x = sample_df["%wrong_combined"].tolist()
     # Sort both lists for comparison.
     assert sorted(all_x) == sorted(expected_x), "x-values in traces should match %wrong_combined values"
+
+
+def test_create_bubble_chart_uses_single_webgl_trace_above_threshold(sample_df):
+    fig = create_bubble_chart(sample_df, webgl_threshold=1)
+    assert len(fig.data) == 1
+    assert fig.data[0].type == "scattergl"
+    assert sorted(fig.data[0].x) == sorted(sample_df["%wrong_combined"].tolist())
+
+
+def test_aggregate_by_document_weights_by_responses():
+    df = pd.DataFrame(
+        {
+            "document_name": ["Doc", "Doc", "Other"],
+            "num_responses": [100, 300, 50],
+            "%wrong_combined": [40.0, 20.0, 10.0],
+            "total_fails": [10.0, 30.0, 5.0],
+        }
+    )
+    aggregated = aggregate_by_document(df).set_index("document_name")
+    assert aggregated.loc["Doc", "%wrong_combined"] == 25.0
+    assert aggregated.loc["Doc", "num_responses"] == 400
+    assert aggregated.loc["Doc", "total_fails"] == 40.0
+    assert aggregated.loc["Doc", "pointers"] == 2
+
+
+def test_bin_points_bounds_the_number_of_bubbles():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "%wrong_combined": rng.uniform(0, 100, 5000),
+            "num_responses": rng.integers(1, 10000, 5000),
+            "total_fails": rng.uniform(0, 100, 5000),
+        }
+    )
+    binned = bin_points(df, bins=10)
+    assert len(binned) <= 100
+    assert binned["points"].sum() == len(df)
+    assert binned["total_fails"].sum() == pytest.approx(df["total_fails"].sum())
+
+
+@pytest.mark.parametrize("mode", ["document", "binned"])
+def test_create_bubble_chart_aggregated_modes(sample_df, mode):
+    fig = create_bubble_chart(sample_df, mode=mode)
+    assert len(fig.data) == 1
+    assert "Bubble Chart" in fig.layout.title.text
+
+
+def test_create_bubble_chart_rejects_unknown_mode(sample_df):
+    with pytest.raises(ValueError):
+        create_bubble_chart(sample_df, mode="hexagons")
+
+
+def test_cached_bubble_chart_reuses_figure_per_key(sample_df):
+    clear_figure_cache()
+    fig = cached_bubble_chart(sample_df, ("Course A", 0, "v1"))
+    assert cached_bubble_chart(sample_df, ("Course A", 0, "v1")) is fig
+    # A new slider value, data version or mode builds a new figure.
+    assert cached_bubble_chart(sample_df, ("Course A", 10, "v1")) is not fig
+    assert cached_bubble_chart(sample_df, ("Course A", 0, "v2")) is not fig
+    assert cached_bubble_chart(sample_df, ("Course A", 0, "v1"), mode="binned") is not fig
+    clear_figure_cache()
+
+
+def test_cached_bubble_chart_is_bounded(sample_df):
+    clear_figure_cache()
+    first = cached_bubble_chart(sample_df, ("Course A", 0, "v1"), max_figures=2)
+    cached_bubble_chart(sample_df, ("Course A", 1, "v1"), max_figures=2)
+    cached_bubble_chart(sample_df, ("Course A", 2, "v1"), max_figures=2)
+    assert cached_bubble_chart(sample_df, ("Course A", 0, "v1"), max_figures=2) is not first
+    clear_figure_cache()
+
+
+def test_cached_bubble_chart_loads_data_only_to_build(sample_df):
+    clear_figure_cache()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return sample_df
+
+    fig = cached_bubble_chart(load, ("Course A", 0, "v1"))
+    assert cached_bubble_chart(load, ("Course A", 0, "v1")) is fig
+    assert len(loads) == 1
+    clear_figure_cache()
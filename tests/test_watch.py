@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pandas as pd
+from watchdog.events import FileModifiedEvent, FileMovedEvent, FileOpenedEvent
+
+from src.data.watch import RawFileHandler, is_raw_export, watch
+
+
+def test_is_raw_export():
+    assert is_raw_export("data/raw/algebra_a_data.csv")
+    assert not is_raw_export("data/raw/.algebra_a_data.csv")
+    assert not is_raw_export("data/raw/algebra_a_data.csv.part")
+
+
+def test_handler_debounces_bursts(tmp_path):
+    handler = RawFileHandler(debounce=0.2)
+    for _ in range(5):
+        handler.on_any_event(FileModifiedEvent(str(tmp_path / "a_data.csv")))
+    handler.on_any_event(FileMovedEvent(str(tmp_path / "b.part"), str(tmp_path / "b_data.csv")))
+    # Reads and non-CSV files don't count as changes.
+    handler.on_any_event(FileOpenedEvent(str(tmp_path / "c_data.csv")))
+    handler.on_any_event(FileModifiedEvent(str(tmp_path / "notes.txt")))
+
+    assert handler.settled() == []
+    time.sleep(0.25)
+    assert handler.settled() == [tmp_path / "a_data.csv", tmp_path / "b_data.csv"]
+    assert handler.settled() == []
+
+
+def test_watch_processes_new_exports(tmp_path):
+    raw_dir, processed_dir = tmp_path / "raw", tmp_path / "processed"
+    raw_dir.mkdir()
+    stop = threading.Event()
+    processed = processed_dir / "new_data_cleaned.csv"
+
+    def land_export():
+        # Once watch has caught up (and is observing raw_dir), drop an export and wait for its output.
+        deadline = time.monotonic() + 10
+        while not (processed_dir / "manifest.json").exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        export = {"document_id": [1], "document_name": ["Doc"], "pointer": ["p1"], "num_responses": [10]}
+        for i in [1, 2, 3]:
+            export.update({f"%failed{i}": [5.0], f"failed{i}_response": [f"[{i}]"]})
+        export.update({"%failed": [15.0], "%giveup": [0.0], "%trigger_goto": [0.0]})
+        pd.DataFrame(export).to_csv(raw_dir / "new_data.csv", index=False)
+        while not processed.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        stop.set()
+
+    exporter = threading.Thread(target=land_export)
+    exporter.start()
+    watch(raw_dir, processed_dir, debounce=0.2, stop=stop)
+    exporter.join()
+    assert processed.exists()
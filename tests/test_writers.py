@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from src.analysis.writers import SummaryWriter, open_summary_writer
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".jsonl", ".parquet"])
+def test_writer_streams_chunks(tmp_path, suffix):
+    path = tmp_path / f"out{suffix}"
+    chunks = [pd.DataFrame({"course": ["A", "A"], "n": [1, 2]}), pd.DataFrame({"course": ["B"], "n": [3]})]
+    with open_summary_writer(path) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+    if suffix == ".csv":
+        result = pd.read_csv(path)
+    elif suffix == ".jsonl":
+        result = pd.read_json(path, lines=True)
+    else:
+        result = pd.read_parquet(path)
+    assert result["course"].astype(str).tolist() == ["A", "A", "B"]
+    assert result["n"].tolist() == [1, 2, 3]
+
+
+def test_csv_writer_aligns_chunks_to_the_first_header(tmp_path):
+    path = tmp_path / "out.csv"
+    with open_summary_writer(path) as writer:
+        writer.write(pd.DataFrame({"course": ["A"], "%giveup": [1.0], "n": [1]}))
+        writer.write(pd.DataFrame({"course": ["B"], "n": [2], "extra": ["x"]}))
+    result = pd.read_csv(path)
+    assert result.columns.tolist() == ["course", "%giveup", "n"]
+    assert result["n"].tolist() == [1, 2]
+    assert result["%giveup"].isna().tolist() == [False, True]
+
+
+def test_parquet_writer_aligns_chunks_to_the_first_schema(tmp_path):
+    path = tmp_path / "out.parquet"
+    with open_summary_writer(path) as writer:
+        writer.write(pd.DataFrame({"course": ["A"], "%giveup": [1.5], "failed1_response": ["x"], "n": [1]}))
+        writer.write(pd.DataFrame({"course": ["B"], "n": [2], "extra": [9]}))
+    result = pd.read_parquet(path)
+    assert list(result.columns) == ["course", "%giveup", "failed1_response", "n"]
+    assert result["course"].astype(str).tolist() == ["A", "B"]
+    assert result["%giveup"].isna().tolist() == [False, True]
+    assert result["failed1_response"].isna().tolist() == [False, True]
+    assert result["n"].tolist() == [1, 2]
+
+
+def test_summary_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        SummaryWriter(tmp_path / "out.csv")
+
+
+def test_writer_keeps_header_without_rows(tmp_path):
+    path = tmp_path / "out.csv"
+    with open_summary_writer(path) as writer:
+        writer.write(pd.DataFrame({"course": [], "n": []}))
+    assert path.read_text().strip() == "course,n"
+
+
+def test_writer_leaves_existing_output_on_failure(tmp_path):
+    path = tmp_path / "out.csv"
+    path.write_text("previous\n")
+    with pytest.raises(RuntimeError):
+        with open_summary_writer(path) as writer:
+            writer.write(pd.DataFrame({"n": [1]}))
+            raise RuntimeError("boom")
+    assert path.read_text() == "previous\n"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_unknown_suffix_needs_format(tmp_path):
+    with pytest.raises(ValueError):
+        open_summary_writer(tmp_path / "out.txt")